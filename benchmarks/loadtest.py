@@ -0,0 +1,288 @@
+"""Load test of the HTTP API under concurrent, mixed traffic.
+
+Virtual users replay a scenario (a weighted mix of request kinds) against a
+copy of a synthetic repository for a fixed time, and the run reports
+throughput, latency percentiles and error rates per endpoint as JSON. By
+default requests go through the ASGI app in-process (one event loop, like a
+single uvicorn worker, plus the client's own overhead); `--uvicorn N` starts
+a local uvicorn with N workers and drives it over HTTP instead. Run from the
+repository root:
+
+    python -m benchmarks.loadtest --size 10000 --scenarios mixed writes --users 16 --duration 20
+
+Request kinds: graph (GET /graph polling), commits (GET /commits paging,
+mostly the first page), browse (a commit, its tree and one blob, in
+sequence) and write (POST /commits).
+"""
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import environment
+from benchmarks.synth import RepoSpec, ensure_repo
+from src.git_objects.parser import read_object
+from src.git_objects.paths import is_tree_mode
+
+# Request kind -> relative weight
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "graph-poll": {"graph": 1},
+    "commit-paging": {"commits": 1},
+    "tree-browse": {"browse": 1},
+    "writes": {"write": 1},
+    "mixed": {"graph": 1, "commits": 4, "browse": 4, "write": 1},
+}
+# Commits along main's first-parent chain that browse requests pick from.
+BROWSE_SAMPLE = 200
+PAGE_SIZE = 50
+SERVER_START_TIMEOUT = 60.0
+
+# (endpoint label, method, path below the repository prefix, JSON body)
+Request = Tuple[str, str, str, Optional[dict]]
+
+@dataclass
+class Target:
+    commit: str
+    tree: str
+    blob: str
+
+@dataclass
+class Context:
+    commits: int
+    targets: List[Target]
+
+def sample_targets(git_dir: Path, tip: str, limit: int = BROWSE_SAMPLE) -> List[Target]:
+    """Commits, their root trees and one blob each, walking first parents back from `tip`."""
+    targets = []
+    oid: Optional[str] = tip
+    while oid is not None and len(targets) < limit:
+        commit = read_object(oid, git_dir)
+        tree = read_object(commit.tree_oid, git_dir)
+        blobs = [e.oid for e in tree.entries if not is_tree_mode(e.mode)]
+        if blobs:
+            targets.append(Target(oid, commit.tree_oid, blobs[0]))
+        oid = commit.parent_oids[0] if commit.parent_oids else None
+    return targets
+
+def graph_requests(rng: random.Random, ctx: Context) -> Iterator[Request]:
+    yield "GET /graph", "GET", "/graph", None
+
+def commit_page_requests(rng: random.Random, ctx: Context) -> Iterator[Request]:
+    pages = max(1, ctx.commits // PAGE_SIZE)
+    skip = 0 if rng.random() < 0.5 else PAGE_SIZE * rng.randrange(pages)
+    yield "GET /commits", "GET", f"/commits?limit={PAGE_SIZE}&skip={skip}", None
+
+def browse_requests(rng: random.Random, ctx: Context) -> Iterator[Request]:
+    target = rng.choice(ctx.targets)
+    yield "GET /commits/{oid}", "GET", f"/commits/{target.commit}", None
+    yield "GET /tree/{oid}", "GET", f"/tree/{target.tree}", None
+    yield "GET /blob/{oid}", "GET", f"/blob/{target.blob}", None
+
+def write_requests(rng: random.Random, ctx: Context) -> Iterator[Request]:
+    yield "POST /commits", "POST", "/commits", {"message": f"load test {rng.getrandbits(32):08x}"}
+
+KINDS: Dict[str, Callable[[random.Random, Context], Iterator[Request]]] = {
+    "graph": graph_requests,
+    "commits": commit_page_requests,
+    "browse": browse_requests,
+    "write": write_requests,
+}
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.outcomes: Dict[str, Counter] = {}
+
+    def record(self, label: str, seconds: float, outcome: str):
+        self.latencies.setdefault(label, []).append(seconds)
+        self.outcomes.setdefault(label, Counter())[outcome] += 1
+
+def percentile(samples: List[float], p: float) -> float:
+    """Nearest-rank percentile of sorted `samples`, in milliseconds."""
+    index = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))
+    return round(samples[index] * 1000, 3)
+
+def report(stats: Stats, seconds: float) -> dict:
+    endpoints = {}
+    total = errors = 0
+    for label, samples in sorted(stats.latencies.items()):
+        samples = sorted(samples)
+        outcomes = stats.outcomes[label]
+        failed = sum(n for outcome, n in outcomes.items() if not outcome.startswith(("2", "3")))
+        total += len(samples)
+        errors += failed
+        endpoints[label] = {
+            "requests": len(samples),
+            "throughput_rps": round(len(samples) / seconds, 1),
+            "errors": failed,
+            "error_rate": round(failed / len(samples), 4),
+            "outcomes": dict(outcomes),
+            "p50_ms": percentile(samples, 50),
+            "p90_ms": percentile(samples, 90),
+            "p99_ms": percentile(samples, 99),
+            "max_ms": round(samples[-1] * 1000, 3),
+        }
+    return {
+        "seconds": round(seconds, 3),
+        "requests": total,
+        "throughput_rps": round(total / seconds, 1) if seconds else 0.0,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+async def run_scenario(client, base: str, mix: Dict[str, int], ctx: Context, users: int, duration: float, seed: int) -> dict:
+    """Runs `users` concurrent request loops for `duration` seconds."""
+    kinds = [KINDS[name] for name in mix]
+    weights = list(mix.values())
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+
+    async def user(n: int):
+        rng = random.Random(seed * 1000 + n)
+        while time.perf_counter() < deadline:
+            for label, method, path, body in rng.choices(kinds, weights)[0](rng, ctx):
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, base + path, json=body)
+                    await response.aread()
+                    outcome = str(response.status_code)
+                except Exception as e:
+                    outcome = type(e).__name__
+                stats.record(label, time.perf_counter() - start, outcome)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(n) for n in range(users)))
+    return report(stats, time.perf_counter() - start)
+
+def _link_or_copy(src: str, dst: str):
+    # Objects are immutable and refs are replaced by rename, so hard links
+    # can't change the cached repository.
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _server_env(root: Path) -> Dict[str, str]:
+    # A scratch default repository: playground mode resets GIT_DIR on startup.
+    return {
+        "GIT_DIR": str(root / "default" / ".git"),
+        "REPOS_ROOT": str(root / "repos"),
+        "DAG_SNAPSHOT_DIR": str(root / "snapshots"),
+        "SERVE_MODE": "playground",
+    }
+
+async def _wait_until_up(client, process: subprocess.Popen):
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn did not come up")
+
+async def drive(root: Path, name: str, ctx: Context, scenarios: List[str], users: int, duration: float,
+                seed: int, uvicorn_workers: Optional[int] = None) -> List[dict]:
+    from httpx import ASGITransport, AsyncClient, Limits
+
+    env = _server_env(root)
+    process = None
+    if uvicorn_workers:
+        port = _free_port()
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "src.api.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--workers", str(uvicorn_workers), "--log-level", "warning"],
+            env={**os.environ, **env},
+        )
+        client = AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None, limits=Limits(max_connections=users))
+    else:
+        import src.api.main as main
+        from src.api.registry import RepoRegistry
+        main.registry = RepoRegistry(Path(env["REPOS_ROOT"]), 1 << 40, Path(env["DAG_SNAPSHOT_DIR"]))
+        client = AsyncClient(transport=ASGITransport(app=main.app), base_url="http://loadtest", timeout=None)
+
+    results = []
+    try:
+        async with client:
+            if process is not None:
+                await _wait_until_up(client, process)
+            base = f"/api/repos/{name}"
+            for scenario in scenarios:
+                start = time.perf_counter()
+                # Not counted: the first request may have to load the DAG.
+                (await client.get(f"{base}/commits?limit=1")).raise_for_status()
+                warmup = time.perf_counter() - start
+                result = await run_scenario(client, base, SCENARIOS[scenario], ctx, users, duration, seed)
+                results.append({"scenario": scenario, "mix": SCENARIOS[scenario], "users": users,
+                                "warmup_seconds": round(warmup, 3), **result})
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return results
+
+def run(spec: RepoSpec, repos_root: Path, scenarios: List[str], users: int, duration: float,
+        uvicorn_workers: Optional[int] = None) -> dict:
+    git_dir, manifest = ensure_repo(spec, repos_root)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        # Writes go to a throwaway copy, never to the cached repository.
+        shutil.copytree(git_dir.parent, root / "repos" / spec.name, copy_function=_link_or_copy)
+        ctx = Context(spec.commits, sample_targets(git_dir, manifest["refs"]["main"]))
+        results = asyncio.run(drive(root, spec.name, ctx, scenarios, users, duration, spec.seed, uvicorn_workers))
+    return {
+        "repo": spec.name,
+        "server": f"uvicorn --workers {uvicorn_workers}" if uvicorn_workers else "in-process ASGI",
+        "results": results,
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000, help="commits in the generated repository")
+    parser.add_argument("--storage", choices=["loose", "packed"], default="packed")
+    parser.add_argument("--merge-density", type=float, default=0.1)
+    parser.add_argument("--tree-width", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", choices=sorted(SCENARIOS), nargs="+", default=["mixed"])
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--uvicorn", type=int, metavar="WORKERS", help="drive a local uvicorn with this many workers")
+    parser.add_argument("--repos", type=Path, default=Path(os.getenv("BENCH_REPOS", ".bench-repos")))
+    parser.add_argument("--output", type=Path, help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    import logging
+    logging.disable(logging.INFO)
+
+    spec = RepoSpec(args.size, args.merge_density, args.tree_width, args.storage == "packed", seed=args.seed)
+    print(f"load testing {spec.name}", file=sys.stderr)
+    result = run(spec, args.repos, args.scenarios, args.users, args.duration, args.uvicorn)
+    text = json.dumps({"environment": environment(), **result}, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""Read-path benchmarks over synthetic repositories.
+
+For every repository size and storage layout, times object reads,
+`DagBuilder.build_dag`, `topological_sort` and the read endpoints of the
+API (in-process, through the ASGI app) and prints the results as JSON.
+Repositories are generated once (see benchmarks.synth) and cached under
+--repos. Run from the repository root:
+
+    python -m benchmarks.suite --sizes 1000 10000 --storage loose packed --output bench.json
+
+Compare two result files with `--baseline old.json`: any timing whose
+median grew by more than --tolerance is listed under "regressions" and
+the exit status is 1.
+"""
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synth import STANDARD_SIZES, RepoSpec, ensure_repo
+from src.dag.builder import DagBuilder, topological_sort
+from src.git_objects.parser import read_object
+
+# Objects sampled per type for the read_object timings.
+READ_SAMPLE = 500
+
+def summarize(samples: List[float]) -> dict:
+    """Timing statistics in milliseconds."""
+    samples = sorted(samples)
+    n = len(samples)
+    return {
+        "n": n,
+        "min_ms": round(samples[0] * 1000, 4),
+        "median_ms": round(samples[n // 2] * 1000, 4),
+        "p99_ms": round(samples[min(n - 1, int(n * 0.99))] * 1000, 4),
+        "max_ms": round(samples[-1] * 1000, 4),
+        "total_ms": round(sum(samples) * 1000, 3),
+    }
+
+def timed(fn: Callable, repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def bench_objects(git_dir: Path, dag: dict, seed: int) -> Dict[str, dict]:
+    """read_object for a fixed sample of commits and of their trees and blobs."""
+    rng = random.Random(seed)
+    commit_oids = rng.sample(sorted(dag), min(READ_SAMPLE, len(dag)))
+    commits = [read_object(oid, git_dir) for oid in commit_oids]
+    tree_oids = [c.tree_oid for c in commits]
+    blob_oids = [rng.choice(read_object(oid, git_dir).entries).oid for oid in tree_oids]
+
+    results = {}
+    for kind, oids in (("commit", commit_oids), ("tree", tree_oids), ("blob", blob_oids)):
+        samples = []
+        for oid in oids:
+            start = time.perf_counter()
+            read_object(oid, git_dir)
+            samples.append(time.perf_counter() - start)
+        results[kind] = summarize(samples)
+    return results
+
+def endpoint_requests(manifest: dict, dag: dict, order: list) -> Dict[str, str]:
+    """One representative request per read endpoint."""
+    tip = manifest["refs"]["main"]
+    parent = dag[tip].parents[0] if dag[tip].parents else tip
+    tree = read_object(tip, Path(manifest["git_dir"])).tree_oid
+    blob_entry = read_object(tree, Path(manifest["git_dir"])).entries[0]
+    middle = order[len(order) // 2].oid
+    return {
+        "GET /commits": "/commits?limit=50",
+        "GET /commits?skip": f"/commits?limit=50&skip={len(order) // 2}",
+        "GET /commits?author": "/commits?limit=50&author=grace@example.com",
+        "GET /commits/{oid}": f"/commits/{middle}",
+        "GET /search": "/search?q=parser+cache&limit=50",
+        "GET /graph": "/graph",
+        "GET /tree/{oid}": f"/tree/{tree}",
+        "GET /tree/{oid}/recursive": f"/tree/{tree}/recursive",
+        "GET /blob/{oid}": f"/blob/{blob_entry.oid}",
+        "GET /history": f"/history?path={blob_entry.name}&limit=20",
+        "GET /commits/{oid}/diff": f"/commits/{tip}/diff?lines=true",
+        "GET /diff": f"/diff?old={parent}&new={tip}",
+        "GET /blame/{oid}": f"/blame/{tip}?path={blob_entry.name}",
+    }
+
+async def bench_endpoints(repos_root: Path, name: str, requests: Dict[str, str], repeat: int) -> Dict[str, dict]:
+    """Times each request through the ASGI app, after one cold request that loads the DAG."""
+    from httpx import ASGITransport, AsyncClient
+    import src.api.main as main
+    from src.api.registry import RepoRegistry
+
+    with tempfile.TemporaryDirectory() as snapshots:
+        # A private registry: the DAG is built from scratch, not loaded from an earlier run's snapshot.
+        main.registry = RepoRegistry(repos_root, 1 << 40, Path(snapshots))
+        results: Dict[str, dict] = {}
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench") as client:
+            base = f"/api/repos/{name}"
+            start = time.perf_counter()
+            response = await client.get(f"{base}/commits?limit=1")
+            response.raise_for_status()
+            results["cold start"] = summarize([time.perf_counter() - start])
+
+            for label, path in requests.items():
+                samples, size = [], 0
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    response = await client.get(base + path)
+                    samples.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                    size = len(response.content)
+                results[label] = {**summarize(samples), "bytes": size}
+    return results
+
+def run(spec: RepoSpec, repos_root: Path, repeat: int, endpoints: bool) -> dict:
+    git_dir, manifest = ensure_repo(spec, repos_root)
+    manifest = {**manifest, "git_dir": str(git_dir)}
+    result = {"repo": spec.name, "spec": manifest["spec"], "generate_seconds": manifest["generate_seconds"]}
+
+    builds = []
+    dag = {}
+    for _ in range(repeat):
+        builder = DagBuilder(git_dir)
+        start = time.perf_counter()
+        dag = builder.build_dag()
+        builds.append(time.perf_counter() - start)
+    result["build_dag"] = summarize(builds)
+
+    order: list = []
+    def sort():
+        nonlocal order
+        order = topological_sort(dag)
+    result["topological_sort"] = summarize(timed(sort, repeat))
+    result["read_object"] = bench_objects(git_dir, dag, spec.seed)
+
+    if endpoints:
+        requests = endpoint_requests(manifest, dag, order)
+        result["endpoints"] = asyncio.run(bench_endpoints(repos_root, spec.name, requests, repeat))
+    return result
+
+def _timings(result: dict, prefix: str = ""):
+    """Flattens a result into (label, median_ms) pairs."""
+    for key, value in result.items():
+        if isinstance(value, dict):
+            if "median_ms" in value:
+                yield prefix + key, value["median_ms"]
+            else:
+                yield from _timings(value, f"{prefix}{key}.")
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """Timings that got slower than `baseline` by more than `tolerance` (0.2 = 20%)."""
+    old = {r["repo"]: dict(_timings(r)) for r in baseline}
+    regressions = []
+    for r in results:
+        before = old.get(r["repo"], {})
+        for label, median in _timings(r):
+            if label in before and before[label] > 0 and median > before[label] * (1 + tolerance):
+                regressions.append({"repo": r["repo"], "timing": label, "baseline_ms": before[label], "median_ms": median})
+    return regressions
+
+def environment() -> dict:
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "revision": revision or None,
+        "timestamp": int(time.time()),
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(STANDARD_SIZES[:2]),
+                        help=f"commit counts (standard: {' '.join(map(str, STANDARD_SIZES))})")
+    parser.add_argument("--storage", choices=["loose", "packed"], nargs="+", default=["loose", "packed"])
+    parser.add_argument("--merge-density", type=float, default=0.1)
+    parser.add_argument("--tree-width", type=int, default=16)
+    parser.add_argument("--branches", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing")
+    parser.add_argument("--no-endpoints", action="store_true", help="skip the API timings")
+    parser.add_argument("--repos", type=Path, default=Path(os.getenv("BENCH_REPOS", ".bench-repos")))
+    parser.add_argument("--output", type=Path, help="write JSON here instead of stdout")
+    parser.add_argument("--baseline", type=Path, help="earlier --output to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    # Keep the API quiet; its request logging would swamp the output.
+    os.environ.setdefault("SERVE_MODE", "readonly")
+    import logging
+    logging.disable(logging.INFO)
+
+    results = []
+    for commits in args.sizes:
+        for storage in args.storage:
+            spec = RepoSpec(commits, args.merge_density, args.tree_width, storage == "packed", args.branches, args.seed)
+            print(f"benchmarking {spec.name}", file=sys.stderr)
+            results.append(run(spec, args.repos, args.repeat, not args.no_endpoints))
+
+    report = {"environment": environment(), "results": results}
+    status = 0
+    if args.baseline:
+        report["regressions"] = compare(results, json.loads(args.baseline.read_text())["results"], args.tolerance)
+        status = 1 if report["regressions"] else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        print(text)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
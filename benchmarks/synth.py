@@ -0,0 +1,182 @@
+"""Deterministic synthetic repositories for benchmarks.
+
+The same RepoSpec always produces byte-identical objects and refs, so
+results from different runs and machines are comparable. Commits are
+spread over a few long-lived branches ("lanes"); `merge_density` is the
+fraction of commits that also merge another lane's tip. Each commit
+rewrites one file of a flat root tree holding `tree_width` files.
+
+    python -m benchmarks.synth --commits 10000 --packed --out /tmp/repos
+"""
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import time
+import zlib
+
+from src.git_objects.models import BlobObject, CommitObject, GitObject, TreeEntry, TreeObject, object_header
+from src.git_objects.pack import write_pack
+
+# Sizes the suite runs by default; 100k and 1M take minutes to generate and are opt-in.
+STANDARD_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+# Packed repositories are written as one pack per this many objects, which
+# bounds the generator's memory at any size.
+OBJECTS_PER_PACK = 300_000
+# Commit timestamps start here and advance by a minute per commit.
+EPOCH = 1_600_000_000
+
+_AUTHORS = [
+    ("Ada Lovelace", "ada@example.com"),
+    ("Grace Hopper", "grace@example.com"),
+    ("Linus Torvalds", "linus@example.com"),
+    ("Margaret Hamilton", "margaret@example.com"),
+    ("Ken Thompson", "ken@example.com"),
+    ("Barbara Liskov", "barbara@example.com"),
+]
+_WORDS = ["fix", "add", "refactor", "parser", "graph", "cache", "index", "docs", "test", "speed", "render", "tree"]
+
+# Written last, so a repository without it is an interrupted generation.
+MANIFEST = "synth.json"
+
+@dataclass(frozen=True)
+class RepoSpec:
+    commits: int
+    merge_density: float = 0.1
+    tree_width: int = 16
+    packed: bool = False
+    branches: int = 4
+    seed: int = 0
+
+    @property
+    def name(self) -> str:
+        storage = "packed" if self.packed else "loose"
+        return (f"c{self.commits}-m{self.merge_density:g}-w{self.tree_width}"
+                f"-b{self.branches}-s{self.seed}-{storage}")
+
+class _LooseSink:
+    def __init__(self, git_dir: Path):
+        self.objects_dir = git_dir / "objects"
+        self._dirs = set()
+
+    def add(self, oid: str, obj_type: bytes, data: bytes):
+        if oid[:2] not in self._dirs:
+            (self.objects_dir / oid[:2]).mkdir(exist_ok=True)
+            self._dirs.add(oid[:2])
+        (self.objects_dir / oid[:2] / oid[2:]).write_bytes(zlib.compress(object_header(obj_type, len(data)) + data, 1))
+
+    def close(self):
+        pass
+
+class _PackSink:
+    def __init__(self, git_dir: Path):
+        self.pack_dir = git_dir / "objects" / "pack"
+        self._pending: List[Tuple[str, bytes, bytes]] = []
+
+    def add(self, oid: str, obj_type: bytes, data: bytes):
+        self._pending.append((oid, obj_type, data))
+        if len(self._pending) >= OBJECTS_PER_PACK:
+            self.close()
+
+    def close(self):
+        if self._pending:
+            write_pack(self.pack_dir, self._pending)
+            self._pending = []
+
+def _store(sink, obj: GitObject) -> str:
+    data = obj.serialize()
+    h = hashlib.sha1(object_header(obj.type, len(data)))
+    h.update(data)
+    oid = h.hexdigest()
+    sink.add(oid, obj.type, data)
+    return oid
+
+def generate(spec: RepoSpec, repo_dir: Path) -> Dict[str, str]:
+    """Creates the repository for `spec` at `repo_dir` (a work tree with a .git); returns its refs."""
+    if spec.commits < 1 or spec.branches < 1 or spec.tree_width < 1:
+        raise ValueError("commits, branches and tree_width must be positive")
+    if not 0 <= spec.merge_density <= 1:
+        raise ValueError("merge_density must be between 0 and 1")
+
+    git_dir = repo_dir / ".git"
+    (git_dir / "objects").mkdir(parents=True)
+    (git_dir / "refs" / "heads").mkdir(parents=True)
+    (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+
+    rng = random.Random(spec.seed)
+    sink = _PackSink(git_dir) if spec.packed else _LooseSink(git_dir)
+    names = [f"file{i:04d}.txt" for i in range(spec.tree_width)]
+    # Per lane: tip commit and the {name: blob oid} of its tree
+    tips: List[Optional[str]] = [None] * spec.branches
+    files: List[Dict[str, str]] = [{} for _ in range(spec.branches)]
+
+    for n in range(spec.commits):
+        lane = rng.randrange(spec.branches) if n else 0
+        if tips[lane] is None and n:
+            # A lane's first commit forks from main
+            tips[lane], files[lane] = tips[0], dict(files[0])
+        parents = [tips[lane]] if tips[lane] else []
+        if n and spec.branches > 1 and rng.random() < spec.merge_density:
+            other = rng.choice([l for l in range(spec.branches) if l != lane])
+            if tips[other] is not None and tips[other] != tips[lane]:
+                parents.append(tips[other])
+
+        if n == 0:
+            for name in names:
+                files[lane][name] = _store(sink, BlobObject(f"{name}\n0\n".encode()))
+        else:
+            name = names[rng.randrange(spec.tree_width)]
+            files[lane][name] = _store(sink, BlobObject(f"{name}\n{n}\n".encode()))
+        tree_oid = _store(sink, TreeObject(entries=[
+            TreeEntry(mode=b"100644", name=name, oid=oid) for name, oid in files[lane].items()
+        ]))
+
+        author, email = _AUTHORS[rng.randrange(len(_AUTHORS))]
+        identity = f"{author} <{email}> {EPOCH + 60 * n} +0000"
+        words = " ".join(rng.choice(_WORDS) for _ in range(3))
+        message = f"{words} #{n}\n" if len(parents) < 2 else f"Merge lane into {words} #{n}\n"
+        tips[lane] = _store(sink, CommitObject(
+            tree_oid=tree_oid, parent_oids=parents, author=identity, committer=identity, message=message,
+        ))
+
+    sink.close()
+    refs = {("main" if lane == 0 else f"lane-{lane}"): tip for lane, tip in enumerate(tips) if tip}
+    for branch, tip in refs.items():
+        (git_dir / "refs" / "heads" / branch).write_text(tip + "\n")
+    return refs
+
+def ensure_repo(spec: RepoSpec, root: Path) -> Tuple[Path, dict]:
+    """Returns (git dir, manifest) for `spec` under `root`, generating it on first use."""
+    repo_dir = root / spec.name
+    manifest_path = repo_dir / MANIFEST
+    if manifest_path.exists():
+        return repo_dir / ".git", json.loads(manifest_path.read_text())
+    if repo_dir.exists():
+        shutil.rmtree(repo_dir)
+    start = time.perf_counter()
+    refs = generate(spec, repo_dir)
+    manifest = {"spec": asdict(spec), "refs": refs, "generate_seconds": round(time.perf_counter() - start, 3)}
+    manifest_path.write_text(json.dumps(manifest, indent=2))
+    return repo_dir / ".git", manifest
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--commits", type=int, default=1000)
+    parser.add_argument("--merge-density", type=float, default=0.1)
+    parser.add_argument("--tree-width", type=int, default=16)
+    parser.add_argument("--branches", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--packed", action="store_true")
+    parser.add_argument("--out", type=Path, default=Path(os.getenv("BENCH_REPOS", ".bench-repos")))
+    args = parser.parse_args()
+    spec = RepoSpec(args.commits, args.merge_density, args.tree_width, args.packed, args.branches, args.seed)
+    git_dir, manifest = ensure_repo(spec, args.out)
+    print(json.dumps({"git_dir": str(git_dir), **manifest}, indent=2))
+
+if __name__ == "__main__":
+    main()
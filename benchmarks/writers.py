@@ -0,0 +1,64 @@
+"""Commit throughput with N concurrent writers.
+
+Each writer thread calls GitService.create_commit in a loop against a fresh
+repository, the way concurrent POST /api/commits requests reach the service.
+Run from the repository root:
+
+    python -m benchmarks.writers --writers 1 2 4 8 16 --commits 200
+"""
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import tempfile
+import time
+
+from src.api.schemas import CreateCommitRequest
+from src.api.service import GitService
+
+def run(writers: int, commits: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        git_dir = Path(tmp) / ".git"
+        (git_dir / "objects").mkdir(parents=True)
+        (git_dir / "refs" / "heads").mkdir(parents=True)
+        (git_dir / "HEAD").write_text("ref: refs/heads/main")
+        service = GitService(git_dir)
+        service.ensure_loaded()
+
+        per_writer = max(1, commits // writers)
+
+        def write(w: int):
+            latencies = []
+            for i in range(per_writer):
+                start = time.perf_counter()
+                service.create_commit(CreateCommitRequest(message=f"writer {w} commit {i}"))
+                latencies.append(time.perf_counter() - start)
+            return latencies
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=writers) as pool:
+            latencies = sorted(l for ls in pool.map(write, range(writers)) for l in ls)
+        elapsed = time.perf_counter() - start
+
+        total = per_writer * writers
+        assert len(service.ensure_loaded().sorted_commits) == total, "lost commits"
+        return {
+            "writers": writers,
+            "commits": total,
+            "seconds": round(elapsed, 3),
+            "commits_per_second": round(total / elapsed, 1),
+            "group_commits": service.writes.groups,
+            "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+            "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--writers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--commits", type=int, default=200, help="total commits per run")
+    args = parser.parse_args()
+    results = [run(n, args.commits) for n in args.writers]
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+import logging
+import threading
+
+from src.dag.refs import RefUpdateError, resolve_ref, update_ref
+from src.git_objects.models import GitObject
+from src.git_objects.store import ObjectStore
+from src.git_objects.writer import ObjectBatch
+
+if TYPE_CHECKING:
+    from src.api.service import GitService
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on write requests folded into one group commit.
+MAX_GROUP_SIZE = 256
+
+class WriteGroup:
+    """The state shared by the write jobs of one group commit.
+
+    Jobs see each other's objects and ref updates as if they were already
+    on disk, so commits queued on the same branch chain onto each other.
+    Nothing is published until `commit`: objects are written and fsynced
+    together, then every touched ref is moved once, from the value it had
+    when the group started.
+    """
+
+    def __init__(self, git_dir: Path, store: ObjectStore, read: Callable[[str], GitObject]):
+        self.git_dir = git_dir
+        self.store = store
+        self.objects = ObjectBatch(store, read)
+        # ref -> (value on disk when first touched, value to publish)
+        self._refs: Dict[str, Tuple[Optional[str], str]] = {}
+        # Refs set by the job running now (see start_job).
+        self.job_refs: Set[str] = set()
+
+    @property
+    def refs(self) -> List[str]:
+        """The refs the group's jobs set."""
+        return list(self._refs)
+
+    def start_job(self):
+        """Starts tracking the refs of the next job in `job_refs`."""
+        self.job_refs = set()
+
+    def new_batch(self) -> ObjectBatch:
+        """A batch for one job that can read everything earlier jobs created."""
+        return ObjectBatch(self.store, self.objects.get)
+
+    def ref(self, ref: str) -> Optional[str]:
+        if ref in self._refs:
+            return self._refs[ref][1]
+        return resolve_ref(self.git_dir, ref)
+
+    def set_ref(self, ref: str, oid: str, batch: ObjectBatch):
+        """Records a job's result: its objects and the new value of `ref`."""
+        self.objects.absorb(batch)
+        old = self._refs[ref][0] if ref in self._refs else resolve_ref(self.git_dir, ref)
+        self._refs[ref] = (old, oid)
+        self.job_refs.add(ref)
+
+    def commit(self) -> Dict[str, Exception]:
+        """Writes the objects, then moves the refs; returns the refs that could not be moved.
+
+        Refs are compare-and-swapped one at a time, so a ref that changed
+        on disk (or is locked) fails on its own and the others are still
+        published. Raises, publishing nothing, if the objects can't be written.
+        """
+        self.objects.write(fsync=True)
+        failed = {}
+        for ref, (old, new) in self._refs.items():
+            try:
+                update_ref(self.git_dir, ref, new, old_oid=old)
+            except (RefUpdateError, OSError) as e:
+                failed[ref] = e
+        return failed
+
+class CommitQueue:
+    """Runs a repository's writes on one thread, a group at a time.
+
+    Requests queue up while a group is being written; the next group takes
+    all of them (up to MAX_GROUP_SIZE). Each group costs one round of
+    fsyncs, one update per ref and one DAG refresh, however many commits
+    it holds. Futures resolve once the refreshed snapshot is live, so a
+    writer can read its own commit straight away; readers keep using the
+    previous snapshot until then and never wait on the queue.
+    """
+
+    def __init__(self, service: "GitService"):
+        self.service = service
+        self.groups = 0
+        self._jobs: Deque[Tuple[Callable[[WriteGroup], Any], Future]] = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def submit(self, job: Callable[[WriteGroup], Any]) -> "Future[Any]":
+        future: Future = Future()
+        with self._cond:
+            self._jobs.append((job, future))
+            self._stopping = False
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="commit-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return future
+
+    def stop(self):
+        """Lets the writer thread exit once the queue is empty; the next submit starts a new one."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._jobs:
+                    if self._stopping:
+                        self._thread = None
+                        return
+                    self._cond.wait()
+                jobs = [self._jobs.popleft() for _ in range(min(len(self._jobs), MAX_GROUP_SIZE))]
+            self._write_group(jobs)
+
+    def _write_group(self, jobs: List[Tuple[Callable[[WriteGroup], Any], Future]]):
+        group = WriteGroup(self.service.git_dir, self.service.store, self.service.read)
+        done = []
+        for job, future in jobs:
+            if not future.set_running_or_notify_cancel():
+                continue
+            group.start_job()
+            try:
+                done.append((future, job(group), group.job_refs))
+            except BaseException as e:
+                future.set_exception(e)
+        if not done:
+            return
+        try:
+            failed = group.commit()
+        except BaseException as e:
+            logger.warning(f"Group commit of {len(done)} writes failed: {e}")
+            for future, _, _ in done:
+                future.set_exception(e)
+            return
+        if failed:
+            logger.warning(f"Group commit could not move {', '.join(sorted(failed))}: {'; '.join(map(str, failed.values()))}")
+            # Only the jobs on a ref that didn't move fail; the others' refs are published.
+            published = []
+            for future, result, refs in done:
+                errors = [failed[ref] for ref in sorted(refs) if ref in failed]
+                if errors:
+                    future.set_exception(errors[0])
+                else:
+                    published.append((future, result, refs))
+            done = published
+            if len(failed) == len(group.refs):
+                return
+        self.groups += 1
+        try:
+            self.service.request_refresh().result()
+        except Exception as e:
+            # The commits are safely on disk; the next refresh will pick them up.
+            logger.warning(f"Refresh after group commit failed: {e}")
+        for future, result, _ in done:
+            future.set_result(result)
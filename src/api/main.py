@@ -1,11 +1,24 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Query, Request
+from fastapi import Path as PathParam
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import List, Optional
 from pathlib import Path
 import os
+import tempfile
 
 from src.api.service import GitService
-from src.api.schemas import CommitResponse, GraphResponse, TreeEntryResponse, BlobResponse, CreateCommitRequest
+from src.api.registry import RepoRegistry
+from src.api.metrics import MetricsMiddleware, service_collector
+from src.api.profiling import ProfiledRoute, ProfileMiddleware, run_in_threadpool
+from src.dag.refs import RefUpdateError
+from src.git_objects.identity import parse_date
+from src.git_objects.store import memory_backed, store_for
+from src.git_objects.writer import SPOOL_MEMORY_LIMIT, STREAM_CHUNK_SIZE
+from src.utils.metrics import REGISTRY
+from src.diff.renames import DEFAULT_RENAME_LIMIT, DEFAULT_THRESHOLD, RenameOptions
+from src.api.schemas import CommitResponse, GraphResponse, TreeEntryResponse, BlobResponse, CreateCommitRequest, RegistryResponse, ReadinessResponse, ObjectsRequest, ObjectsResponse, DiffResponse, BlameResponse, SearchResponse, BatchCommitsRequest, BatchCommitsResponse, BlobUploadResponse, RepackResponse, StatsResponse
 
 import logging
 
@@ -30,14 +43,48 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
+# Requests sending `X-Profile: $PROFILE_TOKEN` get a stage breakdown (see src/api/profiling.py).
+app.add_middleware(ProfileMiddleware, token=os.getenv("PROFILE_TOKEN"))
 
 # Initialize Service
 # By default look in CWD. Can be overridden by env var GIT_DIR.
 git_dir_path = os.getenv("GIT_DIR", ".git")
-service = GitService(Path(git_dir_path))
+# DAG snapshots are written into the git dir unless DAG_SNAPSHOT_DIR is set.
+snapshot_dir = os.getenv("DAG_SNAPSHOT_DIR")
+# OBJECT_STORE=memory loads every object into RAM at startup for hot repositories.
+# Only honoured in readonly mode, where the object set can't be reset under it.
+object_store = os.getenv("OBJECT_STORE", "disk")
+serve_mode = os.getenv("SERVE_MODE", "playground")
+read_only = serve_mode == "readonly"
+store = memory_backed(store_for(Path(git_dir_path))) if read_only and object_store == "memory" else None
+# COMMIT_INDEX=sqlite keeps commit metadata in an SQLite file next to the DAG
+# snapshot, so commit listings and lookups don't need the DAG in memory.
+commit_index = os.getenv("COMMIT_INDEX", "") == "sqlite"
+# SHARED_DAG=1 serves DAGs from the memory-mapped snapshot file, so uvicorn or
+# gunicorn workers share one copy; one worker builds each new version.
+shared_dag = os.getenv("SHARED_DAG", "") == "1"
+service = GitService(Path(git_dir_path), Path(snapshot_dir) if snapshot_dir else None, store, commit_index, shared_dag)
 
+# Additional repositories are served from REPOS_ROOT under /api/repos/{name}/...
+# Their DAGs share REPO_MEMORY_BUDGET_MB and are evicted least-recently-used first.
+repos_root = os.getenv("REPOS_ROOT", "repos")
+repo_memory_budget = int(os.getenv("REPO_MEMORY_BUDGET_MB", "512")) * 1024 * 1024
+registry = RepoRegistry(Path(repos_root), repo_memory_budget, Path(snapshot_dir) if snapshot_dir else None, commit_index, shared_dag)
+REGISTRY.register_collector(service_collector(lambda: [("default", service)] + registry.services()))
+
+# SERVE_MODE=playground (default) resets the repository on startup and accepts
+# writes, for the interactive demo. SERVE_MODE=readonly never touches the
+# repository: the DAG is warmed up in the background and writes are refused.
 @app.on_event("startup")
 def startup_event():
+    if read_only:
+        # Don't block startup: the refresh worker builds (or loads) the DAG
+        # while /health/ready reports progress.
+        service.request_refresh()
+        logger.info(f"Warming up DAG for {service.git_dir} in the background")
+        return
+
     # Reset repo on application startup
     try:
         service.reset_repo()
@@ -45,53 +92,307 @@ def startup_event():
     except Exception as e:
         logger.error(f"Failed to reset repo on startup: {e}")
 
-@app.get("/api/commits", response_model=List[CommitResponse])
-def get_commits(limit: int = 50, skip: int = 0):
+# Handlers are async so that requests waiting on a cold DAG build don't each
+# pin a threadpool worker; blocking work (disk reads, big responses) is pushed
+# to the threadpool explicitly.
+#
+# The same routes are mounted twice: under /api for the GIT_DIR repository and
+# under /api/repos/{name} for repositories from the registry.
+
+async def get_service(request: Request):
+    name = request.path_params.get("name")
+    if name is None:
+        yield service
+        return
+    repo = registry.get(name)
+    if repo is None:
+        raise HTTPException(status_code=404, detail="Repository not found")
+    yield repo
+    # This request may have loaded a DAG or filled caches; make room for them.
+    registry.enforce_budget(keep=name)
+
+def require_writable():
+    if read_only:
+        raise HTTPException(status_code=403, detail="Server is running in read-only mode")
+
+def repo_name(name: str = PathParam(..., description="Repository directory name under REPOS_ROOT")):
+    return name
+
+router = APIRouter(route_class=ProfiledRoute)
+
+def parse_time_param(value: Optional[str], name: str) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return parse_date(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected epoch seconds or an ISO 8601 date")
+
+@router.get("/commits", response_model=List[CommitResponse])
+async def get_commits(
+    limit: int = 50,
+    skip: int = 0,
+    author: Optional[str] = Query(None, description="Author email or name"),
+    since: Optional[str] = Query(None, description="Epoch seconds or ISO 8601; committer date, inclusive"),
+    until: Optional[str] = Query(None, description="Epoch seconds or ISO 8601; committer date, inclusive"),
+    service: GitService = Depends(get_service),
+):
     """Get list of commits (topological order)."""
-    return service.get_commits(limit, skip)
+    since_ts = parse_time_param(since, "since")
+    until_ts = parse_time_param(until, "until")
+    # Both the index check and the query hit SQLite or the refs on disk.
+    if not await run_in_threadpool(service.serves_commits_from_index):
+        await service.ensure_loaded_async()
+    return await run_in_threadpool(service.get_commits, limit, skip, author, since_ts, until_ts)
 
-@app.get("/api/commits/{oid}", response_model=CommitResponse)
-def get_commit(oid: str):
+@router.get("/commits/{oid}", response_model=CommitResponse)
+async def get_commit(oid: str, service: GitService = Depends(get_service)):
     """Get details of a specific commit."""
-    commit = service.get_commit(oid)
+    if not await run_in_threadpool(service.serves_commits_from_index):
+        await service.ensure_loaded_async()
+    commit = await run_in_threadpool(service.get_commit, oid)
     if not commit:
         raise HTTPException(status_code=404, detail="Commit not found")
     return commit
 
-@app.post("/api/commits", response_model=CommitResponse)
-def create_commit(req: CreateCommitRequest):
+@router.get("/search", response_model=SearchResponse)
+async def search_commits(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=1000),
+    skip: int = Query(0, ge=0),
+    service: GitService = Depends(get_service),
+):
+    """Full-text search over commit messages, authors and committers, newest first.
+
+    Every word must match; `"quoted words"` match as a phrase and `word*` as a prefix.
+    """
+    await service.ensure_loaded_async()
+    return await run_in_threadpool(service.search_commits, q, limit, skip)
+
+@router.get("/stats", response_model=StatsResponse)
+async def get_stats(author: Optional[str] = None, service: GitService = Depends(get_service)):
+    """Commit counts per author and per week, merge ratio and churn (files changed).
+
+    Kept up to date as commits come in, so the cost doesn't grow with the history.
+    """
+    await service.ensure_loaded_async()
+    return await run_in_threadpool(service.get_stats, author)
+
+@router.get("/history", response_model=List[CommitResponse])
+async def get_path_history(
+    path: str,
+    start: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=1000),
+    skip: int = Query(0, ge=0),
+    full_history: bool = False,
+    service: GitService = Depends(get_service),
+):
+    """Commits that changed a file or directory (`git log -- path`), newest first."""
+    await service.ensure_loaded_async()
+    commits = await run_in_threadpool(service.get_path_history, path, start, limit, skip, full_history)
+    if commits is None:
+        raise HTTPException(status_code=404, detail="Start commit not found")
+    return commits
+
+@router.get("/blame/{oid}", response_model=BlameResponse)
+async def get_blame(oid: str, path: str, service: GitService = Depends(get_service)):
+    """Which commit last changed each line of `path`, as of commit `oid`."""
+    await service.ensure_loaded_async()
+    result = await run_in_threadpool(service.get_blame, oid, path)
+    if result is None:
+        raise HTTPException(status_code=404, detail="File not found at commit")
+    return result
+
+@router.post("/commits", response_model=CommitResponse, dependencies=[Depends(require_writable)])
+async def create_commit(req: CreateCommitRequest, service: GitService = Depends(get_service)):
     """Create a new commit (on current HEAD)."""
-    return service.create_commit(req)
+    try:
+        return await run_in_threadpool(service.create_commit, req)
+    except RefUpdateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+# Upper bound on commits per ingestion request; larger imports are split by the client.
+MAX_BATCH_COMMITS = 10000
+
+@router.post("/commits/batch", response_model=BatchCommitsResponse, dependencies=[Depends(require_writable)])
+async def create_commits(req: BatchCommitsRequest, service: GitService = Depends(get_service)):
+    """Create a chain of commits, with optional inline files, in one request.
+
+    Objects are written in one pass, the branch is updated once and the DAG
+    refreshed once for the whole batch.
+    """
+    if len(req.commits) > MAX_BATCH_COMMITS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_COMMITS} commits per request")
+    try:
+        return await run_in_threadpool(service.create_commits, req)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RefUpdateError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@router.post("/blobs", response_model=BlobUploadResponse, dependencies=[Depends(require_writable)])
+async def upload_blob(request: Request, service: GitService = Depends(get_service)):
+    """Store the raw request body as a blob (`git hash-object -w --stdin`).
+
+    With a Content-Length the body is hashed and compressed as it arrives;
+    chunked uploads are spooled to a temporary file first, since the object
+    header needs the size.
+    """
+    length = request.headers.get("content-length")
+    if length is not None and not length.isdigit():
+        raise HTTPException(status_code=400, detail="Invalid Content-Length")
+    try:
+        if length is not None:
+            writer = await run_in_threadpool(service.blob_writer, int(length))
+            with writer:
+                async for chunk in request.stream():
+                    if chunk:
+                        await run_in_threadpool(writer.write, chunk)
+                oid = await run_in_threadpool(writer.finish)
+            return BlobUploadResponse(oid=oid, size=int(length))
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT) as spool:
+            async for chunk in request.stream():
+                if chunk:
+                    await run_in_threadpool(spool.write, chunk)
+            size = spool.tell()
+            spool.seek(0)
+            chunks = iter(lambda: spool.read(STREAM_CHUNK_SIZE), b"")
+            return await run_in_threadpool(service.write_blob, chunks, size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/maintenance/repack", response_model=RepackResponse, dependencies=[Depends(require_writable)])
+async def repack_objects(deltas: bool = True, prune: bool = True, service: GitService = Depends(get_service)):
+    """Pack all loose objects into one pack file and delete the loose copies."""
+    return await run_in_threadpool(service.repack, deltas, prune)
+
+def rename_options(
+    renames: bool = False,
+    copies: bool = False,
+    rename_threshold: int = Query(DEFAULT_THRESHOLD, ge=0, le=100),
+    rename_limit: int = Query(DEFAULT_RENAME_LIMIT, ge=0, le=10000),
+) -> Optional[RenameOptions]:
+    # Copy detection implies rename detection, as with `git diff -C`.
+    if not (renames or copies):
+        return None
+    return RenameOptions(threshold=rename_threshold, limit=rename_limit, copies=copies)
+
+@router.get("/commits/{oid}/diff", response_model=DiffResponse, response_model_exclude_none=True)
+async def get_commit_diff(
+    oid: str,
+    parent: Optional[str] = None,
+    lines: bool = False,
+    context: int = Query(3, ge=0, le=100),
+    renames: Optional[RenameOptions] = Depends(rename_options),
+    service: GitService = Depends(get_service),
+):
+    """Files changed by a commit (vs. its first parent, or `parent`), optionally with line diffs."""
+    diff = await run_in_threadpool(service.diff_commit, oid, parent, lines, context, renames)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Commit not found")
+    return diff
+
+@router.get("/diff", response_model=DiffResponse, response_model_exclude_none=True)
+async def get_diff(
+    old: str,
+    new: str,
+    lines: bool = False,
+    context: int = Query(3, ge=0, le=100),
+    renames: Optional[RenameOptions] = Depends(rename_options),
+    service: GitService = Depends(get_service),
+):
+    """Diff between two trees or commits."""
+    diff = await run_in_threadpool(service.diff, old, new, lines, context, renames)
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Tree not found")
+    return diff
 
 # seed_repo endpoint removed
 
 # reset endpoint removed
 
-@app.get("/api/graph", response_model=GraphResponse)
-def get_graph():
+@router.get("/graph", response_model=GraphResponse)
+async def get_graph(service: GitService = Depends(get_service)):
     """Get the full commit graph (nodes and edges)."""
-    return service.get_graph_data()
+    await service.ensure_loaded_async()
+    return await run_in_threadpool(service.get_graph_data)
 
 
 
-@app.get("/api/tree/{oid}", response_model=List[TreeEntryResponse])
-def get_tree(oid: str):
-    tree = service.get_tree(oid)
+@router.get("/tree/{oid}", response_model=List[TreeEntryResponse])
+async def get_tree(oid: str, service: GitService = Depends(get_service)):
+    tree = await run_in_threadpool(service.get_tree, oid)
     if not tree:
          raise HTTPException(status_code=404, detail="Tree not found")
     return tree
 
-@app.get("/api/blob/{oid}", response_model=BlobResponse)
-def get_blob(oid: str):
-    blob = service.get_blob(oid)
+@router.get("/tree/{oid}/recursive")
+async def get_tree_recursive(
+    oid: str,
+    prefix: str = "",
+    max_depth: Optional[int] = Query(None, ge=1),
+    service: GitService = Depends(get_service),
+):
+    """Recursive listing of a tree (or a commit's tree) as NDJSON, one entry per line."""
+    lines = await run_in_threadpool(service.list_tree_recursive, oid, prefix, max_depth)
+    if lines is None:
+        raise HTTPException(status_code=404, detail="Tree not found")
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@router.get("/blob/{oid}", response_model=BlobResponse)
+async def get_blob(oid: str, service: GitService = Depends(get_service)):
+    blob = await run_in_threadpool(service.get_blob, oid)
     if not blob:
         raise HTTPException(status_code=404, detail="Blob not found")
     return blob
 
+# Upper bound on objects per batch request, to keep single responses bounded.
+MAX_BATCH_OBJECTS = 1000
+
+@router.post("/objects", response_model=ObjectsResponse, response_model_exclude_none=True)
+async def get_objects(req: ObjectsRequest, service: GitService = Depends(get_service)):
+    """Resolve many commits/trees/blobs in one round trip, with per-object errors."""
+    if len(req.objects) > MAX_BATCH_OBJECTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_OBJECTS} objects per request")
+    objects = await run_in_threadpool(service.get_objects, req.objects)
+    return ObjectsResponse(objects=objects)
+
+@app.get("/api/repos", response_model=RegistryResponse)
+async def list_repos():
+    """Registry state: per-repository memory, load and hit statistics."""
+    return RegistryResponse(
+        memory_budget=registry.memory_budget,
+        memory_bytes=registry.memory_usage(),
+        repos=registry.stats(),
+    )
+
+app.include_router(router, prefix="/api")
+app.include_router(router, prefix="/api/repos/{name}", dependencies=[Depends(repo_name)])
+
 @app.get("/health")
-def health_check():
+@app.get("/health/live")
+async def health_check():
+    """Liveness: the process is up and answering."""
     return {"status": "ok", "repo": str(service.git_dir)}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Counters and histograms in the Prometheus text exposition format."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/ready", response_model=ReadinessResponse, responses={503: {"model": ReadinessResponse}})
+async def readiness_check():
+    """Readiness: 200 once the DAG is loaded, 503 with progress while warming up."""
+    progress = service.warmup_progress()
+    body = ReadinessResponse(
+        status="ready" if progress["ready"] else "warming",
+        repo=str(service.git_dir),
+        mode=serve_mode,
+        building=progress["building"],
+        commits_loaded=progress["commits_loaded"],
+    )
+    return JSONResponse(status_code=200 if progress["ready"] else 503, content=jsonable_encoder(body))
+
 # --- Static File Serving (SPA Support) ---
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
@@ -0,0 +1,93 @@
+"""HTTP and per-repository metrics for the /metrics endpoint."""
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Tuple
+import time
+
+from src.utils.metrics import SIZE_BUCKETS, Family, Histogram
+
+if TYPE_CHECKING:
+    from src.api.service import GitService
+
+REQUEST_SECONDS = Histogram("tinygit_http_request_seconds", "Request latency by route template", ["method", "route", "status"])
+RESPONSE_BYTES = Histogram("tinygit_http_response_bytes", "Response body size by route template", ["method", "route"], buckets=SIZE_BUCKETS)
+
+def route_template(scope) -> str:
+    """The path template of the route that handled a request, including router prefixes.
+
+    Routes of an included router only know their own part of the path, so
+    the prefix is recovered from the request path, with the values of path
+    parameters put back as "{name}" placeholders.
+    """
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = scope["path"]
+    if route.path_regex.match(path):
+        return route.path
+    for i, char in enumerate(path):
+        if char == "/" and route.path_regex.match(path[i:]):
+            params = {str(v): k for k, v in scope.get("path_params", {}).items()}
+            parts = path[:i].split("/")
+            # Right to left, each value once: a repository named "api" must not replace "/api".
+            for j in reversed(range(len(parts))):
+                if parts[j] in params:
+                    parts[j] = "{%s}" % params.pop(parts[j])
+            return "/".join(parts) + route.path
+    return route.path
+
+class MetricsMiddleware:
+    """Times every HTTP request and counts the body bytes it sends.
+
+    Requests are labelled by the matched route's path template
+    ("/api/commits/{oid}"), so label values stay bounded however many
+    objects are requested. Written as plain ASGI so streamed responses are
+    measured to their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+        size = 0
+
+        async def send_and_count(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_count)
+        finally:
+            route = route_template(scope)
+            method = scope["method"]
+            REQUEST_SECONDS.labels(method=method, route=route, status=status).observe(time.perf_counter() - start)
+            RESPONSE_BYTES.labels(method=method, route=route).observe(size)
+
+def service_collector(services: Callable[[], Iterable[Tuple[str, "GitService"]]]) -> Callable[[], Iterator[Family]]:
+    """A registry collector reporting cache and DAG statistics of `services()` at scrape time."""
+
+    def collect() -> Iterator[Family]:
+        hits, misses, ratios, commits, builds = [], [], [], [], []
+        for repo, service in services():
+            for name, cache in service.caches().items():
+                labels = {"repo": repo, "cache": name}
+                hits.append((labels, cache.hits))
+                misses.append((labels, cache.misses))
+                lookups = cache.hits + cache.misses
+                ratios.append((labels, cache.hits / lookups if lookups else 0.0))
+            commits.append(({"repo": repo}, len(service.dag)))
+            builds.append(({"repo": repo}, service.build_count))
+        yield "tinygit_cache_hits_total", "counter", "Cache lookups that found a value", hits
+        yield "tinygit_cache_misses_total", "counter", "Cache lookups that missed", misses
+        yield "tinygit_cache_hit_ratio", "gauge", "Hits over lookups since startup", ratios
+        yield "tinygit_dag_commits", "gauge", "Commits in the loaded DAG", commits
+        yield "tinygit_dag_builds_total", "counter", "DAG snapshots built or loaded", builds
+
+    return collect
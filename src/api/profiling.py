@@ -0,0 +1,111 @@
+"""Per-request profiling for diagnosing slow requests on production data.
+
+Disabled unless PROFILE_TOKEN is set. A request carrying
+`X-Profile: <token>` then gets a `Server-Timing` header with the stages
+it went through: refs, read_object, dag_build, topo_sort, index,
+snapshot_load/save, the route handler, and `respond` (response model
+validation and JSON encoding after the handler returns). Adding
+`X-Profile-Format: cprofile` replaces the response with a cProfile dump,
+for `python -m pstats` or snakeviz. It merges the request's threadpool
+work with the event loop thread over the request's lifetime; the latter
+also includes whatever other requests ran on the loop meanwhile, so
+profile on a quiet instance.
+"""
+from typing import Any, Callable, List, Optional
+import asyncio
+import functools
+import hmac
+import time
+
+from fastapi.concurrency import run_in_threadpool as _run_in_threadpool
+from fastapi.routing import APIRoute
+
+from src.utils.profiling import RequestProfile, current_profile, profiling
+
+PROFILE_HEADER = b"x-profile"
+FORMAT_HEADER = b"x-profile-format"
+
+async def run_in_threadpool(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """fastapi's run_in_threadpool, running `fn` under the request's cProfile if it has one."""
+    profile = current_profile()
+    if profile is not None and profile.cprofile:
+        return await _run_in_threadpool(profile.call, fn, *args, **kwargs)
+    return await _run_in_threadpool(fn, *args, **kwargs)
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    if not asyncio.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def timed(*args, **kwargs):
+        profile = current_profile()
+        if profile is None:
+            return await endpoint(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            profile.handler_done = time.perf_counter()
+            profile.add("handler", profile.handler_done - start)
+    return timed
+
+class ProfiledRoute(APIRoute):
+    """An APIRoute that records its handler's time in the active request profile."""
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+class ProfileMiddleware:
+    def __init__(self, app, token: Optional[str]):
+        self.app = app
+        self.token = token.encode() if token else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.token is None:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        given = headers.get(PROFILE_HEADER)
+        if given is None or not hmac.compare_digest(given, self.token):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(cprofile=headers.get(FORMAT_HEADER, b"").lower() == b"cprofile")
+        start = time.perf_counter()
+        status = 500
+
+        async def profiled_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile.handler_done is not None:
+                    profile.add("respond", time.perf_counter() - profile.handler_done)
+            if profile.cprofile:
+                # The real response is dropped; the dump replaces it once the app is done.
+                return
+            if message["type"] == "http.response.start":
+                profile.add("total", time.perf_counter() - start)
+                message = {**message, "headers": list(message.get("headers", [])) + [
+                    (b"server-timing", profile.server_timing().encode()),
+                ]}
+            await send(message)
+
+        with profiling(profile), profile.profile_thread():
+            await self.app(scope, receive, profiled_send)
+
+        if profile.cprofile:
+            await self._send_dump(profile, status, start, send)
+
+    async def _send_dump(self, profile: RequestProfile, status: int, start: float, send):
+        profile.add("total", time.perf_counter() - start)
+        body = profile.dump()
+        headers: List = [
+            (b"content-type", b"application/octet-stream"),
+            (b"content-disposition", f'attachment; filename="request-{int(time.time())}.pstats"'.encode()),
+            (b"content-length", str(len(body)).encode()),
+            (b"server-timing", profile.server_timing().encode()),
+            # Status of the response the dump replaced
+            (b"x-profile-status", str(status).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
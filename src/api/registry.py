@@ -0,0 +1,130 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import re
+import threading
+import time
+
+from src.api.service import GitService
+from src.api.schemas import RepoStatsResponse
+
+# Repository names are single path components; anything else could escape the root.
+_VALID_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+@dataclass
+class RepoStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    last_access: float = 0.0
+
+class RepoRegistry:
+    """Lazily created GitService instances for every repository under a root.
+
+    Services are kept in LRU order. When the combined size of the loaded DAGs
+    and the services' object caches exceeds the memory budget, the least
+    recently used services drop both; the service object itself stays
+    registered and reloads on its next request. The budget is checked after
+    every refresh of a service (which includes its first load) and after
+    every request (see main.get_service), since caches grow between refreshes.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        memory_budget: int,
+        snapshot_dir: Optional[Path] = None,
+        commit_index: bool = False,
+        shared_dag: bool = False,
+    ):
+        self.root = root.resolve()
+        self.memory_budget = memory_budget
+        self.snapshot_dir = snapshot_dir
+        self.commit_index = commit_index
+        self.shared_dag = shared_dag
+        self._services: "OrderedDict[str, GitService]" = OrderedDict()
+        self._stats: Dict[str, RepoStats] = {}
+        self._lock = threading.Lock()
+
+    def resolve_git_dir(self, name: str) -> Optional[Path]:
+        """Maps a repository name to its git dir (work tree or bare layout)."""
+        if not _VALID_NAME.match(name):
+            return None
+        repo = self.root / name
+        if (repo / ".git").is_dir():
+            return repo / ".git"
+        if (repo / "HEAD").is_file() and (repo / "objects").is_dir():
+            return repo
+        return None
+
+    def get(self, name: str) -> Optional[GitService]:
+        """Returns the service for `name`, creating it on first use."""
+        with self._lock:
+            service = self._services.get(name)
+            if service is None:
+                git_dir = self.resolve_git_dir(name)
+                if git_dir is None:
+                    return None
+                service = GitService(git_dir, self.snapshot_dir, commit_index=self.commit_index, shared_dag=self.shared_dag)
+                service.on_refresh = lambda name=name: self.enforce_budget(keep=name)
+                self._services[name] = service
+                self._stats[name] = RepoStats()
+            self._services.move_to_end(name)
+            stats = self._stats[name]
+            if service.is_loaded:
+                stats.hits += 1
+            else:
+                stats.misses += 1
+            stats.last_access = time.time()
+            return service
+
+    def enforce_budget(self, keep: Optional[str] = None) -> List[str]:
+        """Evicts DAGs and object caches in LRU order until the total fits the budget.
+
+        `keep` is never evicted (typically the repository that was just loaded).
+        Returns the names that were evicted.
+        """
+        evicted = []
+        with self._lock:
+            total = sum(s.memory_usage() for s in self._services.values())
+            for name, service in self._services.items():
+                if total <= self.memory_budget:
+                    break
+                usage = service.memory_usage()
+                if name == keep or not usage:
+                    continue
+                total -= usage
+                service.evict()
+                self._stats[name].evictions += 1
+                evicted.append(name)
+        return evicted
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(s.memory_usage() for s in self._services.values())
+
+    def services(self) -> List[Tuple[str, GitService]]:
+        """(name, service) for every repository created so far."""
+        with self._lock:
+            return list(self._services.items())
+
+    def stats(self) -> List[RepoStatsResponse]:
+        """Per-repository statistics, most recently used first."""
+        with self._lock:
+            return [
+                RepoStatsResponse(
+                    name=name,
+                    git_dir=str(service.git_dir),
+                    loaded=service.is_loaded,
+                    commits=len(service.dag),
+                    memory_bytes=service.memory_usage(),
+                    cache_bytes=service.cache_bytes(),
+                    builds=service.build_count,
+                    hits=self._stats[name].hits,
+                    misses=self._stats[name].misses,
+                    evictions=self._stats[name].evictions,
+                    last_access=self._stats[name].last_access,
+                )
+                for name, service in reversed(self._services.items())
+            ]
@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 
 class CommitResponse(BaseModel):
@@ -42,3 +42,153 @@ class CreateCommitRequest(BaseModel):
     message: str
     author_name: str = "User"
     author_email: str = "user@example.com"
+
+class BatchFile(BaseModel):
+    # Exactly one of: UTF-8 text, base64 bytes, or the oid of an existing blob
+    content: Optional[str] = None
+    content_base64: Optional[str] = None
+    oid: Optional[str] = None
+    mode: str = "100644"
+
+class BatchCommit(BaseModel):
+    message: str
+    author_name: str = "User"
+    author_email: str = "user@example.com"
+    committer_name: Optional[str] = None
+    committer_email: Optional[str] = None
+    # Epoch seconds; defaults to the time of the request
+    timestamp: Optional[int] = None
+    timezone: str = "+0000"
+    # Commit oids, or ":<n>" for the n-th (0-based) commit earlier in the batch.
+    # Defaults to the previous commit in the batch, or the branch tip for the first.
+    parents: Optional[List[str]] = None
+    # Use this tree as-is instead of applying `files`
+    tree: Optional[str] = None
+    # Changes on top of the first parent's tree; null deletes a path
+    files: Dict[str, Optional[BatchFile]] = {}
+
+class BatchCommitsRequest(BaseModel):
+    # Branch to advance; defaults to the branch HEAD points at
+    branch: Optional[str] = None
+    commits: List[BatchCommit]
+
+class BatchCommitsResponse(BaseModel):
+    ref: str
+    oids: List[str]
+    # Objects that were not in the repository before
+    objects_written: int
+
+class BlobUploadResponse(BaseModel):
+    oid: str
+    size: int
+
+class RepackResponse(BaseModel):
+    packed: int
+    pruned: int
+    pack: Optional[str] = None
+    pack_size: int = 0
+
+class RepoStatsResponse(BaseModel):
+    name: str
+    git_dir: str
+    loaded: bool
+    commits: int
+    memory_bytes: int # DAG plus cache_bytes
+    cache_bytes: int # parsed objects cached
+    builds: int
+    hits: int
+    misses: int
+    evictions: int
+    last_access: float
+
+class RegistryResponse(BaseModel):
+    memory_budget: int
+    memory_bytes: int
+    repos: List[RepoStatsResponse]
+
+class ReadinessResponse(BaseModel):
+    status: str # 'ready' or 'warming'
+    repo: str
+    mode: str
+    building: bool
+    commits_loaded: int
+
+class ObjectRequest(BaseModel):
+    oid: str
+    # Keys of the object's data to return, e.g. ["oid", "size"] to skip blob
+    # content. All fields when omitted.
+    fields: Optional[List[str]] = None
+
+class ObjectsRequest(BaseModel):
+    objects: List[ObjectRequest]
+
+class ObjectResult(BaseModel):
+    oid: str
+    type: Optional[str] = None # 'commit', 'tree' or 'blob'; None on error
+    # CommitResponse / BlobResponse fields, or {"oid", "entries"} for trees
+    data: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class ObjectsResponse(BaseModel):
+    objects: List[ObjectResult]
+
+class DiffEntryResponse(BaseModel):
+    status: str # 'A', 'D', 'M', 'R' (renamed) or 'C' (copied)
+    path: str
+    old_path: Optional[str] = None
+    similarity: Optional[int] = None
+    old_oid: Optional[str] = None
+    new_oid: Optional[str] = None
+    old_mode: Optional[str] = None
+    new_mode: Optional[str] = None
+    # Unified diff, only when line diffs were requested and both sides are text
+    patch: Optional[str] = None
+    binary: bool = False
+
+class DiffResponse(BaseModel):
+    old_tree: Optional[str]
+    new_tree: str
+    commit: Optional[str] = None
+    parent: Optional[str] = None
+    files: List[DiffEntryResponse]
+
+class BlameRangeResponse(BaseModel):
+    start: int # 1-based line in the blamed file
+    count: int
+    commit: str
+    orig_start: int # 1-based line in `commit`'s version of the file
+
+class BlameResponse(BaseModel):
+    commit: str
+    path: str
+    ranges: List[BlameRangeResponse]
+    # Details of every commit referenced by `ranges`
+    commits: Dict[str, CommitResponse]
+
+class SearchResponse(BaseModel):
+    # Number of matching commits, of which `commits` is one page
+    total: int
+    commits: List[CommitResponse]
+
+class WeekStats(BaseModel):
+    week: str # Monday (UTC) the week starts on, YYYY-MM-DD
+    commits: int
+    merges: int
+    files_changed: int
+
+class AuthorStats(BaseModel):
+    name: str
+    email: str
+    commits: int
+    merges: int
+    files_changed: int
+    weeks: Dict[str, int] # week -> commits
+
+class StatsResponse(BaseModel):
+    commits: int
+    merges: int
+    merge_ratio: float
+    files_changed: int
+    churn_pending: int = 0 # commits whose files_changed are not counted yet
+    weeks: List[WeekStats] # oldest first
+    authors: List[AuthorStats] # most commits first
@@ -1,19 +1,100 @@
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import Callable, List, Mapping, Optional, Dict, Iterable, Iterator, Sequence, Tuple
 from datetime import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import asyncio
+import contextvars
+import itertools
+import threading
 import time
 from src.dag.builder import DagBuilder, topological_sort
-from src.dag.refs import resolve_head, get_branches
-from src.git_objects.models import CommitObject, TreeObject, BlobObject
-from src.git_objects.parser import read_object
+from src.dag.refs import get_branches, get_ref_tips
+from src.dag.snapshot import SnapshotError, attach_snapshot, write_snapshot
+from src.git_objects.dircache import DirCacheError, IndexLock, build_tree, read_index
+from src.git_objects.models import GitObject, CommitObject, TreeObject, BlobObject, estimate_object_bytes
+from src.git_objects.store import ObjectStore, release_store, store_for
+from src.git_objects.paths import PathResolver, is_tree_mode, resolve_path
+from src.git_objects.repack import repack as repack_objects
+from src.git_objects.writer import ObjectBatch, apply_tree_changes, write_object_stream
+from src.dag.history import path_history
+import base64
+import binascii
+import dataclasses
 import hashlib
-import zlib
-from src.dag.models import CommitNode
-from src.api.schemas import CommitResponse, GraphResponse, GraphNode, GraphEdge, TreeEntryResponse, BlobResponse, CreateCommitRequest
+import json
+import re
+from src.dag.models import CommitNode, DagSnapshot, estimate_dag_bytes
+from src.api.commit_queue import CommitQueue, WriteGroup
+from src.api.schemas import CommitResponse, GraphResponse, GraphNode, GraphEdge, TreeEntryResponse, BlobResponse, CreateCommitRequest, ObjectRequest, ObjectResult, DiffEntryResponse, DiffResponse, BlameRangeResponse, BlameResponse, SearchResponse, BatchCommitsRequest, BatchCommitsResponse, BatchFile, BlobUploadResponse, RepackResponse, StatsResponse
+from src.diff.blame import blame
+from src.diff.renames import RenameOptions, detect_renames
+from src.diff.tree_diff import DiffEntry, diff_trees, unified_line_diff
+from src.index.base import CommitIndexer, IndexSet
+from src.index.identity import IdentityIndex
+from src.index.sqlite import CommitRecord, SqliteCommitIndex
+from src.index.stats import StatsIndex
+from src.index.text import TextIndex
+from src.utils.cache import LRUCache
+from src.utils.profiling import current_profile, spanned
 import shutil
 
 import os
 import stat
+import logging
+
+try:
+    import fcntl
+except ImportError:
+    # No build election (Windows): every worker builds and publishes its own.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "tinygit-dag.snap"
+COMMIT_INDEX_FILE = "tinygit-commits.db"
+SHARED_LOCK_FILE = "tinygit-dag.lock"
+# Workers sharing a snapshot look for a newer published one at most this often.
+SHARED_POLL_INTERVAL = 1.0
+# Incremental refreshes only rewrite the on-disk snapshot once this many commits
+# have accumulated; whatever is missing is re-walked from the refs on load.
+SNAPSHOT_SAVE_INTERVAL = 1000
+
+# Parsed objects kept per repository; trees and small blobs are re-read a lot
+# while browsing and objects never change once written. Bounded by count and
+# by their estimated size, which counts towards the registry's memory budget.
+OBJECT_CACHE_SIZE = 4096
+OBJECT_CACHE_BYTES = 64 * 1024 * 1024
+MAX_CACHED_BLOB_SIZE = 1024 * 1024
+# Fully expanded subtree listings, keyed by tree oid. A subtree shared by many
+# commits is expanded once.
+TREE_LISTING_CACHE_SIZE = 512
+# Streamed listings are sent in chunks of this many lines.
+LISTING_CHUNK_SIZE = 256
+# Similarity sketches for rename detection, keyed by blob oid.
+SKETCH_CACHE_SIZE = 8192
+# Path lookups per (root tree, path) and name indexes per tree, shared by
+# history and blame walks.
+PATH_CACHE_SIZE = 65536
+TREE_INDEX_CACHE_SIZE = 4096
+# Finished blame results keyed by (commit, path); also the starting point for
+# blaming newer commits.
+BLAME_CACHE_SIZE = 1024
+# Trees read while counting churn for the statistics; consecutive commits
+# mostly share their subtrees. Kept apart from `objects` so indexing a whole
+# history doesn't evict what browsing uses.
+STATS_TREE_CACHE_SIZE = 4096
+STATS_TREE_CACHE_BYTES = 16 * 1024 * 1024
+# Commits whose churn one background step counts; refreshes queued meanwhile run between steps.
+CHURN_BATCH = 256
+
+_HEX_OID = re.compile(r"^[0-9a-f]{40}$")
+_VALID_BRANCH = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._/-]*$")
+# Regular, executable and symlink blobs, and gitlinks (submodules).
+_FILE_MODES = ("100644", "100755", "120000", "160000")
+
+# (path relative to the listed tree, mode, type, oid, depth starting at 1)
+ListingEntry = Tuple[str, str, str, str, int]
 
 def force_rmtree(path: Path):
     """Recursively delete a directory, handling read-only files."""
@@ -37,43 +118,643 @@ def force_rmtree(path: Path):
     shutil.rmtree(path, onerror=on_error)
 
 class GitService:
-    def __init__(self, git_dir: Path = Path(".git")):
+    def __init__(
+        self,
+        git_dir: Path = Path(".git"),
+        snapshot_dir: Optional[Path] = None,
+        store: Optional[ObjectStore] = None,
+        commit_index: bool = False,
+        shared_dag: bool = False,
+    ):
         self.git_dir = git_dir.resolve()
-        self.builder = DagBuilder(self.git_dir)
-        self.dag: Dict[str, CommitNode] = {}
-        self.sorted_commits: List[CommitNode] = []
+        # Objects come from `store` if given (e.g. store.memory_backed to serve
+        # from RAM); refs, the index and snapshots always live in git_dir.
+        self._store = store
+        self.builder = DagBuilder(self.git_dir, store)
+        # The DAG snapshot lives in the git dir unless a separate cache dir is
+        # given (e.g. when the repository is mounted read-only).
+        self.snapshot_dir = snapshot_dir
+        self._persisted_size = 0
+        # With shared_dag, the DAG is served from the published snapshot file,
+        # mapped read-only and shared by every worker process of the
+        # repository; one of them (holding the build lock) builds new versions.
+        self.shared_dag = shared_dag
+        self._published: Optional[Tuple[int, int]] = None
+        self._next_poll = 0.0
+        self.objects = LRUCache(OBJECT_CACHE_SIZE, estimate_object_bytes, OBJECT_CACHE_BYTES)
+        self.listings = LRUCache(TREE_LISTING_CACHE_SIZE)
+        self.sketches = LRUCache(SKETCH_CACHE_SIZE)
+        self.paths = PathResolver(self.read, LRUCache(PATH_CACHE_SIZE), LRUCache(TREE_INDEX_CACHE_SIZE))
+        self.blames = LRUCache(BLAME_CACHE_SIZE)
+        self.stats_trees = LRUCache(STATS_TREE_CACHE_SIZE, estimate_object_bytes, STATS_TREE_CACHE_BYTES)
+        # The secondary indexes (text, identity, stats) belong to each
+        # snapshot, see _new_indexes. The last stats response, per index and version:
+        self._stats: Optional[Tuple[StatsIndex, int, StatsResponse]] = None
+        # Optional persistent index that answers get_commit(s) without the DAG.
+        # There is one per repository, not per snapshot: it answers only for
+        # the ref tips it was brought up to date with.
+        self.commit_index: Optional[SqliteCommitIndex] = None
+        if commit_index:
+            self.commit_index = SqliteCommitIndex(self._cache_file(COMMIT_INDEX_FILE, ".db"))
+        # Ref tips read when commit_index is first consulted with no snapshot loaded.
+        self._index_ref_tips: Optional[Dict[str, str]] = None
+        # Serializes changes to commit_index between refreshes and catch-ups.
+        self._commit_index_lock = threading.Lock()
+        # Readers always go through the current snapshot; refreshes build a new
+        # one off to the side and swap it in with a single assignment.
+        self._snapshot = DagSnapshot()
+        self._lock = threading.Lock()
+        self._queued: Optional[Future] = None
+        self._running: Optional[Future] = None
+        self._epoch = 0
+        self.build_count = 0
+        # One worker: at most one build runs at a time per repository.
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dag-refresh")
+        # Whether a churn counting step (see _count_churn) is waiting on the executor.
+        self._churn_queued = False
+        # Likewise a single writer, which groups concurrent commits.
+        self.writes = CommitQueue(self)
+        # Called on the refresh worker after each new snapshot is swapped in;
+        # RepoRegistry uses it to keep the registry within its memory budget.
+        self.on_refresh: Optional[Callable[[], None]] = None
         
     # seed_repo method removed
 
-    def refresh(self):
-        """Rebuilds the cache."""
-        self.dag = self.builder.build_dag()
-        self.sorted_commits = topological_sort(self.dag)
+    @property
+    def store(self) -> ObjectStore:
+        return self._store if self._store is not None else store_for(self.git_dir)
+
+    def caches(self) -> Dict[str, LRUCache]:
+        """The service's caches by name, for hit-rate reporting."""
+        return {
+            "objects": self.objects,
+            "listings": self.listings,
+            "sketches": self.sketches,
+            "paths": self.paths.paths,
+            "trees": self.paths.trees,
+            "blames": self.blames,
+            "stats_trees": self.stats_trees,
+        }
+
+    @property
+    def dag(self) -> Dict[str, CommitNode]:
+        return self._snapshot.dag
+
+    # The indexes of the live snapshot; readers should go through the snapshot
+    # they serve (snapshot.indexes) instead.
+    @property
+    def text_index(self) -> TextIndex:
+        return self._snapshot.indexes["text"]
+
+    @property
+    def identity_index(self) -> IdentityIndex:
+        return self._snapshot.indexes["identity"]
+
+    @property
+    def stats_index(self) -> StatsIndex:
+        return self._snapshot.indexes["stats"]
+
+    def _new_indexes(self) -> IndexSet:
+        """An empty set of the per-snapshot indexes; _index_commits fills it."""
+        return IndexSet({
+            "text": TextIndex(),
+            "identity": IdentityIndex(),
+            "stats": StatsIndex(self._read_for_stats),
+        })
+
+    @property
+    def sorted_commits(self) -> List[CommitNode]:
+        return self._snapshot.sorted_commits
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._snapshot.loaded
+
+    def request_refresh(self) -> "Future[DagSnapshot]":
+        """Schedules a rebuild and returns a future for its snapshot.
+
+        Callers arriving while a rebuild is queued but not yet started share it,
+        so a burst of requests costs one build. The future only resolves with a
+        build that started after this call, which makes it safe to use after a
+        write.
+        """
+        with self._lock:
+            if self._queued is None:
+                self._queued = Future()
+                # The build runs in the context of the request that queued it,
+                # so a profiled request sees the DAG work it caused.
+                self._executor.submit(contextvars.copy_context().run, self._run_refresh)
+            return self._queued
+
+    def _run_refresh(self):
+        with self._lock:
+            future, self._queued = self._queued, None
+            self._running = future
+            epoch = self._epoch
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            profile = current_profile()
+            snapshot = profile.call(self._build_snapshot) if profile else self._build_snapshot()
+        except BaseException as e:
+            with self._lock:
+                self._running = None
+            future.set_exception(e)
+            return
+        with self._lock:
+            # Don't resurrect a repository that was reset while we were building.
+            if epoch == self._epoch:
+                self._snapshot = snapshot
+                if self.commit_index is not None:
+                    self.commit_index.mark_current(snapshot.tips)
+            self.build_count += 1
+            self._running = None
+        try:
+            # Before resolving, so whoever waits for the refresh sees the budget enforced.
+            if self.on_refresh is not None:
+                self.on_refresh()
+        finally:
+            future.set_result(snapshot)
+        self._schedule_churn(self._snapshot.indexes)
+
+    def _schedule_churn(self, indexes: Mapping[str, CommitIndexer]):
+        """Counts the churn the stats index has queued on the refresh worker, after the swap.
+
+        Diffing trees would otherwise hold up the build (and a cold
+        readiness check) for every new commit; the counters are exact
+        meanwhile and /stats reports how many commits still lack churn.
+        """
+        if "stats" not in indexes or not indexes.is_filled("stats") or not indexes["stats"].churn_pending:
+            return
+        with self._lock:
+            if self._churn_queued:
+                return
+            self._churn_queued = True
+            self._executor.submit(self._count_churn, indexes)
+
+    def _count_churn(self, indexes: IndexSet):
+        with self._lock:
+            self._churn_queued = False
+            # A snapshot with new indexes has its own queue; this one is no longer served.
+            if self._snapshot.indexes is not indexes:
+                return
+        if indexes["stats"].count_churn(CHURN_BATCH):
+            self._schedule_churn(indexes)
+
+    def _build_snapshot(self) -> DagSnapshot:
+        tips = get_ref_tips(self.git_dir)
+        if self.shared_dag:
+            return self._build_shared(tips)
+        base = self._snapshot if self._snapshot.loaded else self._load_persisted()
+        if base is not None:
+            if base.tips == tips:
+                return base
+            snapshot = self._extend_snapshot(base, tips)
+            if snapshot is not None:
+                if len(snapshot.dag) - self._persisted_size >= SNAPSHOT_SAVE_INTERVAL:
+                    self._persist(snapshot)
+                    if not isinstance(snapshot.dag, dict):
+                        # Fold the layer of new commits into a fresh mapping.
+                        snapshot = self._attach_published(tips, indexes=snapshot.indexes) or snapshot
+                return snapshot
+        return self._full_build(tips)
+
+    def _full_build(self, tips: Dict[str, str]) -> DagSnapshot:
+        dag = self.builder.build_dag(tips)
+        snapshot = DagSnapshot(
+            dag=dag,
+            sorted_commits=topological_sort(dag),
+            loaded=True,
+            tips=tips,
+            approx_bytes=estimate_dag_bytes(dag),
+            indexes=self._new_indexes(),
+        )
+        self._index_commits(snapshot.indexes, snapshot.sorted_commits, reset=True)
+        self._persist(snapshot)
+        return snapshot
+
+    def _build_shared(self, tips: Dict[str, str]) -> DagSnapshot:
+        current = self._snapshot
+        if current.loaded and current.tips == tips:
+            return current
+        snapshot = self._attach_published(tips)
+        if snapshot is not None:
+            return snapshot
+        with self._build_lock():
+            # Whoever held the lock before us may just have published these tips.
+            snapshot = self._attach_published(tips)
+            if snapshot is not None:
+                return snapshot
+            base = current if current.loaded else self._attach_published()
+            snapshot = None
+            if base is not None:
+                snapshot = self._extend_snapshot(base, tips)
+                if snapshot is not None:
+                    self._persist(snapshot)
+            if snapshot is None:
+                snapshot = self._full_build(tips)
+            # Serve the published file like the other workers and drop the
+            # private copy; keep it if publishing failed.
+            return self._attach_published(snapshot.tips, indexes=snapshot.indexes) or snapshot
+
+    @contextmanager
+    def _build_lock(self) -> Iterator[None]:
+        """Elects one builder among the processes sharing this repository's snapshot."""
+        if fcntl is None:
+            yield
+            return
+        try:
+            f = open(self._cache_file(SHARED_LOCK_FILE, ".lock"), "ab")
+        except OSError:
+            # Nowhere to publish to either; just build.
+            yield
+            return
+        with f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+    @spanned("snapshot_load")
+    def _attach_published(self, tips: Optional[Dict[str, str]] = None, indexes: Optional[IndexSet] = None) -> Optional[DagSnapshot]:
+        """Maps the published snapshot, if there is one built from `tips` (any, if None).
+
+        The snapshot gets `indexes` if given (those of the snapshot that was
+        just published), else a new set that fills itself from the file's
+        sections when first used.
+        """
+        path = self.snapshot_path
+        try:
+            published = os.stat(path)
+            published_tips, dag, sections = attach_snapshot(path)
+        except OSError:
+            return None
+        except SnapshotError as e:
+            logger.warning(f"Ignoring DAG snapshot {path}: {e}")
+            return None
+        if tips is not None and published_tips != tips:
+            return None
+        if indexes is None:
+            indexes = self._new_indexes()
+            self._index_commits(indexes, dag.sorted_commits, reset=True, sections=sections)
+        self._published = (published.st_ino, published.st_mtime_ns)
+        self._persisted_size = len(dag)
+        return DagSnapshot(dag=dag, sorted_commits=dag.sorted_commits, loaded=True, tips=published_tips,
+                           approx_bytes=dag.nbytes, indexes=indexes)
+
+    def _poll_published(self):
+        """Queues a refresh if another worker has published a new snapshot."""
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + SHARED_POLL_INTERVAL
+        try:
+            published = os.stat(self.snapshot_path)
+        except OSError:
+            return
+        if (published.st_ino, published.st_mtime_ns) != self._published:
+            self.request_refresh()
+
+    @spanned("index")
+    def _index_commits(
+        self,
+        indexes: IndexSet,
+        nodes: Sequence[CommitNode],
+        reset: bool = False,
+        sections: Optional[Dict[bytes, bytes]] = None,
+    ):
+        """Feeds `nodes` to `indexes` and the commit index.
+
+        With `reset`, `nodes` are all the commits of a new snapshot and
+        `indexes` a new set, which fills itself from `sections` (or `nodes`)
+        when first used; the commit index starts over unless `sections`
+        holds a copy it can load.
+        """
+        if reset:
+            indexes.fill(nodes, sections)
+        else:
+            indexes.add_commits(nodes)
+        index = self.commit_index
+        if index is None:
+            return
+        with self._commit_index_lock:
+            data = sections.get(index.section) if sections else None
+            if data is not None:
+                try:
+                    index.load(data)
+                    return
+                except Exception as e:
+                    logger.warning(f"Rebuilding {type(index).__name__}: stored index unreadable ({e})")
+            if reset:
+                index.reset()
+            index.add_commits(nodes)
+
+    def _extend_snapshot(self, base: DagSnapshot, tips: Dict[str, str]) -> Optional[DagSnapshot]:
+        extended = self.builder.extend_dag(base.dag, base.tips, tips)
+        if extended is None:
+            return None
+        dag, new_nodes = extended
+        # Nothing in the old graph can have a new commit as its parent, so the
+        # new segment simply goes in front of the existing order.
+        new_commits = topological_sort(new_nodes)
+        self._index_commits(base.indexes, new_commits)
+        if isinstance(dag, dict):
+            sorted_commits = new_commits + [dag[node.oid] for node in base.sorted_commits]
+        else:
+            # A LayeredDag over the mapped snapshot orders itself.
+            sorted_commits = dag.sorted_commits
+        return DagSnapshot(
+            dag=dag,
+            sorted_commits=sorted_commits,
+            loaded=True,
+            tips=tips,
+            approx_bytes=base.approx_bytes + estimate_dag_bytes(new_nodes),
+            indexes=base.indexes,
+        )
+
+    def _cache_file(self, name: str, suffix: str) -> Path:
+        if self.snapshot_dir is None:
+            return self.git_dir / name
+        # One cache dir can hold snapshots for many repositories.
+        key = hashlib.sha1(str(self.git_dir).encode()).hexdigest()[:16]
+        return self.snapshot_dir / f"{key}{suffix}"
+
+    @property
+    def snapshot_path(self) -> Path:
+        return self._cache_file(SNAPSHOT_FILE, ".snap")
+
+    def _load_persisted(self) -> Optional[DagSnapshot]:
+        """The snapshot file, attached (mapped, not decoded), or None if there is no usable one."""
+        if not self.snapshot_path.exists():
+            return None
+        return self._attach_published()
+
+    @spanned("snapshot_save")
+    def _persist(self, snapshot: DagSnapshot):
+        try:
+            sections = snapshot.indexes.sections()
+            if self.commit_index is not None:
+                sections[self.commit_index.section] = self.commit_index.dump()
+            write_snapshot(self.snapshot_path, snapshot.tips, snapshot.sorted_commits, sections)
+            self._persisted_size = len(snapshot.dag)
+        except OSError as e:
+            # Persisting is an optimisation; a read-only git dir must still work.
+            logger.warning(f"Could not write DAG snapshot {self.snapshot_path}: {e}")
+
+    def _pending_refresh(self) -> "Future[DagSnapshot]":
+        # A cold reader can join a build that is already running: any build
+        # is better than the empty snapshot.
+        with self._lock:
+            if self._running is not None:
+                return self._running
+        return self.request_refresh()
+
+    def refresh(self) -> DagSnapshot:
+        """Rebuilds the cache, blocking until the new snapshot is live."""
+        return self.request_refresh().result()
         
-    def ensure_loaded(self):
-        if not self.dag:
-            self.refresh()
+    def ensure_loaded(self) -> DagSnapshot:
+        snapshot = self._snapshot
+        if snapshot.loaded:
+            if self.shared_dag:
+                self._poll_published()
+            return snapshot
+        return self._pending_refresh().result()
+
+    async def ensure_loaded_async(self) -> DagSnapshot:
+        """Like ensure_loaded, but waits for the build without holding a thread."""
+        snapshot = self._snapshot
+        if snapshot.loaded:
+            if self.shared_dag:
+                self._poll_published()
+            return snapshot
+        return await asyncio.wrap_future(self._pending_refresh())
+
+    def warmup_progress(self) -> Dict[str, object]:
+        """Readiness state: whether a snapshot is live and how far a build has got."""
+        snapshot = self._snapshot
+        commits = len(snapshot.dag) if snapshot.loaded else self.builder.loaded_count
+        return {
+            "ready": snapshot.loaded,
+            "building": self._running is not None,
+            "commits_loaded": commits,
+        }
+
+    def memory_usage(self) -> int:
+        """Approximate bytes held by the current snapshot and the object caches."""
+        return self._snapshot.approx_bytes + self.cache_bytes()
+
+    def cache_bytes(self) -> int:
+        """Estimated size of the parsed objects cached for this repository."""
+        return self.objects.weight + self.stats_trees.weight
+
+    def evict(self):
+        """Frees what the service holds for other repositories; it starts over on its next request.
+
+        Drops the snapshot, empties every cache, unmaps the repository's
+        packs, closes the commit index's database connection and lets the
+        refresh and writer threads exit. Work already queued on them still
+        runs.
+        """
+        self.invalidate()
+        for cache in self.caches().values():
+            cache.clear()
+        if self._store is None:
+            release_store(self.git_dir)
+        if self.commit_index is not None:
+            self.commit_index.close()
+        with self._lock:
+            # Executors start their thread on first submit, so a fresh one costs nothing until used.
+            executor = self._executor
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dag-refresh")
+        executor.shutdown(wait=False)
+        self.writes.stop()
+
+    def invalidate(self):
+        """Drops the current snapshot and its indexes; the next reader triggers a rebuild.
+
+        The commit index is on disk and keeps serving an evicted DAG's
+        repository; a full rebuild resets it if it went stale.
+        """
+        with self._lock:
+            self._epoch += 1
+            self._snapshot = DagSnapshot()
+            self._index_ref_tips = None
+            self._published = None
+            self._stats = None
+
+    def _indexed_tips(self) -> Optional[Dict[str, str]]:
+        """The tips commit_index must be current for to answer queries, or None without one."""
+        if self.commit_index is None:
+            return None
+        snapshot = self._snapshot
+        if snapshot.loaded:
+            return snapshot.tips
+        if self._index_ref_tips is None:
+            self._index_ref_tips = get_ref_tips(self.git_dir)
+        return self._index_ref_tips
+
+    def serves_commits_from_index(self) -> bool:
+        """Whether get_commit(s) can currently answer without loading the DAG.
+
+        With no snapshot loaded, an index that is behind the refs is first
+        brought up to date from them (see _catch_up_commit_index).
+        """
+        tips = self._indexed_tips()
+        if tips is None:
+            return False
+        if self.commit_index.tips == tips:
+            return True
+        return not self._snapshot.loaded and self._catch_up_commit_index(tips)
+
+    @spanned("index")
+    def _catch_up_commit_index(self, tips: Dict[str, str]) -> bool:
+        """Adds the commits made since commit_index was current, walking from `tips` to the indexed ones.
+
+        Like extending a snapshot, but the index itself tells the walk where
+        to stop, so no DAG is built or loaded. Returns False, leaving the
+        index alone, if it was current for nothing or a ref was rewound; the
+        DAG has to be built then.
+        """
+        index = self.commit_index
+        with self._commit_index_lock:
+            old_tips = index.tips
+            if old_tips == tips:
+                return True
+            with self._lock:
+                # A refresh marks the index current only after adding its
+                # commits; interleaving with it would mix two sets of tips.
+                busy = self._running is not None or self._queued is not None
+            if old_tips is None or busy:
+                return False
+            # A builder of its own: a refresh may be using self.builder.
+            new_nodes = DagBuilder(self.git_dir, self._store).new_commits(index, old_tips, tips)
+            if new_nodes is None:
+                return False
+            index.add_commits(topological_sort(new_nodes))
+            index.mark_current(tips)
+            return index.tips == tips
 
     def get_commit(self, oid: str) -> Optional[CommitResponse]:
-        self.ensure_loaded()
-        node = self.dag.get(oid)
+        tips = self._indexed_tips()
+        if tips is not None:
+            record = self.commit_index.get(oid, tips)
+            if record is not None:
+                return self._record_response(record)
+            if self.commit_index.tips == tips:
+                return None
+        snapshot = self.ensure_loaded()
+        node = snapshot.dag.get(oid)
         if not node:
             return None
         return self._to_response(node)
 
-    def get_commits(self, limit: int = 50, skip: int = 0) -> List[CommitResponse]:
-        self.ensure_loaded()
+    def get_commits(
+        self,
+        limit: int = 50,
+        skip: int = 0,
+        author: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> List[CommitResponse]:
+        """One page of commits, newest first, optionally filtered.
+
+        `author` matches an author email or name exactly (case-insensitive);
+        `since`/`until` bound the committer time in epoch seconds, inclusive.
+        """
+        tips = self._indexed_tips()
+        if tips is not None:
+            records = self.commit_index.page(tips, limit, skip, author, since, until)
+            if records is not None:
+                return [self._record_response(record) for record in records]
+        snapshot = self.ensure_loaded()
+        if author is not None or since is not None or until is not None:
+            # The index may already hold commits from a refresh that is not live yet.
+            matches = [oid for oid in snapshot.indexes["identity"].select(author, since, until) if oid in snapshot.dag]
+            matches.sort(key=snapshot.position)
+            return [self._to_response(snapshot.dag[oid]) for oid in matches[skip : skip + limit]]
         # topological_sort returns newest first (children before parents) if using my previous logic
         # Slice the list
-        selection = self.sorted_commits[skip : skip + limit]
+        selection = snapshot.sorted_commits[skip : skip + limit]
         return [self._to_response(node) for node in selection]
 
+    def search_commits(self, query: str, limit: int = 50, skip: int = 0) -> SearchResponse:
+        """Commits whose message, author or committer match `query`, newest first."""
+        snapshot = self.ensure_loaded()
+        oids = snapshot.indexes["text"].search(query, snapshot.dag)
+        oids.sort(key=snapshot.position)
+        page = oids[skip : skip + limit]
+        return SearchResponse(total=len(oids), commits=[self._to_response(snapshot.dag[oid]) for oid in page])
+
+    def get_stats(self, author: Optional[str] = None) -> StatsResponse:
+        """Commit, merge and churn counts per week and per author, for the loaded refs.
+
+        Served from the counters of the snapshot's StatsIndex; only the first
+        request after they change pays for building the response. Churn is
+        counted in the background and may lag; `churn_pending` says by how
+        many commits. `author`
+        (an email, or a name) narrows `authors` down to that author.
+        """
+        indexes = self.ensure_loaded().indexes
+        index = indexes["stats"]
+        # Filling the index on first use queues the churn of all its commits.
+        self._schedule_churn(indexes)
+        cached = self._stats
+        if cached is None or cached[0] is not index or cached[1] != index.version:
+            version = index.version
+            cached = self._stats = (index, version, StatsResponse(**index.summary()))
+        stats = cached[2]
+        if author is None:
+            return stats
+        key = author.strip().lower()
+        matches = [a for a in stats.authors if a.email.lower() == key] or [a for a in stats.authors if a.name.lower() == key]
+        return stats.model_copy(update={"authors": matches})
+
+    def get_path_history(
+        self,
+        path: str,
+        start: Optional[str] = None,
+        limit: int = 50,
+        skip: int = 0,
+        full_history: bool = False,
+    ) -> Optional[List[CommitResponse]]:
+        """One page of the commits that touched `path`, walking back from `start` (default HEAD).
+
+        Returns None if the start commit is not in the DAG.
+        """
+        snapshot = self.ensure_loaded()
+        start = start or snapshot.tips.get("HEAD")
+        if start is None or start not in snapshot.dag:
+            return None
+        commits = path_history(snapshot, start, path, self.paths, full_history)
+        page = itertools.islice(commits, skip, skip + limit)
+        return [self._to_response(node) for node in page]
+
+    def get_blame(self, oid: str, path: str) -> Optional[BlameResponse]:
+        """Line authorship of `path` at commit `oid`; None if either is missing."""
+        snapshot = self.ensure_loaded()
+        path = "/".join(part for part in path.split("/") if part)
+        ranges = blame(snapshot, oid, path, self.paths, self.read, self.blames)
+        if ranges is None:
+            return None
+        commits = {r.commit: self._to_response(snapshot.dag[r.commit]) for r in ranges}
+        return BlameResponse(
+            commit=oid,
+            path=path,
+            ranges=[
+                BlameRangeResponse(start=r.start, count=r.count, commit=r.commit, orig_start=r.orig_start)
+                for r in ranges
+            ],
+            commits=commits,
+        )
+
     def get_graph_data(self) -> GraphResponse:
-        self.ensure_loaded()
+        snapshot = self.ensure_loaded()
         nodes = []
         edges = []
         
-        for oid, node in self.dag.items():
+        for oid, node in snapshot.dag.items():
             # Create Node
             # Use first line of message as label, truncated
             short_msg = node.commit.message.splitlines()[0][:30] if node.commit.message else ""
@@ -103,46 +784,32 @@ class GitService:
 
 
     def create_commit(self, req: CreateCommitRequest) -> CommitResponse:
-        # 1. Resolve Parent
-        head_oid = resolve_head(self.git_dir)
+        """Commits the staged files on top of HEAD, through the write queue."""
+        commit_oid = self.writes.submit(lambda group: self._commit_job(group, req)).result()
+        # The queue resolves once the refreshed DAG is live.
+        return self.get_commit(commit_oid)
+
+    def _commit_job(self, group: WriteGroup, req: CreateCommitRequest) -> str:
+        # 1. Resolve Parent (as left by earlier commits in the same group)
+        ref = self._head_ref()
+        head_oid = group.ref(ref)
         parent_oids = [head_oid] if head_oid else []
-        
+        batch = group.new_batch()
+
         # 2. Determine Tree
-        tree_oid = None
-        
         # Try to create tree from current index (staging area)
         # This allows the user to 'git add' files and then commit via UI
-        import subprocess
-        try:
-            # We must run this in the working directory (parent of .git)
-            # and point to the .git dir
-            proc = subprocess.run(
-                ["git", "--git-dir", str(self.git_dir), "write-tree"], 
-                cwd=self.git_dir.parent,
-                capture_output=True, 
-                check=True
-            )
-            tree_oid = proc.stdout.decode().strip()
-        except Exception as e:
-            print(f"Backend: git write-tree failed ({e}), falling back to HEAD's tree")
+        tree_oid = self._write_index_tree()
 
         # Fallback: if head exists, reuse its tree
         if not tree_oid and head_oid:
-            head_commit = read_object(head_oid, self.git_dir)
+            head_commit = batch.get(head_oid)
             if isinstance(head_commit, CommitObject):
                 tree_oid = head_commit.tree_oid
-        
+
         # Fallback: empty tree
         if not tree_oid:
-             # Create empty tree
-             tree = TreeObject(entries=[])
-             tree_data = tree.serialize()
-             tree_header = f"tree {len(tree_data)}\0".encode()
-             tree_store = tree_header + tree_data
-             tree_oid = hashlib.sha1(tree_store).hexdigest()
-             
-             # Write tree
-             self._write_loose_object(tree_oid, tree_store)
+            tree_oid = batch.add(TreeObject(entries=[]))
 
         # 3. Create Commit Object
         # Timestamp for uniqueness
@@ -150,7 +817,7 @@ class GitService:
         tz = "+0000"
         author_str = f"{req.author_name} <{req.author_email}> {ts} {tz}"
         committer_str = author_str
-        
+
         commit = CommitObject(
             tree_oid=tree_oid,
             parent_oids=parent_oids,
@@ -158,46 +825,179 @@ class GitService:
             committer=committer_str,
             message=req.message
         )
-        
-        # 4. Write Commit
-        commit_data = commit.serialize()
-        commit_header = f"commit {len(commit_data)}\0".encode()
-        commit_store = commit_header + commit_data
-        commit_oid = hashlib.sha1(commit_store).hexdigest()
-        
-        self._write_loose_object(commit_oid, commit_store)
-        
-        # 5. Update HEAD
-        # We assume main branch for now
-        # Check if HEAD is detached or ref
+        commit_oid = batch.add(commit)
+
+        # 4. Publish with the group: objects are written and the branch HEAD
+        # points at (or HEAD itself when detached) moved when the group commits.
+        group.set_ref(ref, commit_oid, batch)
+        return commit_oid
+
+    def _write_index_tree(self) -> Optional[str]:
+        """Tree of the staged files in .git/index, like `git write-tree`; None if there is no usable index.
+
+        Directories the index's cached tree still vouches for are reused, and
+        the refreshed cached tree is saved back so the next commit only
+        rebuilds the directories that change in between.
+        """
+        path = self.git_dir / "index"
+        if not path.exists():
+            return None
+        batch = ObjectBatch(self.store, self.read)
+        try:
+            try:
+                with IndexLock(path) as lock:
+                    index = read_index(path)
+                    tree_oid, changed = build_tree(index, batch.add, batch.contains)
+                    batch.write()
+                    if changed:
+                        lock.commit(index)
+                    return tree_oid
+            except FileExistsError:
+                # Someone (e.g. `git add`) is updating the index: use what is
+                # there, but leave saving the cached tree to a later commit.
+                index = read_index(path)
+                tree_oid, _ = build_tree(index, batch.add, batch.contains)
+                batch.write()
+                return tree_oid
+        except (OSError, DirCacheError) as e:
+            logger.warning(f"Could not build a tree from {path}, falling back to HEAD's tree: {e}")
+            return None
+
+    def create_commits(self, req: BatchCommitsRequest) -> BatchCommitsResponse:
+        """Creates a chain of commits in one go.
+
+        Trees and blobs are built in memory and only handed to the write
+        queue once the whole batch is valid, so a bad commit halfway leaves
+        the repository untouched. The branch is advanced once, to the last
+        commit, and the DAG is refreshed once.
+        """
+        ref = None
+        if req.branch is not None:
+            name = req.branch
+            if not _VALID_BRANCH.match(name) or ".." in name or "//" in name or name.endswith(("/", ".lock")):
+                raise ValueError(f"Invalid branch name: {req.branch}")
+            ref = f"refs/heads/{req.branch}"
+        return self.writes.submit(lambda group: self._batch_job(group, req, ref)).result()
+
+    def _batch_job(self, group: WriteGroup, req: BatchCommitsRequest, ref: Optional[str]) -> BatchCommitsResponse:
+        ref = ref or self._head_ref()
+        tip = group.ref(ref)
+        batch = group.new_batch()
+        now = int(time.time())
+        oids: List[str] = []
+        for i, c in enumerate(req.commits):
+            if c.parents is None:
+                parents = [oids[-1]] if oids else ([tip] if tip else [])
+            else:
+                parents = [self._batch_parent(p, oids, i) for p in c.parents]
+
+            if c.tree is not None:
+                if not _HEX_OID.match(c.tree):
+                    raise ValueError(f"commit {i}: invalid tree oid {c.tree}")
+                tree_oid = c.tree
+            else:
+                base = None
+                if parents:
+                    try:
+                        parent = batch.get(parents[0])
+                    except (ValueError, FileNotFoundError):
+                        parent = None
+                    if not isinstance(parent, CommitObject):
+                        raise ValueError(f"commit {i}: parent {parents[0]} is not a commit")
+                    base = parent.tree_oid
+                changes = {path: self._batch_blob(batch, f, i, path) for path, f in c.files.items()}
+                tree_oid = apply_tree_changes(batch, base, changes) if changes else base
+                if tree_oid is None:
+                    tree_oid = batch.add(TreeObject(entries=[]))
+
+            ts = now if c.timestamp is None else c.timestamp
+            author = f"{c.author_name} <{c.author_email}> {ts} {c.timezone}"
+            committer = f"{c.committer_name or c.author_name} <{c.committer_email or c.author_email}> {ts} {c.timezone}"
+            commit = CommitObject(
+                tree_oid=tree_oid,
+                parent_oids=parents,
+                author=author,
+                committer=committer,
+                message=c.message,
+            )
+            oids.append(batch.add(commit))
+
+        new_objects = sum(1 for oid in batch.objects if not group.objects.contains(oid))
+        if oids:
+            group.set_ref(ref, oids[-1], batch)
+        return BatchCommitsResponse(ref=ref, oids=oids, objects_written=new_objects)
+
+    @staticmethod
+    def _batch_parent(parent: str, oids: List[str], index: int) -> str:
+        if parent.startswith(":"):
+            try:
+                n = int(parent[1:])
+            except ValueError:
+                n = -1
+            if not 0 <= n < index:
+                raise ValueError(f"commit {index}: {parent} does not name an earlier commit in the batch")
+            return oids[n]
+        if not _HEX_OID.match(parent):
+            raise ValueError(f"commit {index}: invalid parent oid {parent}")
+        return parent
+
+    @staticmethod
+    def _batch_blob(batch: ObjectBatch, f: Optional[BatchFile], index: int, path: str) -> Optional[Tuple[bytes, str]]:
+        if f is None:
+            return None
+        given = [v is not None for v in (f.content, f.content_base64, f.oid)]
+        if sum(given) != 1:
+            raise ValueError(f"commit {index}: {path} needs exactly one of content, content_base64 or oid")
+        if f.mode not in _FILE_MODES:
+            raise ValueError(f"commit {index}: {path} has unsupported mode {f.mode}")
+        if f.oid is not None:
+            if not _HEX_OID.match(f.oid):
+                raise ValueError(f"commit {index}: {path} has invalid oid {f.oid}")
+            return f.mode.encode(), f.oid
+        if f.content is not None:
+            data = f.content.encode()
+        else:
+            try:
+                data = base64.b64decode(f.content_base64, validate=True)
+            except binascii.Error:
+                raise ValueError(f"commit {index}: {path} has invalid base64 content")
+        return f.mode.encode(), batch.add(BlobObject(data=data))
+
+    def blob_writer(self, size: int):
+        """A streaming writer for a blob of `size` bytes (see ObjectStore.writer)."""
+        return self.store.writer(b"blob", size)
+
+    def write_blob(self, chunks: Iterable[bytes], size: Optional[int] = None) -> BlobUploadResponse:
+        """Stores a blob from `chunks`, spooling them first if `size` is unknown."""
+        oid, size = write_object_stream(self.store, b"blob", chunks, size)
+        return BlobUploadResponse(oid=oid, size=size)
+
+    def repack(self, deltas: bool = True, prune: bool = True) -> RepackResponse:
+        """Consolidates loose objects into a new pack (see repack.repack)."""
+        result = repack_objects(self.git_dir, deltas=deltas, prune=prune)
+        return RepackResponse(**dataclasses.asdict(result))
+
+    def _head_ref(self) -> str:
+        """The ref a commit on HEAD advances: its branch, or HEAD itself when detached.
+
+        A repository without HEAD gets one pointing at main.
+        """
         head_path = self.git_dir / "HEAD"
         if head_path.exists():
             content = head_path.read_text().strip()
             if content.startswith("ref: "):
-                ref_path = self.git_dir / content[5:]
-                ref_path.parent.mkdir(parents=True, exist_ok=True)
-                ref_path.write_text(commit_oid)
-            else:
-                # Detached HEAD, just update HEAD
-                head_path.write_text(commit_oid)
-        else:
-            # Create default main
-            (self.git_dir / "refs" / "heads" / "main").parent.mkdir(parents=True, exist_ok=True)
-            (self.git_dir / "refs" / "heads" / "main").write_text(commit_oid)
-            head_path.write_text("ref: refs/heads/main")
+                return content[5:]
+            return "HEAD"
+        head_path.write_text("ref: refs/heads/main")
+        return "refs/heads/main"
 
-        # 6. Refresh DAG
-        self.refresh()
-        
-        # Return response
-        # We need to fetch the node we just added from DAG or construct it
-        return self.get_commit(commit_oid)
-    
     # Branch and Checkout methods Removed as per user request
     # Only get_branches is kept for DAG readiness, but create_branch/checkout disallowed.
     
     def reset_repo(self):
         """Hard reset: Delete .git and re-initialize."""
+        if self.commit_index is not None:
+            self.commit_index.close()
         if self.git_dir.exists():
             print(f"Backend: Resetting repo at {self.git_dir}")
             try:
@@ -225,23 +1025,43 @@ class GitService:
         # Default HEAD
         (self.git_dir / "HEAD").write_text("ref: refs/heads/main\n")
         
-        # Clear cache
-        self.dag = {}
-        self.sorted_commits = []
+        # Clear cache (including a snapshot kept outside the git dir)
+        self.invalidate()
+        self.snapshot_path.unlink(missing_ok=True)
+        if self.commit_index is not None:
+            self.commit_index.reset()
+        self._persisted_size = 0
+        self.objects.clear()
+        self.listings.clear()
+        self.sketches.clear()
+        self.paths.paths.clear()
+        self.paths.trees.clear()
+        self.blames.clear()
 
-    def _write_loose_object(self, oid: str, data: bytes):
-        path = self.git_dir / "objects" / oid[:2] / oid[2:]
-        if not path.exists():
-            path.parent.mkdir(parents=True, exist_ok=True)
-            path.write_bytes(zlib.compress(data))
-            # Make read-only to mimic git behavior
-            os.chmod(path, stat.S_IREAD)
+    def _read_for_stats(self, oid: str) -> GitObject:
+        obj = self.objects.get(oid) or self.stats_trees.get(oid)
+        if obj is None:
+            obj = self.store.read(oid)
+            self.stats_trees.put(oid, obj)
+        return obj
+
+    def read(self, oid: str) -> GitObject:
+        """Reads from the object store through the per-repository object cache."""
+        obj = self.objects.get(oid)
+        if obj is None:
+            obj = self.store.read(oid)
+            # Big blobs are served but not kept around.
+            if not (isinstance(obj, BlobObject) and len(obj.data) > MAX_CACHED_BLOB_SIZE):
+                self.objects.put(oid, obj)
+        return obj
 
     def get_tree(self, oid: str) -> Optional[List[TreeEntryResponse]]:
-        obj = read_object(oid, self.git_dir)
+        obj = self.read(oid)
         if not isinstance(obj, TreeObject):
             return None
-            
+        return self._tree_entries(obj)
+
+    def _tree_entries(self, obj: TreeObject) -> List[TreeEntryResponse]:
         entries = []
         for e in obj.entries:
             # Determine type from mode
@@ -259,11 +1079,196 @@ class GitService:
             ))
         return entries
 
+    def list_tree_recursive(
+        self, oid: str, prefix: str = "", max_depth: Optional[int] = None
+    ) -> Optional[Iterator[str]]:
+        """Recursive listing (like `ls-tree -r -t`) as NDJSON chunks.
+
+        `oid` may be a tree or a commit. Only entries below `prefix` are
+        listed, down to `max_depth` levels under it. Returns None when the
+        root or the prefix does not resolve to a tree, before anything is
+        streamed.
+        """
+        try:
+            obj = self.read(oid)
+        except (ValueError, FileNotFoundError):
+            return None
+        if isinstance(obj, CommitObject):
+            oid = obj.tree_oid
+        elif not isinstance(obj, TreeObject):
+            return None
+        entry = resolve_path(oid, prefix, self.read)
+        if entry is None or not is_tree_mode(entry.mode):
+            return None
+        base = "/".join(part for part in prefix.split("/") if part)
+        return self._stream_listing(entry.oid, base, max_depth)
+
+    def _stream_listing(self, oid: str, base: str, max_depth: Optional[int]) -> Iterator[str]:
+        lines = []
+        for path, mode, obj_type, entry_oid, _ in self._iter_listing(oid, max_depth):
+            lines.append(json.dumps({
+                "path": f"{base}/{path}" if base else path,
+                "mode": mode,
+                "type": obj_type,
+                "oid": entry_oid,
+            }))
+            if len(lines) >= LISTING_CHUNK_SIZE:
+                yield "\n".join(lines) + "\n"
+                lines = []
+        if lines:
+            yield "\n".join(lines) + "\n"
+
+    def _iter_listing(self, oid: str, max_depth: Optional[int]) -> Iterator[ListingEntry]:
+        # Full expansions go through the memo; depth-limited ones only use it
+        # where a subtree happens to be expanded already.
+        if max_depth is None:
+            yield from self._flatten_tree(oid)
+            return
+        if max_depth <= 0:
+            return
+        cached = self.listings.get(oid)
+        if cached is not None:
+            yield from (e for e in cached if e[4] <= max_depth)
+            return
+        tree = self.read(oid)
+        for e in tree.entries:
+            mode = e.mode.decode()
+            if is_tree_mode(e.mode):
+                yield (e.name, mode, "tree", e.oid, 1)
+                for path, sub_mode, sub_type, sub_oid, depth in self._iter_listing(e.oid, max_depth - 1):
+                    yield (f"{e.name}/{path}", sub_mode, sub_type, sub_oid, depth + 1)
+            else:
+                yield (e.name, mode, "blob", e.oid, 1)
+
+    def _flatten_tree(self, oid: str) -> List[ListingEntry]:
+        cached = self.listings.get(oid)
+        if cached is not None:
+            return cached
+        listing = []
+        tree = self.read(oid)
+        for e in tree.entries:
+            mode = e.mode.decode()
+            if is_tree_mode(e.mode):
+                listing.append((e.name, mode, "tree", e.oid, 1))
+                for path, sub_mode, sub_type, sub_oid, depth in self._flatten_tree(e.oid):
+                    listing.append((f"{e.name}/{path}", sub_mode, sub_type, sub_oid, depth + 1))
+            else:
+                listing.append((e.name, mode, "blob", e.oid, 1))
+        self.listings.put(oid, listing)
+        return listing
+
+    def _tree_oid_of(self, oid: str) -> Optional[str]:
+        """The tree of a commit, the oid itself for a tree, else None."""
+        try:
+            obj = self.read(oid)
+        except (ValueError, FileNotFoundError):
+            return None
+        if isinstance(obj, CommitObject):
+            return obj.tree_oid
+        if isinstance(obj, TreeObject):
+            return oid
+        return None
+
+    def diff_commit(
+        self,
+        oid: str,
+        parent: Optional[str] = None,
+        lines: bool = False,
+        context: int = 3,
+        renames: Optional[RenameOptions] = None,
+    ) -> Optional[DiffResponse]:
+        """Changes introduced by a commit, against its first parent by default.
+
+        Root commits are diffed against the empty tree. `parent` may name any
+        commit to compare against instead. With `renames`, moved (and
+        optionally copied) files are paired up instead of showing as a delete
+        plus an add.
+        """
+        try:
+            commit = self.read(oid)
+        except (ValueError, FileNotFoundError):
+            return None
+        if not isinstance(commit, CommitObject):
+            return None
+        if parent is None and commit.parent_oids:
+            parent = commit.parent_oids[0]
+        old_tree = None
+        if parent is not None:
+            old_tree = self._tree_oid_of(parent)
+            if old_tree is None:
+                return None
+        files = self._diff_files(old_tree, commit.tree_oid, lines, context, renames)
+        return DiffResponse(old_tree=old_tree, new_tree=commit.tree_oid, commit=oid, parent=parent, files=files)
+
+    def diff(
+        self,
+        old: str,
+        new: str,
+        lines: bool = False,
+        context: int = 3,
+        renames: Optional[RenameOptions] = None,
+    ) -> Optional[DiffResponse]:
+        """Diff between two trees or commits (a commit stands for its tree)."""
+        old_tree = self._tree_oid_of(old)
+        new_tree = self._tree_oid_of(new)
+        if old_tree is None or new_tree is None:
+            return None
+        files = self._diff_files(old_tree, new_tree, lines, context, renames)
+        return DiffResponse(old_tree=old_tree, new_tree=new_tree, files=files)
+
+    def _diff_files(
+        self,
+        old_tree: Optional[str],
+        new_tree: str,
+        lines: bool,
+        context: int,
+        renames: Optional[RenameOptions] = None,
+    ) -> List[DiffEntryResponse]:
+        changes = diff_trees(old_tree, new_tree, self.read)
+        if renames is not None:
+            changes = detect_renames(
+                changes,
+                self.read,
+                self.sketches,
+                threshold=renames.threshold,
+                limit=renames.limit,
+                copies=renames.copies,
+            )
+        return [self._diff_entry_response(change, lines, context) for change in changes]
+
+    def _diff_entry_response(self, change: DiffEntry, lines: bool, context: int) -> DiffEntryResponse:
+        response = DiffEntryResponse(
+            status=change.status,
+            path=change.path,
+            old_path=change.old_path,
+            similarity=change.similarity,
+            old_oid=change.old_oid,
+            new_oid=change.new_oid,
+            old_mode=change.old_mode,
+            new_mode=change.new_mode,
+        )
+        # Submodules (gitlinks) point at commits in another repository.
+        if not lines or "160000" in (change.old_mode, change.new_mode):
+            return response
+        old_data = self.read(change.old_oid).data if change.old_oid else b""
+        new_data = self.read(change.new_oid).data if change.new_oid else b""
+        response.patch = unified_line_diff(
+            old_data,
+            new_data,
+            (change.old_path or change.path) if change.old_oid else None,
+            change.path if change.new_oid else None,
+            context,
+        )
+        response.binary = response.patch is None
+        return response
+
     def get_blob(self, oid: str) -> Optional[BlobResponse]:
-        obj = read_object(oid, self.git_dir)
+        obj = self.read(oid)
         if not isinstance(obj, BlobObject):
             return None
-            
+        return self._blob_response(oid, obj)
+
+    def _blob_response(self, oid: str, obj: BlobObject) -> BlobResponse:
         # Try to decode content
         content_str = "<Binary Data>"
         try:
@@ -278,6 +1283,48 @@ class GitService:
             type="blob"
         )
 
+    def get_objects(self, requests: List[ObjectRequest]) -> List[ObjectResult]:
+        """Resolves a batch of objects of any type in one pass.
+
+        Each distinct oid is read once (commits come straight from the DAG when
+        it is loaded); lookup failures are reported per object.
+        """
+        snapshot = self._snapshot
+        resolved: Dict[str, ObjectResult] = {}
+        results = []
+        for req in requests:
+            full = resolved.get(req.oid)
+            if full is None:
+                full = self._resolve_object(req.oid, snapshot)
+                resolved[req.oid] = full
+            if req.fields is None or full.data is None:
+                results.append(full)
+            else:
+                mask = set(req.fields)
+                data = {k: v for k, v in full.data.items() if k in mask}
+                results.append(ObjectResult(oid=full.oid, type=full.type, data=data))
+        return results
+
+    def _resolve_object(self, oid: str, snapshot: DagSnapshot) -> ObjectResult:
+        node = snapshot.dag.get(oid)
+        if node is not None:
+            return ObjectResult(oid=oid, type="commit", data=self._to_response(node).model_dump())
+        try:
+            obj = self.read(oid)
+        except (ValueError, FileNotFoundError) as e:
+            return ObjectResult(oid=oid, error=str(e))
+
+        if isinstance(obj, CommitObject):
+            response = self._to_response(CommitNode(oid=oid, commit=obj))
+            return ObjectResult(oid=oid, type="commit", data=response.model_dump())
+        if isinstance(obj, TreeObject):
+            entries = [e.model_dump() for e in self._tree_entries(obj)]
+            return ObjectResult(oid=oid, type="tree", data={"oid": oid, "entries": entries})
+        return ObjectResult(oid=oid, type="blob", data=self._blob_response(oid, obj).model_dump())
+
+    def _record_response(self, record: CommitRecord) -> CommitResponse:
+        return CommitResponse(**dataclasses.asdict(record))
+
     def _to_response(self, node: CommitNode) -> CommitResponse:
         return CommitResponse(
             oid=node.oid,
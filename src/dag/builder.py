@@ -1,41 +1,149 @@
 from pathlib import Path
-from typing import Dict, List, Set, Deque
+from typing import Container, Dict, Iterable, List, Mapping, Optional, Set, Deque, Tuple
 from collections import deque
+from dataclasses import replace
+import time
 
 from src.git_objects.parser import read_object
 from src.git_objects.models import CommitObject
+from src.git_objects.store import ObjectStore
 from src.dag.models import CommitNode
-from src.dag.refs import get_branches, resolve_head
+from src.dag.refs import get_ref_tips
+from src.utils.metrics import Histogram
+from src.utils.profiling import spanned
+
+DAG_BUILD_SECONDS = Histogram("tinygit_dag_build_seconds", "Time to walk commits into a DAG; kind is full or extend", ["kind"])
+TOPO_SORT_SECONDS = Histogram("tinygit_topo_sort_seconds", "Time to sort a DAG topologically")
+_FULL_BUILDS = DAG_BUILD_SECONDS.labels(kind="full")
+_EXTENDS = DAG_BUILD_SECONDS.labels(kind="extend")
 
 class DagBuilder:
-    def __init__(self, git_dir: Path = Path(".git")):
+    def __init__(self, git_dir: Path = Path(".git"), store: Optional[ObjectStore] = None):
+        # Refs are always read from git_dir; objects come from `store` when
+        # one is given, otherwise from the repository on disk.
         self.git_dir = git_dir
+        self.store = store
         self.nodes: Dict[str, CommitNode] = {}
+        # Commits read by the walk in progress; polled by readiness probes.
+        self.loaded_count = 0
         
-    def build_dag(self) -> Dict[str, CommitNode]:
-        """Builds the commit graph starting from all refs."""
+    @spanned("dag_build")
+    def build_dag(self, tips: Optional[Dict[str, str]] = None) -> Dict[str, CommitNode]:
+        """Builds the commit graph starting from all refs (or the given ref tips)."""
+        start = time.perf_counter()
         # Identifying starting points (roots for traversal, tips of branches)
-        start_oids = set(get_branches(self.git_dir).values())
-        head_oid = resolve_head(self.git_dir)
-        if head_oid:
-            start_oids.add(head_oid)
-            
+        if tips is None:
+            tips = get_ref_tips(self.git_dir)
+
+        # Always build into a fresh dict: the previous result may still be
+        # served to readers while this build runs.
+        self.nodes = {}
+        self._walk(set(tips.values()), known={})
+                
+        # Second pass: Link children
+        for oid, node in self.nodes.items():
+            for parent_oid in node.parents:
+                if parent_oid in self.nodes:
+                    self.nodes[parent_oid].children.add(oid)
+                    
+        _FULL_BUILDS.observe(time.perf_counter() - start)
+        return self.nodes
+
+    @spanned("dag_build")
+    def extend_dag(
+        self,
+        base: Mapping[str, CommitNode],
+        old_tips: Dict[str, str],
+        tips: Dict[str, str],
+    ) -> Optional[Tuple[Mapping[str, CommitNode], Dict[str, CommitNode]]]:
+        """Adds the commits reachable from `tips` that `base` does not have yet.
+
+        Walking stops at commits already in `base`, so the cost is proportional
+        to the number of new commits. Returns `(dag, new_nodes)`, or None when a
+        ref was deleted or rewound (its old tip is not an ancestor of anything
+        new) and a full rebuild is needed to drop unreachable history.
+
+        `base` is left untouched; parents that gain children are copied. A
+        dict base gives a dict; an attached CompactDag (or a LayeredDag over
+        one) gives a LayeredDag.
+        """
+        start = time.perf_counter()
+        new_nodes = self.new_commits(base, old_tips, tips)
+        if new_nodes is None:
+            _EXTENDS.observe(time.perf_counter() - start)
+            return None
+
+        if isinstance(base, dict):
+            dag = dict(base)
+            dag.update(new_nodes)
+            for oid, node in new_nodes.items():
+                for parent_oid in node.parents:
+                    if parent_oid in base and parent_oid not in new_nodes:
+                        parent = dag[parent_oid]
+                        if parent is base[parent_oid]:
+                            parent = replace(parent, children=set(parent.children))
+                            dag[parent_oid] = parent
+                        parent.children.add(oid)
+        else:
+            # A read-only graph over a mapped snapshot (src/dag/compact.py)
+            # is not copied: the new commits are layered over it.
+            dag = base.extended(new_nodes)
+        _EXTENDS.observe(time.perf_counter() - start)
+        return dag, new_nodes
+
+    def new_commits(
+        self,
+        known: Container[str],
+        old_tips: Dict[str, str],
+        tips: Dict[str, str],
+    ) -> Optional[Dict[str, CommitNode]]:
+        """The commits reachable from `tips` that are not in `known`, linked to their new children.
+
+        `known` holds every commit reachable from `old_tips` and nothing
+        else: a DAG, or a commit index that was current for `old_tips`.
+        Returns None when a ref was deleted or rewound (see extend_dag).
+        """
+        self.nodes = {}
+        boundary = self._walk(set(tips.values()), known=known)
+        retired = set(old_tips.values()) - set(tips.values())
+        if not retired <= boundary:
+            return None
+
+        new_nodes = self.nodes
+        for oid, node in new_nodes.items():
+            for parent_oid in node.parents:
+                if parent_oid in new_nodes:
+                    new_nodes[parent_oid].children.add(oid)
+        return new_nodes
+
+    def _walk(self, start_oids: Iterable[str], known: Container[str]) -> Set[str]:
+        """Breadth-first walk from `start_oids` into self.nodes.
+
+        Commits in `known` are not read again; the ones the walk ran into are
+        returned.
+        """
         queue: Deque[str] = deque(start_oids)
         visited: Set[str] = set()
+        boundary: Set[str] = set()
+        self.loaded_count = 0
         
         while queue:
             oid = queue.popleft()
             if oid in visited:
                 continue
             visited.add(oid)
+            if oid in known:
+                boundary.add(oid)
+                continue
             
             try:
-                commit_obj = read_object(oid, self.git_dir)
+                commit_obj = self.store.read(oid) if self.store is not None else read_object(oid, self.git_dir)
                 if not isinstance(commit_obj, CommitObject):
                     continue
                     
                 node = CommitNode(oid=oid, commit=commit_obj)
                 self.nodes[oid] = node
+                self.loaded_count += 1
                 
                 # Add parents to queue
                 for parent_oid in node.parents:
@@ -44,15 +152,10 @@ class DagBuilder:
             except (ValueError, FileNotFoundError):
                 # Handle cases where object is missing or invalid
                 continue
-                
-        # Second pass: Link children
-        for oid, node in self.nodes.items():
-            for parent_oid in node.parents:
-                if parent_oid in self.nodes:
-                    self.nodes[parent_oid].children.add(oid)
-                    
-        return self.nodes
 
+        return boundary
+
+@spanned("topo_sort")
 def topological_sort(dag: Dict[str, CommitNode]) -> List[CommitNode]:
     """Sorts commits topologically (children before parents)."""
     # Kahn's algorithm or DFS based.
@@ -94,6 +197,7 @@ def topological_sort(dag: Dict[str, CommitNode]) -> List[CommitNode]:
     
     # So just standard topological sort on the graph where edges are defined by `node.parents`.
     
+    started = time.perf_counter()
     result = []
     visited = set()
     temp_mark = set()  # detecting cycles (though git history shouldn't have them)
@@ -102,25 +206,35 @@ def topological_sort(dag: Dict[str, CommitNode]) -> List[CommitNode]:
     # Start with nodes that are tips (no children in the DAG subset, or rather not pointed to by anyone yet?)
     # Actually just iterate all nodes.
     
-    def visit(oid):
-        if oid in visited:
+    def visit(start):
+        # Depth-first, parents in order, with an explicit stack: histories
+        # are far deeper than Python's recursion limit.
+        if start in visited:
             return
-        if oid in temp_mark:
-            raise ValueError("Cycle detected in commit graph")
-            
-        temp_mark.add(oid)
-        
-        node = dag.get(oid)
-        if node:
-            for parent in node.parents:
-                visit(parent)
-        
-        temp_mark.remove(oid)
-        visited.add(oid)
-        result.append(node)
+        temp_mark.add(start)
+        stack = [(start, iter(dag[start].parents if start in dag else ()))]
+        while stack:
+            oid, parents = stack[-1]
+            for parent in parents:
+                if parent in visited:
+                    continue
+                if parent in temp_mark:
+                    raise ValueError("Cycle detected in commit graph")
+                temp_mark.add(parent)
+                stack.append((parent, iter(dag[parent].parents if parent in dag else ())))
+                break
+            else:
+                stack.pop()
+                temp_mark.remove(oid)
+                visited.add(oid)
+                # Parents outside the graph (missing objects, or the older part of
+                # the history when sorting just a new segment) are not emitted.
+                node = dag.get(oid)
+                if node:
+                    result.append(node)
 
     # We want B to come before A.
-    # The normal recursion above `visit(parent)` puts parent in result BEFORE the child is added to result (post-order).
+    # The traversal above puts parent in result BEFORE the child is added to result (post-order).
     # So `result` will be [A, B].
     # usage `visit(B)` -> calls `visit(A)` -> adds A -> adds B.
     # So we need to reverse the final list.
@@ -129,4 +243,5 @@ def topological_sort(dag: Dict[str, CommitNode]) -> List[CommitNode]:
     for oid in sorted_oids:
         visit(oid)
         
+    TOPO_SORT_SECONDS.observe(time.perf_counter() - started)
     return list(reversed(result))
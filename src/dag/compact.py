@@ -0,0 +1,249 @@
+from collections.abc import ItemsView, Mapping, Sequence, ValuesView
+from dataclasses import replace
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+from src.dag.builder import topological_sort
+from src.dag.models import CommitNode
+from src.git_objects.models import CommitObject
+from src.utils.cache import LRUCache
+
+# Nodes materialized from the mapped file and kept per process; browsing
+# touches the same recent commits over and over.
+NODE_CACHE_SIZE = 4096
+
+class CompactDag(Mapping):
+    """A read-only commit graph over the arrays of a version 2 snapshot.
+
+    Behaves like the `Dict[str, CommitNode]` of a loaded DAG, but nothing
+    is loaded up front: commits are numbered by topological position, oids
+    are found by binary search below a first-byte fanout (as in a pack
+    index), and a CommitNode is only built, from the stored commit body and
+    the parent/child lists, when one is asked for. The arrays live in the
+    mapped file, so every process attached to the same snapshot shares one
+    copy in the page cache.
+
+    See src/dag/snapshot.py for the layout; attach_snapshot creates these.
+    """
+
+    def __init__(self, buf, *, oids, fanout, by_oid, parent_offsets, parents, child_offsets, children, body_offsets, bodies):
+        # Keeps the mapping alive; the views below point into it.
+        self._buf = buf
+        self._oids = oids
+        self._fanout = fanout
+        self._by_oid = by_oid
+        self._parent_offsets = parent_offsets
+        self._parents = parents
+        self._child_offsets = child_offsets
+        self._children = children
+        self._body_offsets = body_offsets
+        self._bodies = bodies
+        self._count = len(by_oid)
+        self._nodes = LRUCache(NODE_CACHE_SIZE)
+        self.sorted_commits = TopoOrder(self)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the mapped snapshot."""
+        return len(self._buf)
+
+    def oid(self, i: int) -> str:
+        """The oid at topological position `i` (or of external parent `i`)."""
+        return self._oids[20 * i:20 * i + 20].hex()
+
+    def position(self, oid: str) -> Optional[int]:
+        """Topological position of `oid` (0 = newest), None if it is not in the DAG."""
+        try:
+            key = bytes.fromhex(oid)
+        except ValueError:
+            return None
+        if len(key) != 20:
+            return None
+        first = key[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = self._by_oid[mid]
+            candidate = bytes(self._oids[20 * i:20 * i + 20])
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return i
+        return None
+
+    def parent_positions(self, i: int) -> List[int]:
+        """Oid table indexes of the parents of commit `i`; those >= len(self) are external."""
+        return list(self._parents[self._parent_offsets[i]:self._parent_offsets[i + 1]])
+
+    def child_positions(self, i: int) -> List[int]:
+        return list(self._children[self._child_offsets[i]:self._child_offsets[i + 1]])
+
+    def node(self, i: int) -> CommitNode:
+        """The commit at topological position `i`."""
+        node = self._nodes.get(i)
+        if node is None:
+            oid = self.oid(i)
+            commit = CommitObject.deserialize(bytes(self._bodies[self._body_offsets[i]:self._body_offsets[i + 1]]))
+            commit.oid = oid
+            node = CommitNode(
+                oid=oid,
+                commit=commit,
+                parents=[self.oid(j) for j in self.parent_positions(i)],
+                children={self.oid(j) for j in self.child_positions(i)},
+            )
+            self._nodes.put(i, node)
+        return node
+
+    def __getitem__(self, oid: str) -> CommitNode:
+        i = self.position(oid)
+        if i is None:
+            raise KeyError(oid)
+        return self.node(i)
+
+    def __contains__(self, oid) -> bool:
+        return isinstance(oid, str) and self.position(oid) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._count):
+            yield self.oid(i)
+
+    def items(self) -> ItemsView:
+        return _Items(self)
+
+    def values(self) -> ValuesView:
+        return _Values(self)
+
+    def extended(self, new_nodes: Dict[str, CommitNode]) -> "LayeredDag":
+        """This graph plus `new_nodes` (none of which has children here), without copying it."""
+        return LayeredDag(self, [], {}).extended(new_nodes)
+
+    def materialize(self) -> Tuple[Dict[str, CommitNode], List[CommitNode]]:
+        """A private, mutable copy as `(dag, sorted_commits)`, e.g. to extend it."""
+        sorted_commits = []
+        for i in range(self._count):
+            node = self.node(i)
+            sorted_commits.append(CommitNode(oid=node.oid, commit=node.commit, parents=list(node.parents), children=set(node.children)))
+        return {node.oid: node for node in sorted_commits}, sorted_commits
+
+class LayeredDag(Mapping):
+    """New commits in front of an attached CompactDag.
+
+    What DagBuilder.extend_dag returns for a mapped snapshot: the commits
+    added since it was written are kept in a small dict, newest first, and
+    base commits that gained children get them from a side table, so
+    extending costs the number of new commits rather than a copy of the
+    graph. Positions count the new commits first, as a rebuilt DAG would.
+    Like the base, it is read-only; extending it returns a new layer.
+    """
+
+    def __init__(self, base: CompactDag, top: List[CommitNode], children: Dict[str, FrozenSet[str]]):
+        self.base = base
+        self._top = {node.oid: node for node in top}
+        self._order = top
+        self._positions = {node.oid: i for i, node in enumerate(top)}
+        # Base oid -> children added on top of the ones in the file
+        self._children = children
+        self.sorted_commits = TopoOrder(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.base.nbytes
+
+    @property
+    def top_size(self) -> int:
+        """Commits held in front of the base."""
+        return len(self._order)
+
+    def extended(self, new_nodes: Dict[str, CommitNode]) -> "LayeredDag":
+        children = dict(self._children)
+        # Nodes already published are shared with readers: copy the ones that gain children.
+        copied: Dict[str, CommitNode] = {}
+        for oid, node in new_nodes.items():
+            for parent in node.parents:
+                if parent in new_nodes:
+                    continue
+                if parent in self._top:
+                    if parent not in copied:
+                        copied[parent] = replace(self._top[parent], children=set(self._top[parent].children))
+                    copied[parent].children.add(oid)
+                elif parent in self.base:
+                    children[parent] = children.get(parent, frozenset()) | {oid}
+        top = topological_sort(new_nodes) + [copied.get(node.oid, node) for node in self._order]
+        return LayeredDag(self.base, top, children)
+
+    def position(self, oid: str) -> Optional[int]:
+        i = self._positions.get(oid)
+        if i is not None:
+            return i
+        i = self.base.position(oid)
+        return None if i is None else i + len(self._order)
+
+    def _with_children(self, node: CommitNode) -> CommitNode:
+        extra = self._children.get(node.oid)
+        return replace(node, children=node.children | extra) if extra else node
+
+    def node(self, i: int) -> CommitNode:
+        if i < len(self._order):
+            return self._order[i]
+        return self._with_children(self.base.node(i - len(self._order)))
+
+    def __getitem__(self, oid: str) -> CommitNode:
+        node = self._top.get(oid)
+        if node is not None:
+            return node
+        return self._with_children(self.base[oid])
+
+    def __contains__(self, oid) -> bool:
+        return oid in self._top or oid in self.base
+
+    def __len__(self) -> int:
+        return len(self._order) + len(self.base)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self._positions
+        yield from self.base
+
+    def items(self) -> ItemsView:
+        return _Items(self)
+
+    def values(self) -> ValuesView:
+        return _Values(self)
+
+class _Items(ItemsView):
+    # Walks positions instead of looking every oid up again.
+    def __iter__(self):
+        for i in range(len(self._mapping)):
+            node = self._mapping.node(i)
+            yield node.oid, node
+
+class _Values(ValuesView):
+    def __iter__(self):
+        for i in range(len(self._mapping)):
+            yield self._mapping.node(i)
+
+class TopoOrder(Sequence):
+    """The commits of a CompactDag or LayeredDag in topological order, like DagSnapshot.sorted_commits."""
+
+    def __init__(self, dag):
+        self._dag = dag
+
+    def __len__(self) -> int:
+        return len(self._dag)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._dag.node(i) for i in range(len(self._dag))[index]]
+        if index < 0:
+            index += len(self._dag)
+        if not 0 <= index < len(self._dag):
+            raise IndexError(index)
+        return self._dag.node(index)
+
+    def __iter__(self) -> Iterator[CommitNode]:
+        for i in range(len(self._dag)):
+            yield self._dag.node(i)
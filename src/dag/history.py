@@ -0,0 +1,56 @@
+from typing import Iterator, List, Set, Tuple
+import heapq
+
+from src.dag.models import CommitNode, DagSnapshot
+from src.git_objects.paths import PathResolver
+
+def path_history(
+    snapshot: DagSnapshot,
+    start_oid: str,
+    path: str,
+    paths: PathResolver,
+    full_history: bool = False,
+) -> Iterator[CommitNode]:
+    """Commits reachable from `start_oid` that changed `path` (like `git log -- path`).
+
+    Only the tree entries along `path` are compared between a commit and its
+    parents, so unchanged subtrees are never listed. Commits come out in the
+    snapshot's topological order, lazily, so callers can stop after a page.
+
+    History simplification follows git's default: a merge whose path content
+    matches one of its parents (TREESAME) is not shown, and only that parent's
+    side is followed. With `full_history`, every parent is followed and merges
+    are shown whenever they differ from at least one parent.
+    """
+    start_pos = snapshot.position(start_oid)
+    if start_pos is None:
+        return
+    # Min-heap on topological position: children always pop before parents.
+    heap: List[Tuple[int, str]] = [(start_pos, start_oid)]
+    queued: Set[str] = {start_oid}
+
+    while heap:
+        _, oid = heapq.heappop(heap)
+        node = snapshot.dag[oid]
+        here = paths.oid_at(node.commit.tree_oid, path)
+
+        parents = [p for p in node.parents if p in snapshot.dag]
+        parent_oids = [paths.oid_at(snapshot.dag[p].commit.tree_oid, path) for p in parents]
+        same = [p for p, p_oid in zip(parents, parent_oids) if p_oid == here]
+
+        if not parents:
+            # Root commit (or the oldest one we have): shown if it has the path.
+            show, follow = here is not None, []
+        elif full_history:
+            show, follow = len(same) < len(parents), parents
+        elif same:
+            show, follow = False, same[:1]
+        else:
+            show, follow = True, parents
+
+        if show:
+            yield node
+        for parent in follow:
+            if parent not in queued:
+                queued.add(parent)
+                heapq.heappush(heap, (snapshot.position(parent), parent))
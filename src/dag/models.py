@@ -1,7 +1,10 @@
 from dataclasses import dataclass, field
-from typing import List, Set
+from typing import TYPE_CHECKING, Dict, List, Mapping, Optional, Set
 from src.git_objects.models import CommitObject
 
+if TYPE_CHECKING:
+    from src.index.base import CommitIndexer
+
 @dataclass
 class CommitNode:
     oid: str
@@ -13,3 +16,44 @@ class CommitNode:
         # Ensure we use the parents from the commit object if not provided explicitly
         if not self.parents and self.commit.parent_oids:
             self.parents = self.commit.parent_oids
+
+@dataclass
+class DagSnapshot:
+    """A built commit graph plus its topological order.
+
+    Snapshots are never mutated once published: a refresh builds a new one and
+    swaps it in, so readers holding the old one keep a consistent view.
+    """
+    # Built DAGs are dicts and lists; an attached snapshot provides a
+    # read-only CompactDag and its sorted_commits view instead.
+    dag: Dict[str, CommitNode] = field(default_factory=dict)
+    sorted_commits: List[CommitNode] = field(default_factory=list)
+    loaded: bool = False
+    # Ref name -> tip oid the DAG was built from; used to extend it incrementally.
+    tips: Dict[str, str] = field(default_factory=dict)
+    # Rough resident size, used to decide which repositories to evict.
+    approx_bytes: int = 0
+    # Secondary indexes over these commits by name (an IndexSet, see src/index/base.py).
+    indexes: Mapping[str, "CommitIndexer"] = field(default_factory=dict, repr=False, compare=False)
+    _positions: Optional[Dict[str, int]] = field(default=None, repr=False, compare=False)
+
+    def position(self, oid: str) -> Optional[int]:
+        """Index of a commit in sorted_commits (0 = newest), built on first use."""
+        if not isinstance(self.dag, dict):
+            # An attached CompactDag (src/dag/compact.py) has them built in.
+            return self.dag.position(oid)
+        if self._positions is None:
+            self._positions = {node.oid: i for i, node in enumerate(self.sorted_commits)}
+        return self._positions.get(oid)
+
+# Per-commit overhead of CommitNode + CommitObject + dict/list slots, measured
+# on CPython 3.11 and rounded up. Only used for relative eviction decisions.
+NODE_OVERHEAD_BYTES = 900
+
+def estimate_dag_bytes(dag: Dict[str, CommitNode]) -> int:
+    total = 0
+    for node in dag.values():
+        c = node.commit
+        total += NODE_OVERHEAD_BYTES + len(c.message) + len(c.author) + len(c.committer)
+        total += 90 * (len(node.parents) + len(node.children))
+    return total
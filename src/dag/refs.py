@@ -1,5 +1,8 @@
 from pathlib import Path
 from typing import Optional, Dict
+import os
+
+from src.utils.profiling import spanned
 
 def resolve_ref(git_dir: Path, ref_path: str) -> Optional[str]:
     """Resolves a reference (e.g., 'refs/heads/main') to an OID."""
@@ -26,10 +29,67 @@ def get_branches(git_dir: Path = Path(".git")) -> Dict[str, str]:
         return branches
         
     for path in heads_dir.glob("**/*"):
-        if path.is_file():
+        if path.is_file() and not path.name.endswith(".lock"):
             # branch name is relative to refs/heads
             branch_name = str(path.relative_to(heads_dir))
             oid = path.read_text().strip()
             branches[branch_name] = oid
             
     return branches
+
+@spanned("refs")
+def get_ref_tips(git_dir: Path = Path(".git")) -> Dict[str, str]:
+    """Returns every ref the DAG is built from (branches plus HEAD), keyed by full ref name."""
+    tips = {f"refs/heads/{name}": oid for name, oid in get_branches(git_dir).items()}
+    head_oid = resolve_head(git_dir)
+    if head_oid:
+        tips["HEAD"] = head_oid
+    return tips
+
+class RefUpdateError(Exception):
+    pass
+
+class RefLockedError(RefUpdateError):
+    """Another writer (this server or git itself) holds the ref's lock file."""
+
+class RefConflictError(RefUpdateError):
+    """The ref no longer has the value the update was based on."""
+
+# Default for update_ref's `old_oid`: skip the compare-and-swap check.
+ANY = object()
+
+def update_ref(git_dir: Path, ref: str, new_oid: str, old_oid=ANY, fsync: bool = True):
+    """Points `ref` (e.g. 'refs/heads/main' or 'HEAD') at `new_oid` using git's lock protocol.
+
+    `<ref>.lock` is created exclusively, the new value written to it and
+    the lock renamed over the ref, so readers see either the old or the new
+    value and concurrent git commands are kept out. With `old_oid` (None
+    meaning "must not exist yet") the update only happens if the ref still
+    holds that value.
+    """
+    path = git_dir / ref
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lock = path.with_name(path.name + ".lock")
+    try:
+        fd = os.open(lock, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    except FileExistsError:
+        raise RefLockedError(f"Unable to lock {ref}: {lock} exists")
+    try:
+        if old_oid is not ANY:
+            current = path.read_text().strip() if path.exists() else None
+            if current != old_oid:
+                raise RefConflictError(f"{ref} is at {current}, expected {old_oid}")
+        os.write(fd, f"{new_oid}\n".encode())
+        if fsync:
+            os.fsync(fd)
+        os.close(fd)
+        fd = None
+        os.replace(lock, path)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.unlink(lock)
+        except OSError:
+            pass
+        raise
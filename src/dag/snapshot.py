@@ -0,0 +1,325 @@
+"""On-disk DAG snapshots.
+
+A snapshot stores the commit graph in topological order together with the ref
+tips it was built from, so a restarted process can skip walking the object
+database and only extend the graph from refs that moved.
+
+Version 2 also stores the graph as flat arrays (an oid lookup table and
+parent/child lists in CSR form), so a snapshot can be attached as a
+read-only CompactDag over the memory-mapped file instead of being loaded:
+attaching costs the same whatever the size of the history, and processes
+attached to the same file share its pages.
+
+Snapshots are written to a temporary file, fsynced and renamed into place,
+so a reader never sees a partial one. Attaching therefore only checks the
+structure (header, array bounds, file size); the SHA-1 trailer, which
+means reading every page, is checked by verify_snapshot and by the eager
+read_snapshot.
+
+Layout (all integers little-endian; arrays start at multiples of 8):
+
+    magic "TGDS" | u32 version | u32 tip count | u32 commit count | u32 external count
+    tips:     u16 name length, name, 20-byte oid        (per tip)
+    oids:     20 bytes per commit, topological order, then one per
+              external parent (a parent that is not in the DAG)
+    fanout:   u32 * 256, number of commits whose oid starts with a byte <= i
+    by_oid:   u32 per commit, positions ordered by oid
+    parents:  u32 per commit + 1 offsets, then u32 oid table index per parent
+    children: u32 per commit + 1 offsets, then u32 position per child
+    offsets:  u64 per commit + 1, into the body area
+    bodies:   serialized commit objects, back to back
+    sections: u32 count, then 4-byte tag, u64 length, data (per section)
+    trailer:  SHA-1 of everything above (see verify_snapshot)
+"""
+from array import array
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+from src.git_objects.models import CommitObject
+from src.dag.compact import CompactDag
+from src.dag.models import CommitNode
+
+MAGIC = b"TGDS"
+VERSION = 2
+
+_HEADER = struct.Struct("<4sIIII")
+_TIP_NAME_LEN = struct.Struct("<H")
+_SECTION = struct.Struct("<4sQ")
+
+class SnapshotError(ValueError):
+    """The snapshot file is missing, truncated, corrupt or from another version."""
+
+def _array(typecode: str, values) -> bytes:
+    data = array(typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+def write_snapshot(
+    path: Path,
+    tips: Dict[str, str],
+    sorted_commits: List[CommitNode],
+    sections: Optional[Dict[bytes, bytes]] = None,
+):
+    """Writes a snapshot atomically (temp file + rename)."""
+    sections = sections or {}
+    count = len(sorted_commits)
+    bodies = [node.commit.serialize() for node in sorted_commits]
+    oids = [bytes.fromhex(node.oid) for node in sorted_commits]
+
+    position = {node.oid: i for i, node in enumerate(sorted_commits)}
+    external: Dict[str, int] = {}
+    parent_offsets, parents = [0], []
+    children: List[List[int]] = [[] for _ in range(count)]
+    for i, node in enumerate(sorted_commits):
+        for parent in node.parents:
+            j = position.get(parent)
+            if j is None:
+                j = external.setdefault(parent, count + len(external))
+            else:
+                children[j].append(i)
+            parents.append(j)
+        parent_offsets.append(len(parents))
+    child_offsets = [0]
+    for child_list in children:
+        child_offsets.append(child_offsets[-1] + len(child_list))
+
+    by_oid = sorted(range(count), key=oids.__getitem__)
+    fanout = [0] * 256
+    for oid in oids:
+        fanout[oid[0]] += 1
+    for i in range(1, 256):
+        fanout[i] += fanout[i - 1]
+
+    body_offsets = [0]
+    for body in bodies:
+        body_offsets.append(body_offsets[-1] + len(body))
+
+    parts: List[bytes] = []
+    size = 0
+
+    def add(data: bytes, align: bool = False):
+        nonlocal size
+        if align and size % 8:
+            parts.append(bytes(8 - size % 8))
+            size += 8 - size % 8
+        parts.append(data)
+        size += len(data)
+
+    add(_HEADER.pack(MAGIC, VERSION, len(tips), count, len(external)))
+    for name, oid in sorted(tips.items()):
+        encoded = name.encode()
+        add(_TIP_NAME_LEN.pack(len(encoded)) + encoded + bytes.fromhex(oid))
+    add(b"".join(oids) + b"".join(bytes.fromhex(oid) for oid in external), align=True)
+    add(_array("I", fanout), align=True)
+    add(_array("I", by_oid))
+    add(_array("I", parent_offsets))
+    add(_array("I", parents))
+    add(_array("I", child_offsets))
+    add(_array("I", (i for child_list in children for i in child_list)))
+    add(_array("Q", body_offsets), align=True)
+    for body in bodies:
+        add(body)
+
+    add(struct.pack("<I", len(sections)))
+    for tag, data in sections.items():
+        add(_SECTION.pack(tag, len(data)))
+        add(data)
+
+    checksum = hashlib.sha1()
+    for part in parts:
+        checksum.update(part)
+    parts.append(checksum.digest())
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    with open(tmp_path, "wb") as f:
+        for part in parts:
+            f.write(part)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class _Layout(NamedTuple):
+    tips: Dict[str, str]
+    count: int
+    external: int
+    # Byte offsets of the arrays in the file
+    oids: int
+    fanout: int
+    by_oid: int
+    parent_offsets: int
+    parents: int
+    child_offsets: int
+    children: int
+    body_offsets: int
+    bodies: int
+    # tag -> (offset, length)
+    sections: Dict[bytes, Tuple[int, int]]
+
+def _align(pos: int) -> int:
+    return pos + (-pos % 8)
+
+def _layout(buf) -> _Layout:
+    if len(buf) < _HEADER.size + 20:
+        raise SnapshotError("Truncated snapshot")
+    try:
+        return _parse_layout(buf)
+    except (struct.error, UnicodeDecodeError) as e:
+        raise SnapshotError(f"Malformed snapshot: {e}")
+
+def _parse_layout(buf) -> _Layout:
+    magic, version, tip_count, count, external = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError(f"Unsupported snapshot format {magic!r} v{version}")
+    pos = _HEADER.size
+
+    tips = {}
+    for _ in range(tip_count):
+        (name_len,) = _TIP_NAME_LEN.unpack_from(buf, pos)
+        pos += _TIP_NAME_LEN.size
+        name = buf[pos:pos + name_len].decode()
+        pos += name_len
+        tips[name] = buf[pos:pos + 20].hex()
+        pos += 20
+
+    oids = _align(pos)
+    fanout = _align(oids + 20 * (count + external))
+    by_oid = fanout + 4 * 256
+    parent_offsets = by_oid + 4 * count
+    parents = parent_offsets + 4 * (count + 1)
+    (parent_count,) = struct.unpack_from("<I", buf, parents - 4)
+    child_offsets = parents + 4 * parent_count
+    children = child_offsets + 4 * (count + 1)
+    (child_count,) = struct.unpack_from("<I", buf, children - 4)
+    body_offsets = _align(children + 4 * child_count)
+    bodies = body_offsets + 8 * (count + 1)
+    (body_size,) = struct.unpack_from("<Q", buf, bodies - 8)
+    pos = bodies + body_size
+
+    sections = {}
+    (section_count,) = struct.unpack_from("<I", buf, pos)
+    pos += 4
+    for _ in range(section_count):
+        tag, length = _SECTION.unpack_from(buf, pos)
+        pos += _SECTION.size
+        sections[tag] = (pos, length)
+        pos += length
+    # Catches truncated and overlong files without hashing them.
+    if pos + 20 != len(buf):
+        raise SnapshotError(f"Snapshot is {len(buf)} bytes, its layout says {pos + 20}")
+
+    return _Layout(tips, count, external, oids, fanout, by_oid, parent_offsets, parents,
+                   child_offsets, children, body_offsets, bodies, sections)
+
+def _open(path: Path) -> mmap.mmap:
+    try:
+        f = open(path, "rb")
+    except OSError as e:
+        raise SnapshotError(f"Cannot open snapshot {path}: {e}")
+    with f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise SnapshotError(f"Empty snapshot {path}")
+
+def _verify(buf):
+    with memoryview(buf) as view:
+        digest = hashlib.sha1(view[:-20]).digest()
+    if digest != buf[-20:]:
+        raise SnapshotError("Snapshot checksum mismatch")
+
+def verify_snapshot(path: Path):
+    """Checks a snapshot against its SHA-1 trailer, like `git fsck` for a pack.
+
+    Raises SnapshotError if it is malformed or any byte differs.
+    """
+    with _open(path) as buf:
+        if len(buf) < _HEADER.size + 20:
+            raise SnapshotError("Truncated snapshot")
+        _verify(buf)
+        _layout(buf)
+
+def read_snapshot(
+    path: Path,
+) -> Tuple[Dict[str, str], Dict[str, CommitNode], List[CommitNode], Dict[bytes, bytes]]:
+    """Loads and verifies a snapshot written by write_snapshot, decoding every commit.
+
+    Returns `(tips, dag, sorted_commits, sections)`. Raises SnapshotError if
+    the file cannot be trusted. The service attaches snapshots instead
+    (attach_snapshot); this is the reference reader for tests and tools.
+    """
+    with _open(path) as buf:
+        if len(buf) < _HEADER.size + 20:
+            raise SnapshotError("Truncated snapshot")
+        _verify(buf)
+        return _parse(buf)
+
+def attach_snapshot(path: Path) -> Tuple[Dict[str, str], CompactDag, Dict[bytes, memoryview]]:
+    """Maps a snapshot read-only and returns `(tips, dag, sections)` without loading it.
+
+    The sections are views into the mapping. The file stays mapped for as
+    long as the returned CompactDag or any of the section views is alive.
+    Only the structure is checked (see verify_snapshot); raises SnapshotError
+    if it is wrong.
+    """
+    buf = _open(path)
+    try:
+        layout = _layout(buf)
+        if sys.byteorder != "little":
+            raise SnapshotError("Snapshots can only be attached on little-endian hosts")
+    except BaseException:
+        buf.close()
+        raise
+    view = memoryview(buf)
+    count = layout.count
+
+    def u32(start: int, n: int) -> memoryview:
+        return view[start:start + 4 * n].cast("I")
+
+    dag = CompactDag(
+        buf,
+        oids=view[layout.oids:layout.oids + 20 * (count + layout.external)],
+        fanout=u32(layout.fanout, 256),
+        by_oid=u32(layout.by_oid, count),
+        parent_offsets=u32(layout.parent_offsets, count + 1),
+        parents=u32(layout.parents, (layout.child_offsets - layout.parents) // 4),
+        child_offsets=u32(layout.child_offsets, count + 1),
+        children=u32(layout.children, (layout.body_offsets - layout.children) // 4),
+        body_offsets=view[layout.body_offsets:layout.bodies].cast("Q"),
+        bodies=view[layout.bodies:],
+    )
+    # Views as well: indexers can serve from them without copying (src/index/packed.py).
+    sections = {tag: view[start:start + length] for tag, (start, length) in layout.sections.items()}
+    return layout.tips, dag, sections
+
+def _parse(buf) -> Tuple[Dict[str, str], Dict[str, CommitNode], List[CommitNode], Dict[bytes, bytes]]:
+    layout = _layout(buf)
+    count = layout.count
+    oid_table = buf[layout.oids:layout.oids + 20 * count]
+    offsets = struct.unpack_from(f"<{count + 1}Q", buf, layout.body_offsets)
+    bodies_start = layout.bodies
+
+    dag: Dict[str, CommitNode] = {}
+    sorted_commits: List[CommitNode] = []
+    for i in range(count):
+        oid = oid_table[20 * i:20 * i + 20].hex()
+        commit = CommitObject.deserialize(buf[bodies_start + offsets[i]:bodies_start + offsets[i + 1]])
+        commit.oid = oid
+        node = CommitNode(oid=oid, commit=commit)
+        dag[oid] = node
+        sorted_commits.append(node)
+
+    for node in sorted_commits:
+        for parent_oid in node.parents:
+            parent = dag.get(parent_oid)
+            if parent is not None:
+                parent.children.add(node.oid)
+
+    sections = {tag: bytes(buf[start:start + length]) for tag, (start, length) in layout.sections.items()}
+    return layout.tips, dag, sorted_commits, sections
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Callable, Dict, List, Optional, Tuple
+import heapq
+
+from src.dag.models import DagSnapshot
+from src.git_objects.models import BlobObject, GitObject
+from src.git_objects.paths import PathResolver, is_blob_mode
+from src.utils.cache import LRUCache
+
+@dataclass
+class BlameRange:
+    start: int       # first line (1-based) in the blamed version of the file
+    count: int
+    commit: str      # commit that introduced these lines
+    orig_start: int  # where they started (1-based) in that commit's version
+
+def blame(
+    snapshot: DagSnapshot,
+    commit_oid: str,
+    path: str,
+    paths: PathResolver,
+    read: Callable[[str], GitObject],
+    cache: Optional[LRUCache] = None,
+) -> Optional[List[BlameRange]]:
+    """Assigns every line of `path` at `commit_oid` to the commit that last changed it.
+
+    Walks back in topological order, handing lines to a parent when that parent
+    already had them (a commit whose version of the file equals a parent's
+    passes everything through without diffing). Lines no parent accounts for
+    belong to the commit itself. The walk stops as soon as every line has an
+    owner.
+
+    Results are stored in `cache` under (commit, path); a later blame that
+    reaches an already-blamed commit reuses its result instead of walking
+    further, so blaming a new commit on top only costs the new history.
+    Returns None if `path` is not a file at `commit_oid` (missing, or a
+    directory or submodule).
+    """
+    if cache is None:
+        cache = LRUCache(0)
+    cached = cache.get((commit_oid, path))
+    if cached is not None:
+        return cached
+
+    start_pos = snapshot.position(commit_oid)
+    if start_pos is None:
+        return None
+    start = paths.lookup(snapshot.dag[commit_oid].commit.tree_oid, path)
+    if start is None or not is_blob_mode(start.mode):
+        return None
+    start_blob = start.oid
+
+    lines_of: Dict[str, List[bytes]] = {}
+
+    def lines(blob_oid: str) -> List[bytes]:
+        if blob_oid not in lines_of:
+            blob = read(blob_oid)
+            lines_of[blob_oid] = blob.data.splitlines() if isinstance(blob, BlobObject) else []
+        return lines_of[blob_oid]
+
+    total = len(lines(start_blob))
+    # final line -> (commit, line in that commit's version); all 0-based
+    owners: List[Optional[Tuple[str, int]]] = [None] * total
+    # commit -> [(line in that commit's version, final line)] still unassigned
+    pending: Dict[str, List[Tuple[int, int]]] = {commit_oid: [(i, i) for i in range(total)]}
+    heap = [(start_pos, commit_oid)]
+
+    while heap:
+        _, oid = heapq.heappop(heap)
+        todo = pending.pop(oid)
+
+        previous = cache.get((oid, path)) if oid != commit_oid else None
+        if previous is not None:
+            # Already blamed: read owners straight from the earlier result.
+            for line, final in todo:
+                owners[final] = _owner_in(previous, line)
+            continue
+
+        node = snapshot.dag[oid]
+        blob_oid = paths.oid_at(node.commit.tree_oid, path)
+        parents = []
+        for parent in node.parents:
+            if parent in snapshot.dag:
+                parent_blob = paths.oid_at(snapshot.dag[parent].commit.tree_oid, path)
+                if parent_blob is not None:
+                    parents.append((parent, parent_blob))
+
+        same = [parent for parent, parent_blob in parents if parent_blob == blob_oid]
+        if same:
+            handoff = {same[0]: todo}
+            todo = []
+        else:
+            handoff = {}
+            for parent, parent_blob in parents:
+                if not todo:
+                    break
+                mapping = _line_mapping(lines(parent_blob), lines(blob_oid))
+                passed = [(mapping[line], final) for line, final in todo if line in mapping]
+                if passed:
+                    handoff[parent] = passed
+                    todo = [(line, final) for line, final in todo if line not in mapping]
+
+        # Whatever no parent had was written here.
+        for line, final in todo:
+            owners[final] = (oid, line)
+        for parent, passed in handoff.items():
+            if parent not in pending:
+                pending[parent] = []
+                heapq.heappush(heap, (snapshot.position(parent), parent))
+            pending[parent].extend(passed)
+
+    result = _to_ranges(owners)
+    cache.put((commit_oid, path), result)
+    return result
+
+def _line_mapping(old: List[bytes], new: List[bytes]) -> Dict[int, int]:
+    """Maps line numbers in `new` to the line they were copied from in `old`."""
+    mapping = {}
+    matcher = SequenceMatcher(None, old, new, autojunk=False)
+    for old_start, new_start, size in matcher.get_matching_blocks():
+        for k in range(size):
+            mapping[new_start + k] = old_start + k
+    return mapping
+
+def _owner_in(ranges: List[BlameRange], line: int) -> Tuple[str, int]:
+    # Ranges are sorted and contiguous; binary search for the one covering `line`.
+    lo, hi = 0, len(ranges) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if ranges[mid].start - 1 <= line:
+            lo = mid
+        else:
+            hi = mid - 1
+    r = ranges[lo]
+    return r.commit, r.orig_start - 1 + (line - (r.start - 1))
+
+def _to_ranges(owners: List[Optional[Tuple[str, int]]]) -> List[BlameRange]:
+    ranges: List[BlameRange] = []
+    for final, (commit, line) in enumerate(owners):
+        last = ranges[-1] if ranges else None
+        if last is not None and last.commit == commit and last.orig_start + last.count == line + 1:
+            last.count += 1
+        else:
+            ranges.append(BlameRange(start=final + 1, count=1, commit=commit, orig_start=line + 1))
+    return ranges
@@ -0,0 +1,167 @@
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, Optional, Tuple
+import zlib
+
+from src.diff.tree_diff import DiffEntry
+from src.git_objects.models import BlobObject, GitObject
+from src.utils.cache import LRUCache
+
+# Content is cut into chunks at newlines or every 64 bytes, whichever comes
+# first, as git's diffcore-delta does. Text and binary files share the scheme.
+CHUNK_SIZE = 64
+
+GITLINK_MODE = "160000"
+
+DEFAULT_THRESHOLD = 50
+# Inexact detection is skipped when either side has more candidates than this
+# (same meaning as git's diff.renameLimit).
+DEFAULT_RENAME_LIMIT = 1000
+
+@dataclass
+class RenameOptions:
+    threshold: int = DEFAULT_THRESHOLD
+    limit: int = DEFAULT_RENAME_LIMIT
+    copies: bool = False
+
+@dataclass
+class BlobSketch:
+    size: int
+    # chunk hash -> number of bytes in chunks with that hash
+    chunks: Dict[int, int]
+
+def sketch_blob(data: bytes) -> BlobSketch:
+    chunks: Dict[int, int] = {}
+    start = 0
+    n = len(data)
+    while start < n:
+        newline = data.find(b"\n", start, start + CHUNK_SIZE)
+        end = newline + 1 if newline != -1 else min(start + CHUNK_SIZE, n)
+        h = zlib.crc32(data[start:end])
+        chunks[h] = chunks.get(h, 0) + (end - start)
+        start = end
+    return BlobSketch(size=n, chunks=chunks)
+
+def similarity(a: BlobSketch, b: BlobSketch) -> int:
+    """Share of content (0-100) that b could have copied from a."""
+    larger = max(a.size, b.size)
+    if larger == 0:
+        return 100
+    small, big = (a.chunks, b.chunks) if len(a.chunks) <= len(b.chunks) else (b.chunks, a.chunks)
+    copied = 0
+    for h, count in small.items():
+        other = big.get(h)
+        if other:
+            copied += min(count, other)
+    return copied * 100 // larger
+
+def detect_renames(
+    changes: List[DiffEntry],
+    read: Callable[[str], GitObject],
+    sketches: Optional[LRUCache] = None,
+    threshold: int = DEFAULT_THRESHOLD,
+    limit: int = DEFAULT_RENAME_LIMIT,
+    copies: bool = False,
+) -> List[DiffEntry]:
+    """Pairs deleted and added files into renames ('R'), and optionally copies ('C').
+
+    Exact matches are found by oid first. The remaining candidates are compared
+    by chunk sketches, which are cached per blob oid in `sketches` so repeated
+    diffs over the same history reuse them. With `copies`, added files can also
+    match the old side of modified files (and deleted files that were not
+    renamed). Returns the new change list, sorted by path.
+    """
+    if sketches is None:
+        # Still memoize within this call: each sketch is compared many times.
+        sketches = LRUCache(len(changes))
+
+    def sketch(oid: str) -> BlobSketch:
+        def compute() -> BlobSketch:
+            blob = read(oid)
+            return sketch_blob(blob.data if isinstance(blob, BlobObject) else b"")
+        return sketches.get_or_compute(oid, compute)
+
+    # Submodules (gitlinks) point into another repository and have no content here.
+    deleted = [c for c in changes if c.status == "D" and c.old_mode != GITLINK_MODE]
+    added = [c for c in changes if c.status == "A" and c.new_mode != GITLINK_MODE]
+    candidates = {id(c) for c in deleted + added}
+    result = [c for c in changes if id(c) not in candidates]
+
+    renames: Dict[str, DiffEntry] = {}  # new path -> rename entry
+    used_sources = set()
+
+    # 1. Exact renames: same content, moved.
+    by_oid: Dict[str, List[DiffEntry]] = {}
+    for d in deleted:
+        by_oid.setdefault(d.old_oid, []).append(d)
+    for a in added:
+        sources = by_oid.get(a.new_oid)
+        if sources:
+            source = sources.pop(0)
+            renames[a.path] = _paired("R", source, a, 100)
+            used_sources.add(source.path)
+
+    remaining_deleted = [d for d in deleted if d.path not in used_sources]
+    remaining_added = [a for a in added if a.path not in renames]
+
+    # 2. Inexact renames: best-scoring pairs first, each file used once.
+    if remaining_deleted and remaining_added and max(len(remaining_deleted), len(remaining_added)) <= limit:
+        for score, d, a in _score_pairs(remaining_deleted, remaining_added, sketch, threshold):
+            if d.path in used_sources or a.path in renames:
+                continue
+            renames[a.path] = _paired("R", d, a, score)
+            used_sources.add(d.path)
+
+    # 3. Copies: a source may be copied any number of times and stays in place.
+    copied: Dict[str, DiffEntry] = {}
+    if copies:
+        unmatched = [a for a in added if a.path not in renames]
+        sources = [_as_source(c) for c in changes if c.status == "M" and c.old_mode != GITLINK_MODE]
+        sources += [d for d in deleted if d.path not in used_sources]
+        if unmatched and sources and max(len(sources), len(unmatched)) <= limit:
+            for score, s, a in _score_pairs(sources, unmatched, sketch, threshold):
+                if a.path not in copied:
+                    copied[a.path] = _paired("C", s, a, score)
+
+    for d in deleted:
+        if d.path not in used_sources:
+            result.append(d)
+    for a in added:
+        result.append(renames.get(a.path) or copied.get(a.path) or a)
+    result.sort(key=lambda c: c.path)
+    return result
+
+def _score_pairs(
+    sources: List[DiffEntry],
+    targets: List[DiffEntry],
+    sketch: Callable[[str], BlobSketch],
+    threshold: int,
+) -> List[Tuple[int, DiffEntry, DiffEntry]]:
+    scored = []
+    # Each blob is read and sketched once, however many pairs it is part of.
+    source_sketches = [(s, sketch(s.old_oid)) for s in sources]
+    for t in targets:
+        t_sketch = sketch(t.new_oid)
+        for s, s_sketch in source_sketches:
+            # Cheap bound first: the size ratio caps the achievable score.
+            larger = max(s_sketch.size, t_sketch.size)
+            if larger and min(s_sketch.size, t_sketch.size) * 100 // larger < threshold:
+                continue
+            score = similarity(s_sketch, t_sketch)
+            if score >= threshold:
+                scored.append((score, s, t))
+    # Highest score wins; ties resolved by path for stable output.
+    scored.sort(key=lambda x: (-x[0], x[2].path, x[1].path))
+    return scored
+
+def _as_source(change: DiffEntry) -> DiffEntry:
+    return DiffEntry(status="D", path=change.path, old_oid=change.old_oid, old_mode=change.old_mode)
+
+def _paired(status: str, source: DiffEntry, target: DiffEntry, score: int) -> DiffEntry:
+    return replace(
+        target,
+        status=status,
+        old_path=source.path,
+        old_oid=source.old_oid,
+        old_mode=source.old_mode,
+        similarity=score,
+    )
@@ -0,0 +1,119 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+import difflib
+
+from src.git_objects.models import GitObject, TreeEntry, TreeObject
+from src.git_objects.paths import is_tree_mode
+
+# Line diffs are skipped for blobs larger than this; the entry is still reported.
+MAX_LINE_DIFF_SIZE = 1024 * 1024
+
+@dataclass
+class DiffEntry:
+    status: str  # 'A' added, 'D' deleted, 'M' modified, 'R' renamed, 'C' copied
+    path: str
+    old_oid: Optional[str] = None
+    new_oid: Optional[str] = None
+    old_mode: Optional[str] = None
+    new_mode: Optional[str] = None
+    # Source path and similarity (0-100) of renames and copies
+    old_path: Optional[str] = None
+    similarity: Optional[int] = None
+
+def diff_trees(
+    old_oid: Optional[str],
+    new_oid: Optional[str],
+    read: Callable[[str], GitObject],
+    base: str = "",
+) -> List[DiffEntry]:
+    """Lists the files that differ between two trees (None meaning the empty tree).
+
+    Subtrees with the same oid on both sides are identical by construction and
+    are never read, so the cost follows the size of the change rather than the
+    size of the tree. Only files are reported (like `git diff --raw -r`); a path
+    that changes between file and directory shows up as a delete plus adds.
+    """
+    if old_oid == new_oid:
+        return []
+    old_entries = _entries(old_oid, read)
+    new_entries = _entries(new_oid, read)
+
+    changes: List[DiffEntry] = []
+    for name in sorted(old_entries.keys() | new_entries.keys()):
+        old = old_entries.get(name)
+        new = new_entries.get(name)
+        path = f"{base}{name}"
+        if old is not None and new is not None and old.oid == new.oid and old.mode == new.mode:
+            continue
+
+        old_is_tree = old is not None and is_tree_mode(old.mode)
+        new_is_tree = new is not None and is_tree_mode(new.mode)
+        if old_is_tree or new_is_tree:
+            # Recurse into whichever side is a directory; a file on the other
+            # side is reported on its own.
+            changes.extend(diff_trees(
+                old.oid if old_is_tree else None,
+                new.oid if new_is_tree else None,
+                read,
+                f"{path}/",
+            ))
+            if old is not None and not old_is_tree:
+                changes.append(_deleted(path, old))
+            if new is not None and not new_is_tree:
+                changes.append(_added(path, new))
+        elif old is None:
+            changes.append(_added(path, new))
+        elif new is None:
+            changes.append(_deleted(path, old))
+        else:
+            changes.append(DiffEntry(
+                status="M",
+                path=path,
+                old_oid=old.oid,
+                new_oid=new.oid,
+                old_mode=old.mode.decode(),
+                new_mode=new.mode.decode(),
+            ))
+    return changes
+
+def _entries(oid: Optional[str], read: Callable[[str], GitObject]) -> Dict[str, TreeEntry]:
+    if oid is None:
+        return {}
+    tree = read(oid)
+    if not isinstance(tree, TreeObject):
+        raise ValueError(f"Object {oid} is not a tree")
+    return {e.name: e for e in tree.entries}
+
+def _added(path: str, entry: TreeEntry) -> DiffEntry:
+    return DiffEntry(status="A", path=path, new_oid=entry.oid, new_mode=entry.mode.decode())
+
+def _deleted(path: str, entry: TreeEntry) -> DiffEntry:
+    return DiffEntry(status="D", path=path, old_oid=entry.oid, old_mode=entry.mode.decode())
+
+def unified_line_diff(
+    old_data: bytes,
+    new_data: bytes,
+    old_path: Optional[str],
+    new_path: Optional[str],
+    context: int = 3,
+) -> Optional[str]:
+    """Unified diff of two blob versions, or None if either side is binary or too large.
+
+    A missing path (None) marks an added or deleted file.
+    """
+    if len(old_data) > MAX_LINE_DIFF_SIZE or len(new_data) > MAX_LINE_DIFF_SIZE:
+        return None
+    if b"\x00" in old_data or b"\x00" in new_data:
+        return None
+    try:
+        old_lines = old_data.decode("utf-8").splitlines(keepends=True)
+        new_lines = new_data.decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return None
+    return "".join(difflib.unified_diff(
+        old_lines,
+        new_lines,
+        fromfile=f"a/{old_path}" if old_path is not None else "/dev/null",
+        tofile=f"b/{new_path}" if new_path is not None else "/dev/null",
+        n=context,
+    ))
@@ -0,0 +1,354 @@
+"""The git index (.git/index, "DIRC") and building trees from it.
+
+Layout, per git's Documentation/gitformat-index.txt:
+
+    header:  "DIRC", u32 version (2, 3 or 4), u32 entry count
+    entry:   40 bytes of stat data (ctime, mtime, dev, ino, mode, uid, gid,
+             size), 20-byte oid, u16 flags (assume-valid, extended, 2-bit
+             stage, 12-bit name length), u16 extended flags if the extended
+             bit is set (v3+), then the path:
+               v2/v3: NUL-terminated, padded with NULs to a multiple of 8
+               v4:    varint count of bytes to drop from the previous path,
+                      then the NUL-terminated remainder, no padding
+    extensions: 4-byte signature, u32 size, data
+    trailer: SHA-1 of everything before it
+
+The cached-tree ("TREE") extension records, per directory, how many index
+entries it covers and the oid of its tree when still valid (-1 otherwise).
+"""
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import hashlib
+import mmap
+import os
+import struct
+
+from .models import TreeEntry, TreeObject
+
+SIGNATURE = b"DIRC"
+SUPPORTED_VERSIONS = (2, 3, 4)
+
+_STAT = struct.Struct(">10I")
+
+FLAG_EXTENDED = 0x4000
+FLAG_STAGE_MASK = 0x3000
+FLAG_NAME_MASK = 0x0FFF
+EXTENDED_INTENT_TO_ADD = 0x2000
+
+EXT_TREE = b"TREE"
+EXT_LINK = b"link"
+# Extensions that point at byte offsets of the file they were written in;
+# they cannot be carried over to a rewrite (git recreates them as needed).
+_OFFSET_EXTENSIONS = (b"EOIE", b"IEOT")
+
+class DirCacheError(ValueError):
+    pass
+
+@dataclass
+class IndexEntry:
+    path: str
+    oid: str
+    mode: int
+    flags: int
+    extended_flags: int = 0
+    # The 40 bytes of stat data, kept verbatim for rewriting.
+    stat: bytes = b"\0" * 40
+
+    @property
+    def stage(self) -> int:
+        return (self.flags & FLAG_STAGE_MASK) >> 12
+
+    @property
+    def intent_to_add(self) -> bool:
+        return bool(self.extended_flags & EXTENDED_INTENT_TO_ADD)
+
+    @property
+    def tree_mode(self) -> bytes:
+        """The mode as written in trees (100644, 100755, 120000, 160000)."""
+        return format(self.mode, "o").encode()
+
+@dataclass
+class CacheTree:
+    entry_count: int = -1  # -1: invalidated, must be rebuilt
+    oid: Optional[str] = None
+    subtrees: Dict[str, "CacheTree"] = field(default_factory=dict)
+
+    @property
+    def valid(self) -> bool:
+        return self.entry_count >= 0 and self.oid is not None
+
+@dataclass
+class GitIndex:
+    version: int = 2
+    entries: List[IndexEntry] = field(default_factory=list)
+    cache_tree: Optional[CacheTree] = None
+    # Other extensions, by signature, in file order; written back unchanged.
+    extensions: Dict[bytes, bytes] = field(default_factory=dict)
+
+def read_index(path: Path) -> GitIndex:
+    """Parses an index file (versions 2-4) through a read-only mmap."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < 12 + 20:
+            raise DirCacheError(f"{path}: index file too short")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            return _parse(buf, path)
+
+def _parse(buf, path: Path) -> GitIndex:
+    if hashlib.sha1(buf[:-20]).digest() != buf[-20:]:
+        raise DirCacheError(f"{path}: index checksum mismatch")
+    signature, version, count = struct.unpack_from(">4sII", buf, 0)
+    if signature != SIGNATURE:
+        raise DirCacheError(f"{path}: not an index file")
+    if version not in SUPPORTED_VERSIONS:
+        raise DirCacheError(f"{path}: unsupported index version {version}")
+
+    index = GitIndex(version=version)
+    pos = 12
+    previous = b""
+    for _ in range(count):
+        start = pos
+        stat = bytes(buf[pos:pos + _STAT.size])
+        mode = _STAT.unpack_from(buf, pos)[6]
+        pos += _STAT.size
+        oid = buf[pos:pos + 20].hex()
+        pos += 20
+        (flags,) = struct.unpack_from(">H", buf, pos)
+        pos += 2
+        extended = 0
+        if flags & FLAG_EXTENDED:
+            if version < 3:
+                raise DirCacheError(f"{path}: extended flags in a version {version} index")
+            (extended,) = struct.unpack_from(">H", buf, pos)
+            pos += 2
+        if version == 4:
+            strip, pos = _read_offset_varint(buf, pos)
+            end = buf.find(b"\0", pos)
+            name = previous[:len(previous) - strip] + buf[pos:end]
+            pos = end + 1
+        else:
+            end = buf.find(b"\0", pos)
+            name = buf[pos:end]
+            # Entries are NUL-padded to a multiple of 8 bytes (at least one NUL).
+            pos = start + ((end - start) // 8 + 1) * 8
+        previous = name
+        index.entries.append(IndexEntry(
+            path=name.decode("utf-8", "surrogateescape"),
+            oid=oid,
+            mode=mode,
+            flags=flags,
+            extended_flags=extended,
+            stat=stat,
+        ))
+
+    end_of_entries = len(buf) - 20
+    while pos + 8 <= end_of_entries:
+        signature, length = struct.unpack_from(">4sI", buf, pos)
+        pos += 8
+        data = bytes(buf[pos:pos + length])
+        pos += length
+        if signature == EXT_TREE:
+            index.cache_tree = _parse_cache_tree(data)
+        elif signature == EXT_LINK:
+            # The entries live partly in a shared index file we don't read.
+            raise DirCacheError(f"{path}: split indexes are not supported")
+        else:
+            index.extensions[signature] = data
+    return index
+
+def _read_offset_varint(buf, pos: int) -> Tuple[int, int]:
+    # Same encoding as OFS_DELTA distances in packs.
+    byte = buf[pos]
+    pos += 1
+    value = byte & 0x7F
+    while byte & 0x80:
+        byte = buf[pos]
+        pos += 1
+        value = ((value + 1) << 7) | (byte & 0x7F)
+    return value, pos
+
+def _offset_varint(value: int) -> bytes:
+    out = bytearray([value & 0x7F])
+    value >>= 7
+    while value:
+        value -= 1
+        out.insert(0, 0x80 | (value & 0x7F))
+        value >>= 7
+    return bytes(out)
+
+def _parse_cache_tree(data: bytes) -> Optional[CacheTree]:
+    pos = 0
+
+    def node() -> Tuple[str, CacheTree]:
+        nonlocal pos
+        nul = data.index(b"\0", pos)
+        name = data[pos:nul].decode("utf-8", "surrogateescape")
+        newline = data.index(b"\n", nul)
+        count_str, subtree_str = data[nul + 1:newline].split(b" ")
+        pos = newline + 1
+        tree = CacheTree(entry_count=int(count_str))
+        if tree.entry_count >= 0:
+            tree.oid = data[pos:pos + 20].hex()
+            pos += 20
+        for _ in range(int(subtree_str)):
+            child_name, child = node()
+            tree.subtrees[child_name] = child
+        return name, tree
+
+    if not data:
+        return None
+    try:
+        return node()[1]
+    except (ValueError, IndexError):
+        # A damaged cache tree only costs speed: build everything.
+        return None
+
+def _serialize_cache_tree(tree: CacheTree) -> bytes:
+    out = bytearray()
+
+    def node(name: str, t: CacheTree):
+        out.extend(name.encode("utf-8", "surrogateescape") + b"\0")
+        out.extend(b"%d %d\n" % (t.entry_count if t.valid else -1, len(t.subtrees)))
+        if t.valid:
+            out.extend(bytes.fromhex(t.oid))
+        # git orders subtrees by name length, then bytes.
+        for child_name in sorted(t.subtrees, key=lambda n: (len(n.encode()), n.encode())):
+            node(child_name, t.subtrees[child_name])
+
+    node("", tree)
+    return bytes(out)
+
+def serialize_index(index: GitIndex) -> bytes:
+    out = bytearray(struct.pack(">4sII", SIGNATURE, index.version, len(index.entries)))
+    previous = b""
+    for entry in index.entries:
+        name = entry.path.encode("utf-8", "surrogateescape")
+        flags = (entry.flags & ~FLAG_NAME_MASK) | min(len(name), FLAG_NAME_MASK)
+        start = len(out)
+        # The mode is part of the stat data; the field wins if they disagree.
+        stat = entry.stat[:24] + struct.pack(">I", entry.mode) + entry.stat[28:]
+        out += stat + bytes.fromhex(entry.oid) + struct.pack(">H", flags)
+        if flags & FLAG_EXTENDED:
+            out += struct.pack(">H", entry.extended_flags)
+        if index.version == 4:
+            common = 0
+            limit = min(len(previous), len(name))
+            while common < limit and previous[common] == name[common]:
+                common += 1
+            out += _offset_varint(len(previous) - common) + name[common:] + b"\0"
+        else:
+            out += name
+            length = len(out) - start
+            out += b"\0" * (8 - length % 8)
+        previous = name
+    if index.cache_tree is not None:
+        data = _serialize_cache_tree(index.cache_tree)
+        out += struct.pack(">4sI", EXT_TREE, len(data)) + data
+    for signature, data in index.extensions.items():
+        if signature in _OFFSET_EXTENSIONS:
+            continue
+        out += struct.pack(">4sI", signature, len(data)) + data
+    out += hashlib.sha1(out).digest()
+    return bytes(out)
+
+class IndexLock:
+    """Holds `index.lock` next to an index file, the way git serialises index updates.
+
+    Entering raises FileExistsError if another process holds the lock. Call
+    `commit` to replace the index; leaving without committing releases the
+    lock and keeps the old index.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock_path = path.with_name(path.name + ".lock")
+        self._fd: Optional[int] = None
+
+    def __enter__(self) -> "IndexLock":
+        self._fd = os.open(self.lock_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        return self
+
+    def commit(self, index: GitIndex):
+        data = serialize_index(index)
+        fd, self._fd = self._fd, None
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(self.lock_path, self.path)
+        except BaseException:
+            self._unlink()
+            raise
+
+    def __exit__(self, *exc):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._unlink()
+
+    def _unlink(self):
+        try:
+            os.unlink(self.lock_path)
+        except OSError:
+            pass
+
+def write_index(path: Path, index: GitIndex):
+    """Writes `index` to `path` through `path.lock`; FileExistsError if it is locked."""
+    with IndexLock(path) as lock:
+        lock.commit(index)
+
+def build_tree(
+    index: GitIndex,
+    add_tree: Callable[[TreeObject], str],
+    exists: Callable[[str], bool],
+) -> Tuple[str, bool]:
+    """Builds the root tree of `index`, like `git write-tree`.
+
+    Directories whose cached-tree entry is still valid (and whose tree
+    exists) are reused without looking at their entries; only the others
+    are rebuilt, through `add_tree`, which stores a tree and returns its
+    oid. `index.cache_tree` is updated in place. Returns (root tree oid,
+    whether the cached tree changed).
+    """
+    entries = index.entries
+    for entry in entries:
+        if entry.stage:
+            raise DirCacheError(f"{entry.path}: unmerged entry in index")
+    changed = False
+
+    def build(pos: int, prefix: str, cached: Optional[CacheTree]) -> Tuple[Optional[CacheTree], int]:
+        nonlocal changed
+        if cached is not None and cached.valid and exists(cached.oid):
+            return cached, pos + cached.entry_count
+
+        tree_entries: List[TreeEntry] = []
+        subtrees: Dict[str, CacheTree] = {}
+        i = pos
+        while i < len(entries) and entries[i].path.startswith(prefix):
+            entry = entries[i]
+            rest = entry.path[len(prefix):]
+            slash = rest.find("/")
+            if slash == -1:
+                if not entry.intent_to_add:
+                    tree_entries.append(TreeEntry(mode=entry.tree_mode, name=rest, oid=entry.oid))
+                i += 1
+                continue
+            name = rest[:slash]
+            previous = cached.subtrees.get(name) if cached is not None else None
+            sub, i = build(i, f"{prefix}{name}/", previous)
+            if sub is not None:
+                subtrees[name] = sub
+                tree_entries.append(TreeEntry(mode=b"40000", name=name, oid=sub.oid))
+
+        changed = True
+        if not tree_entries and prefix:
+            # Directories without anything to commit are left out, as in git.
+            return None, i
+        oid = add_tree(TreeObject(entries=tree_entries))
+        return CacheTree(entry_count=i - pos, oid=oid, subtrees=subtrees), i
+
+    root, _ = build(0, "", index.cache_tree)
+    index.cache_tree = root
+    return root.oid, changed
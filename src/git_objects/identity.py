@@ -0,0 +1,39 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import re
+
+# "Name <email> 1700000000 +0100"; timestamp and offset may be missing in
+# hand-made commits.
+_IDENTITY = re.compile(r"^(.*?)\s*<([^>]*)>\s*(-?\d+)?\s*([+-]\d{4})?")
+
+@dataclass(frozen=True)
+class Identity:
+    name: str
+    email: str
+    timestamp: int = 0      # seconds since the epoch, UTC
+    offset: int = 0         # minutes east of UTC
+
+def parse_identity(header: str) -> Identity:
+    """Parses an author/committer header value; anything unparseable becomes the name."""
+    match = _IDENTITY.match(header)
+    if not match:
+        return Identity(name=header.strip(), email="")
+    name, email, timestamp, offset = match.groups()
+    minutes = 0
+    if offset:
+        sign = -1 if offset[0] == "-" else 1
+        minutes = sign * (int(offset[1:3]) * 60 + int(offset[3:5]))
+    return Identity(name=name, email=email, timestamp=int(timestamp or 0), offset=minutes)
+
+def parse_date(value: str) -> int:
+    """Epoch seconds from either a plain number or an ISO 8601 date/time (UTC if no zone).
+
+    Raises ValueError for anything else.
+    """
+    value = value.strip()
+    if re.fullmatch(r"-?\d+", value):
+        return int(value)
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
@@ -1,8 +1,11 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import List, Optional
 import hashlib
 
+from .identity import Identity, parse_identity
+
 @dataclass
 class GitObject(ABC):
     oid: Optional[str] = field(default=None, init=False)
@@ -24,11 +27,21 @@ class GitObject(ABC):
     def compute_oid(self) -> str:
         """Computes and sets the SHA-1 hash of the object."""
         data = self.serialize()
-        header = f"{self.type.decode()} {len(data)}".encode() + b"\x00"
-        full_content = header + data
-        self.oid = hashlib.sha1(full_content).hexdigest()
+        # Hash header and content separately rather than concatenating them,
+        # which would copy the whole object once more.
+        h = hashlib.sha1(object_header(self.type, len(data)))
+        h.update(data)
+        self.oid = h.hexdigest()
         return self.oid
 
+def object_header(obj_type: bytes, size: int) -> bytes:
+    """The "<type> <size>\\0" prefix that loose objects and object ids are computed over."""
+    return b"%s %d\0" % (obj_type, size)
+
+def tree_sort_key(entry: "TreeEntry") -> str:
+    """git's canonical tree order: by name, with directories compared as if they ended in "/"."""
+    return entry.name + "/" if entry.mode in (b"40000", b"040000") else entry.name
+
 @dataclass
 class BlobObject(GitObject):
     data: bytes
@@ -59,18 +72,13 @@ class TreeObject(GitObject):
         return b"tree"
 
     def serialize(self) -> bytes:
-        output = b""
-        # Sort entries by name for canonical representation (Git sorts in a specific way, simplified here to name)
-        # Git sorting is slightly weird: directories are sorted as if they end with /, files as is.
-        # We will do a simple sort for now.
-        sorted_entries = sorted(self.entries, key=lambda e: e.name)
-        
-        for entry in sorted_entries:
-            # Mode name\0hash (binary)
-            import binascii
-            oid_bytes = binascii.unhexlify(entry.oid)
-            output += entry.mode + b" " + entry.name.encode() + b"\x00" + oid_bytes
-        return output
+        # Mode name\0hash (binary), in canonical order ("a.txt" < "a/" < "a0").
+        # Parts are joined once at the end; appending to bytes would be quadratic.
+        parts = []
+        for entry in sorted(self.entries, key=tree_sort_key):
+            parts.append(b"%s %s\0" % (entry.mode, entry.name.encode()))
+            parts.append(bytes.fromhex(entry.oid))
+        return b"".join(parts)
 
     @classmethod
     def deserialize(cls, data: bytes) -> "TreeObject":
@@ -111,6 +119,15 @@ class CommitObject(GitObject):
     def type(self) -> bytes:
         return b"commit"
 
+    # Parsed on first use and kept with the object, so filters don't re-parse.
+    @cached_property
+    def author_identity(self) -> Identity:
+        return parse_identity(self.author)
+
+    @cached_property
+    def committer_identity(self) -> Identity:
+        return parse_identity(self.committer)
+
     def serialize(self) -> bytes:
         lines = []
         lines.append(f"tree {self.tree_oid}".encode())
@@ -163,3 +180,20 @@ class CommitObject(GitObject):
             committer=committer,
             message=message
         )
+
+# Per-object and per-tree-entry overhead of the parsed objects (dataclass,
+# strings, list slots), measured on CPython 3.11 and rounded up. Only used to
+# size caches.
+OBJECT_OVERHEAD_BYTES = 150
+TREE_ENTRY_OVERHEAD_BYTES = 250
+
+def estimate_object_bytes(obj: GitObject) -> int:
+    """Approximate memory held by a parsed object: its content plus Python overhead."""
+    if isinstance(obj, BlobObject):
+        return OBJECT_OVERHEAD_BYTES + len(obj.data)
+    if isinstance(obj, TreeObject):
+        return OBJECT_OVERHEAD_BYTES + sum(TREE_ENTRY_OVERHEAD_BYTES + len(e.name) for e in obj.entries)
+    if isinstance(obj, CommitObject):
+        return (OBJECT_OVERHEAD_BYTES + 90 * (len(obj.parent_oids) + 1)
+                + len(obj.message) + len(obj.author) + len(obj.committer))
+    return OBJECT_OVERHEAD_BYTES
@@ -0,0 +1,659 @@
+"""Reading and writing git pack files (.pack plus version 2 .idx).
+
+Layout, as documented in git's Documentation/gitformat-pack.txt:
+
+    pack: "PACK", u32 version (2), u32 object count, objects, SHA-1 trailer
+          each object is a type/size varint header, then (for OFS_DELTA) the
+          distance back to its base, then zlib-deflated content
+    idx:  "\\377tOc", u32 version (2), 256 cumulative u32 fan-out counts,
+          sorted 20-byte object names, u32 CRC32 per object, u32 offsets
+          (MSB set = index into the u64 table that follows), u64 offsets,
+          pack checksum, idx checksum
+"""
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from src.utils.cache import LRUCache
+from src.utils.metrics import Counter
+
+OBJ_COMMIT = 1
+OBJ_TREE = 2
+OBJ_BLOB = 3
+OBJ_TAG = 4
+OBJ_OFS_DELTA = 6
+OBJ_REF_DELTA = 7
+
+TYPE_NUMBERS = {b"commit": OBJ_COMMIT, b"tree": OBJ_TREE, b"blob": OBJ_BLOB, b"tag": OBJ_TAG}
+TYPE_NAMES = {number: name for name, number in TYPE_NUMBERS.items()}
+
+IDX_MAGIC = b"\377tOc"
+IDX_VERSION = 2
+
+# Delta search parameters, matching git's defaults for pack.window and pack.depth.
+DELTA_WINDOW = 10
+MAX_DELTA_DEPTH = 50
+# Objects smaller than this are stored whole; a delta would barely be smaller.
+MIN_DELTA_SIZE = 64
+# Matching granularity of the delta encoder.
+DELTA_BLOCK = 16
+# Copy instructions are split at this size (the largest git always accepts).
+MAX_COPY_SIZE = 0x10000
+# write_pack holds at most about this many bytes of object content at a time;
+# deltas are searched within each such batch.
+WRITE_BATCH_BYTES = 32 << 20
+# Reconstructed delta bases kept per pack, keyed by offset.
+DELTA_BASE_CACHE_SIZE = 256
+
+class PackError(ValueError):
+    pass
+
+OBJECT_READS = Counter("tinygit_object_reads_total", "Objects read, by where they were found", ["source"])
+INFLATED_BYTES = Counter("tinygit_inflated_bytes_total", "Bytes produced by zlib inflation of stored objects (pack counts include deltas)", ["source"])
+_PACK_INFLATED = INFLATED_BYTES.labels(source="pack")
+
+# ---------------------------------------------------------------------------
+# Deltas
+
+def _size_varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def _read_size_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if not byte & 0x80:
+            return value, pos
+
+def create_delta(base: bytes, target: bytes) -> bytes:
+    """Encodes `target` as copy/insert instructions against `base`.
+
+    Base blocks are indexed at DELTA_BLOCK boundaries; each hit in the target
+    is extended forwards (and backwards over pending literals) as far as the
+    bytes agree.
+    """
+    index: Dict[bytes, int] = {}
+    for i in range(0, len(base) - DELTA_BLOCK + 1, DELTA_BLOCK):
+        index.setdefault(base[i:i + DELTA_BLOCK], i)
+
+    out = bytearray(_size_varint(len(base)) + _size_varint(len(target)))
+    literal = bytearray()
+
+    def flush_literal():
+        for start in range(0, len(literal), 127):
+            chunk = literal[start:start + 127]
+            out.append(len(chunk))
+            out.extend(chunk)
+        literal.clear()
+
+    i = 0
+    n = len(target)
+    while i < n:
+        offset = index.get(target[i:i + DELTA_BLOCK]) if i + DELTA_BLOCK <= n else None
+        if offset is None:
+            literal.append(target[i])
+            i += 1
+            continue
+        length = DELTA_BLOCK
+        while (i + length + DELTA_BLOCK <= n and offset + length + DELTA_BLOCK <= len(base)
+               and target[i + length:i + length + DELTA_BLOCK] == base[offset + length:offset + length + DELTA_BLOCK]):
+            length += DELTA_BLOCK
+        while i + length < n and offset + length < len(base) and target[i + length] == base[offset + length]:
+            length += 1
+        start = i
+        while literal and offset > 0 and literal[-1] == base[offset - 1]:
+            literal.pop()
+            offset -= 1
+            start -= 1
+            length += 1
+        flush_literal()
+        i = start + length
+        while length:
+            size = min(length, MAX_COPY_SIZE)
+            _copy_instruction(out, offset, size)
+            offset += size
+            length -= size
+    flush_literal()
+    return bytes(out)
+
+def _copy_instruction(out: bytearray, offset: int, size: int):
+    op = 0x80
+    args = bytearray()
+    for k in range(4):
+        byte = (offset >> (8 * k)) & 0xFF
+        if byte:
+            op |= 1 << k
+            args.append(byte)
+    # A size of 0x10000 is encoded as no size bytes at all.
+    if size != 0x10000:
+        for k in range(3):
+            byte = (size >> (8 * k)) & 0xFF
+            if byte:
+                op |= 0x10 << k
+                args.append(byte)
+    out.append(op)
+    out.extend(args)
+
+def apply_delta(base: bytes, delta: bytes) -> bytes:
+    base_size, pos = _read_size_varint(delta, 0)
+    target_size, pos = _read_size_varint(delta, pos)
+    if base_size != len(base):
+        raise PackError("Delta base size mismatch")
+    out = bytearray()
+    n = len(delta)
+    while pos < n:
+        op = delta[pos]
+        pos += 1
+        if op & 0x80:
+            offset = size = 0
+            for k in range(4):
+                if op & (1 << k):
+                    offset |= delta[pos] << (8 * k)
+                    pos += 1
+            for k in range(3):
+                if op & (0x10 << k):
+                    size |= delta[pos] << (8 * k)
+                    pos += 1
+            if size == 0:
+                size = 0x10000
+            out += base[offset:offset + size]
+        elif op:
+            out += delta[pos:pos + op]
+            pos += op
+        else:
+            raise PackError("Invalid delta opcode 0")
+    if len(out) != target_size:
+        raise PackError("Delta result size mismatch")
+    return bytes(out)
+
+# ---------------------------------------------------------------------------
+# Writing
+
+def _object_header(type_number: int, size: int) -> bytes:
+    byte = (type_number << 4) | (size & 0x0F)
+    size >>= 4
+    out = bytearray()
+    while size:
+        out.append(byte | 0x80)
+        byte = size & 0x7F
+        size >>= 7
+    out.append(byte)
+    return bytes(out)
+
+def _ofs_distance(distance: int) -> bytes:
+    out = bytearray([distance & 0x7F])
+    distance >>= 7
+    while distance:
+        distance -= 1
+        out.insert(0, 0x80 | (distance & 0x7F))
+        distance >>= 7
+    return bytes(out)
+
+def _choose_deltas(objects: List[Tuple[str, bytes, bytes]]) -> Dict[str, Tuple[str, bytes]]:
+    """Picks a delta base for objects that compress well against a similar one.
+
+    Without path names to group by, candidates are objects of the same type
+    and similar size (sorted by size, largest first, as git does within a
+    name group), compared within a sliding window. Returns oid -> (base oid,
+    delta) for the objects that get one.
+    """
+    order = sorted(
+        (o for o in objects if o[1] != b"commit" and len(o[2]) >= MIN_DELTA_SIZE),
+        key=lambda o: (o[1], -len(o[2])),
+    )
+    bases: Dict[str, Tuple[str, bytes]] = {}
+    depth: Dict[str, int] = {}
+    for i, (oid, obj_type, data) in enumerate(order):
+        best = None
+        # A delta is only worth it if it is well under half the object.
+        best_size = len(data) // 2
+        for base_oid, base_type, base_data in order[max(0, i - DELTA_WINDOW):i]:
+            if base_type != obj_type or depth.get(base_oid, 0) >= MAX_DELTA_DEPTH:
+                continue
+            if abs(len(base_data) - len(data)) > best_size:
+                continue
+            delta = create_delta(base_data, data)
+            if len(delta) < best_size:
+                best, best_size = (base_oid, delta), len(delta)
+        if best is not None:
+            bases[oid] = best
+            depth[oid] = depth.get(best[0], 0) + 1
+    return bases
+
+def _batches(objects: Iterable[Tuple[str, bytes, bytes]], max_bytes: int) -> Iterator[List[Tuple[str, bytes, bytes]]]:
+    batch: List[Tuple[str, bytes, bytes]] = []
+    size = 0
+    for obj in objects:
+        batch.append(obj)
+        size += len(obj[2])
+        if size >= max_bytes:
+            yield batch
+            batch, size = [], 0
+    if batch:
+        yield batch
+
+def write_pack(
+    pack_dir: Path,
+    objects: Iterable[Tuple[str, bytes, bytes]],
+    deltas: bool = False,
+    batch_bytes: int = WRITE_BATCH_BYTES,
+) -> Tuple[Path, Path]:
+    """Writes (oid, type, content) triples as a new pack and its .idx in `pack_dir`.
+
+    `objects` is consumed lazily, in batches of about `batch_bytes` of
+    content, so it can be a generator over more objects than fit in memory.
+    With `deltas`, trees and blobs may be stored as OFS_DELTAs against a
+    similar object earlier in the same batch. Both files are written under
+    temporary names and fsynced; the .idx is renamed into place last, since
+    readers only look at packs that have one. Returns (pack path, idx path).
+    """
+    pack_dir.mkdir(parents=True, exist_ok=True)
+    tmp_pack = pack_dir / f"tmp_pack_{os.getpid()}_{threading.get_ident()}"
+    offsets: Dict[str, int] = {}
+    crcs: Dict[str, int] = {}
+    with open(tmp_pack, "w+b") as f:
+        # The object count is only known at the end; it is patched in below.
+        position = f.write(b"PACK" + struct.pack(">II", 2, 0))
+        for batch in _batches(objects, batch_bytes):
+            bases = _choose_deltas(batch) if deltas else {}
+            by_oid = {oid: (obj_type, data) for oid, obj_type, data in batch}
+
+            # Bases must come before the objects that delta against them.
+            ordered: List[str] = []
+            placed = set()
+
+            def place(oid: str):
+                if oid in placed or oid in offsets:
+                    return
+                base = bases.get(oid)
+                if base is not None:
+                    place(base[0])
+                placed.add(oid)
+                ordered.append(oid)
+
+            for oid, _, _ in batch:
+                place(oid)
+
+            for oid in ordered:
+                obj_type, data = by_oid[oid]
+                base = bases.get(oid)
+                if base is not None:
+                    base_oid, payload = base
+                    entry = _object_header(OBJ_OFS_DELTA, len(payload)) + _ofs_distance(position - offsets[base_oid])
+                else:
+                    payload = data
+                    entry = _object_header(TYPE_NUMBERS[obj_type], len(payload))
+                entry += zlib.compress(payload)
+                offsets[oid] = position
+                crcs[oid] = zlib.crc32(entry)
+                f.write(entry)
+                position += len(entry)
+
+        f.seek(0)
+        f.write(b"PACK" + struct.pack(">II", 2, len(offsets)))
+        f.seek(0)
+        checksum = hashlib.sha1()
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            checksum.update(chunk)
+        pack_sha = checksum.digest()
+        f.write(pack_sha)
+        f.flush()
+        os.fsync(f.fileno())
+
+    names = sorted(offsets)
+    idx = bytearray(IDX_MAGIC + struct.pack(">I", IDX_VERSION))
+    fanout = [0] * 256
+    for oid in names:
+        fanout[int(oid[:2], 16)] += 1
+    total = 0
+    for count in fanout:
+        total += count
+        idx += struct.pack(">I", total)
+    for oid in names:
+        idx += bytes.fromhex(oid)
+    for oid in names:
+        idx += struct.pack(">I", crcs[oid])
+    large = []
+    for oid in names:
+        offset = offsets[oid]
+        if offset < 0x80000000:
+            idx += struct.pack(">I", offset)
+        else:
+            idx += struct.pack(">I", 0x80000000 | len(large))
+            large.append(offset)
+    for offset in large:
+        idx += struct.pack(">Q", offset)
+    idx += pack_sha
+    idx += hashlib.sha1(idx).digest()
+
+    tmp_idx = pack_dir / f"tmp_idx_{os.getpid()}_{threading.get_ident()}"
+    with open(tmp_idx, "wb") as f:
+        f.write(idx)
+        f.flush()
+        os.fsync(f.fileno())
+
+    name = f"pack-{pack_sha.hex()}"
+    pack_path = pack_dir / f"{name}.pack"
+    idx_path = pack_dir / f"{name}.idx"
+    os.replace(tmp_pack, pack_path)
+    os.replace(tmp_idx, idx_path)
+    fsync_dir(pack_dir)
+    return pack_path, idx_path
+
+def fsync_dir(path: Path):
+    """Flushes a directory entry (new or renamed files) to disk, where the platform allows it."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+# ---------------------------------------------------------------------------
+# Reading
+
+class PackIndex:
+    """A memory-mapped .idx v2 file."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = self._buf
+        if buf[:4] != IDX_MAGIC or struct.unpack_from(">I", buf, 4)[0] != IDX_VERSION:
+            raise PackError(f"{path}: not a version 2 pack index")
+        self._fanout = struct.unpack_from(">256I", buf, 8)
+        self.count = self._fanout[255]
+        self._names = 8 + 256 * 4
+        self._crcs = self._names + 20 * self.count
+        self._offsets = self._crcs + 4 * self.count
+        self._large = self._offsets + 4 * self.count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def find(self, oid: bytes) -> Optional[int]:
+        """Pack offset of the object with the 20-byte name `oid`, or None."""
+        first = oid[0]
+        lo = self._fanout[first - 1] if first else 0
+        hi = self._fanout[first]
+        buf = self._buf
+        names = self._names
+        while lo < hi:
+            mid = (lo + hi) // 2
+            name = buf[names + 20 * mid:names + 20 * mid + 20]
+            if name < oid:
+                lo = mid + 1
+            elif name > oid:
+                hi = mid
+            else:
+                return self._offset_at(mid)
+        return None
+
+    def _offset_at(self, i: int) -> int:
+        (offset,) = struct.unpack_from(">I", self._buf, self._offsets + 4 * i)
+        if offset & 0x80000000:
+            (offset,) = struct.unpack_from(">Q", self._buf, self._large + 8 * (offset & 0x7FFFFFFF))
+        return offset
+
+    def oids(self) -> Iterable[str]:
+        for i in range(self.count):
+            yield self._buf[self._names + 20 * i:self._names + 20 * i + 20].hex()
+
+    def close(self):
+        self._buf.close()
+
+class PackFile:
+    """A memory-mapped .pack with its index; resolves deltas on read."""
+
+    def __init__(self, pack_path: Path, index: PackIndex):
+        self.path = pack_path
+        self.index = index
+        with open(pack_path, "rb") as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._buf[:4] != b"PACK":
+            raise PackError(f"{pack_path}: not a pack file")
+        self._bases = LRUCache(DELTA_BASE_CACHE_SIZE)
+        # Set by PackSet so REF_DELTA bases can live in another pack.
+        self.resolve_external: Optional[Callable[[bytes], Optional[Tuple[bytes, bytes]]]] = None
+
+    def read(self, oid: bytes) -> Optional[Tuple[bytes, bytes]]:
+        offset = self.index.find(oid)
+        if offset is None:
+            return None
+        return self.read_at(offset)
+
+    def read_at(self, offset: int) -> Tuple[bytes, bytes]:
+        """(type name, content) of the object stored at `offset`."""
+        # Walk down the delta chain, then apply deltas back up.
+        chain: List[Tuple[int, bytes]] = []
+        while True:
+            cached = self._bases.get(offset)
+            if cached is not None:
+                obj_type, data = cached
+                break
+            type_number, _, data_start, base = self._entry(offset)
+            if type_number in (OBJ_OFS_DELTA, OBJ_REF_DELTA):
+                chain.append((offset, self._inflate(data_start)))
+                if type_number == OBJ_OFS_DELTA:
+                    offset = base
+                    continue
+                local = self.index.find(base)
+                if local is not None:
+                    offset = local
+                    continue
+                external = self.resolve_external(base) if self.resolve_external else None
+                if external is None:
+                    raise PackError(f"{self.path}: missing delta base {base.hex()}")
+                obj_type, data = external
+                break
+            obj_type = TYPE_NAMES.get(type_number)
+            if obj_type is None:
+                raise PackError(f"{self.path}: unknown object type {type_number} at {offset}")
+            data = self._inflate(data_start)
+            if chain:
+                self._bases.put(offset, (obj_type, data))
+            break
+        for delta_offset, delta in reversed(chain):
+            data = apply_delta(data, delta)
+            if delta_offset != chain[0][0]:
+                self._bases.put(delta_offset, (obj_type, data))
+        return obj_type, data
+
+    def peek(self, oid: bytes) -> Optional[Tuple[bytes, int]]:
+        """(type name, size) of an object, inflating at most a delta's header."""
+        offset = self.index.find(oid)
+        if offset is None:
+            return None
+        type_number, size, data_start, base = self._entry(offset)
+        if type_number in (OBJ_OFS_DELTA, OBJ_REF_DELTA):
+            # The delta header holds the base size, then the result's size.
+            header = zlib.decompressobj().decompress(self._buf[data_start:data_start + 64], 20)
+            _, pos = _read_size_varint(header, 0)
+            size, _ = _read_size_varint(header, pos)
+            while type_number in (OBJ_OFS_DELTA, OBJ_REF_DELTA):
+                if type_number == OBJ_REF_DELTA:
+                    local = self.index.find(base)
+                    if local is None:
+                        external = self.resolve_external(base) if self.resolve_external else None
+                        if external is None:
+                            raise PackError(f"{self.path}: missing delta base {base.hex()}")
+                        return external[0], size
+                    base = local
+                type_number, _, _, base = self._entry(base)
+        obj_type = TYPE_NAMES.get(type_number)
+        if obj_type is None:
+            raise PackError(f"{self.path}: unknown object type {type_number} at {offset}")
+        return obj_type, size
+
+    def _entry(self, offset: int):
+        """(type number, size, data start, delta base) of the entry at `offset`."""
+        buf = self._buf
+        byte = buf[offset]
+        type_number = (byte >> 4) & 7
+        size = byte & 0x0F
+        shift = 4
+        pos = offset + 1
+        while byte & 0x80:
+            byte = buf[pos]
+            pos += 1
+            size |= (byte & 0x7F) << shift
+            shift += 7
+        base = None
+        if type_number == OBJ_OFS_DELTA:
+            byte = buf[pos]
+            pos += 1
+            distance = byte & 0x7F
+            while byte & 0x80:
+                byte = buf[pos]
+                pos += 1
+                distance = ((distance + 1) << 7) | (byte & 0x7F)
+            base = offset - distance
+        elif type_number == OBJ_REF_DELTA:
+            base = bytes(buf[pos:pos + 20])
+            pos += 20
+        return type_number, size, pos, base
+
+    def _inflate(self, start: int) -> bytes:
+        d = zlib.decompressobj()
+        out = bytearray()
+        pos = start
+        # Feed in slices until the stream ends; the compressed length isn't stored.
+        while not d.eof:
+            chunk = self._buf[pos:pos + 65536]
+            if not chunk:
+                raise PackError(f"{self.path}: truncated object at {start}")
+            out += d.decompress(chunk)
+            pos += len(chunk)
+        _PACK_INFLATED.inc(len(out))
+        return bytes(out)
+
+    def close(self):
+        self._buf.close()
+        self.index.close()
+
+class PackSet:
+    """All packs of one repository, reloaded when objects/pack changes."""
+
+    def __init__(self, git_dir: Path):
+        self.pack_dir = git_dir / "objects" / "pack"
+        self.packs: List[PackFile] = []
+        self._loaded: Dict[str, PackFile] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def read(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        """(type name, content) of a packed object, or None if no pack has it."""
+        name = bytes.fromhex(oid)
+        result = self._find(name)
+        if result is None and self._reload():
+            result = self._find(name)
+        return result
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        """(type name, size) of a packed object, or None if no pack has it."""
+        name = bytes.fromhex(oid)
+        for attempt in range(2):
+            for pack in self.packs:
+                result = pack.peek(name)
+                if result is not None:
+                    return result
+            if attempt or not self._reload():
+                return None
+        return None
+
+    def oids(self) -> Iterator[str]:
+        """Every packed oid; an object in several packs is listed once per pack."""
+        self._reload()
+        for pack in self.packs:
+            yield from pack.index.oids()
+
+    def contains(self, oid: str) -> bool:
+        name = bytes.fromhex(oid)
+        if any(p.index.find(name) is not None for p in self.packs):
+            return True
+        return self._reload() and any(p.index.find(name) is not None for p in self.packs)
+
+    def close(self):
+        """Unmaps every pack; a later read maps them again."""
+        with self._lock:
+            packs = list(self._loaded.values())
+            self._loaded = {}
+            self.packs = []
+            self._mtime = None
+        for pack in packs:
+            pack.close()
+
+    def _find(self, name: bytes) -> Optional[Tuple[bytes, bytes]]:
+        for pack in self.packs:
+            result = pack.read(name)
+            if result is not None:
+                return result
+        return None
+
+    def _reload(self) -> bool:
+        """Picks up new packs; returns whether the set changed."""
+        try:
+            mtime = self.pack_dir.stat().st_mtime_ns
+        except OSError:
+            return False
+        with self._lock:
+            if mtime == self._mtime:
+                return False
+            self._mtime = mtime
+            changed = False
+            for idx_path in sorted(self.pack_dir.glob("pack-*.idx")):
+                key = idx_path.stem
+                pack_path = idx_path.with_suffix(".pack")
+                if key in self._loaded or not pack_path.exists():
+                    continue
+                try:
+                    pack = PackFile(pack_path, PackIndex(idx_path))
+                except (OSError, ValueError):
+                    continue
+                pack.resolve_external = self._find
+                self._loaded[key] = pack
+                changed = True
+            if changed:
+                # Newest first: freshly repacked objects are the likeliest reads.
+                self.packs = sorted(self._loaded.values(), key=lambda p: p.path.stat().st_mtime_ns, reverse=True)
+            return changed
+
+_pack_sets: Dict[Path, PackSet] = {}
+_pack_sets_lock = threading.Lock()
+
+def packs_for(git_dir: Path) -> PackSet:
+    """The shared PackSet of a repository."""
+    key = Path(git_dir)
+    with _pack_sets_lock:
+        packs = _pack_sets.get(key)
+        if packs is None:
+            packs = _pack_sets[key] = PackSet(key)
+        return packs
+
+def release_packs(git_dir: Path):
+    """Forgets the shared PackSet of a repository and unmaps its packs."""
+    with _pack_sets_lock:
+        packs = _pack_sets.pop(Path(git_dir), None)
+    if packs is not None:
+        packs.close()
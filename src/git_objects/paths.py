@@ -0,0 +1,91 @@
+from typing import Callable, Dict, List, Optional
+
+from .models import GitObject, TreeEntry, TreeObject
+
+# Trees are written as "40000" by git, but some tools emit the zero-padded form.
+TREE_MODES = (b"40000", b"040000")
+
+# Submodule commits recorded in a tree.
+GITLINK_MODE = b"160000"
+
+def is_tree_mode(mode: bytes) -> bool:
+    return mode in TREE_MODES
+
+def is_blob_mode(mode: bytes) -> bool:
+    """Regular files, executables and symlinks; not trees or submodules."""
+    return not is_tree_mode(mode) and mode != GITLINK_MODE
+
+def split_path(path: str) -> List[str]:
+    """Splits a repository path into components, ignoring empty ones ("a//b/" -> ["a", "b"])."""
+    return [part for part in path.split("/") if part]
+
+def resolve_path(
+    tree_oid: str,
+    path: str,
+    read: Callable[[str], GitObject],
+) -> Optional[TreeEntry]:
+    """Looks up `path` below the tree `tree_oid`, one tree read per component.
+
+    Returns the entry for the last component, a synthetic tree entry for the
+    empty path, or None if any component is missing or not a directory.
+    """
+    entry = TreeEntry(mode=b"40000", name="", oid=tree_oid)
+    for part in split_path(path):
+        if not is_tree_mode(entry.mode):
+            return None
+        tree = read(entry.oid)
+        if not isinstance(tree, TreeObject):
+            return None
+        for child in tree.entries:
+            if child.name == part:
+                entry = child
+                break
+        else:
+            return None
+    return entry
+
+class PathResolver:
+    """resolve_path with memoisation, for walks that look up the same path in many trees.
+
+    Two levels are cached: the entry at `path` per root tree oid (history and
+    blame ask for the same path at every commit, and unchanged commits share
+    root trees), and per-tree name indexes, which are shared by every path that
+    passes through the same subtree.
+    """
+
+    def __init__(self, read: Callable[[str], GitObject], paths, trees):
+        self.read = read
+        # LRUCache instances: (root tree oid, normalised path) -> entry or None,
+        # and tree oid -> {name: entry}
+        self.paths = paths
+        self.trees = trees
+
+    def lookup(self, tree_oid: str, path: str) -> Optional[TreeEntry]:
+        key = (tree_oid, "/".join(split_path(path)))
+        return self.paths.get_or_compute(key, lambda: self._resolve(tree_oid, key[1]))
+
+    def oid_at(self, tree_oid: str, path: str) -> Optional[str]:
+        entry = self.lookup(tree_oid, path)
+        return entry.oid if entry is not None else None
+
+    def _resolve(self, tree_oid: str, path: str) -> Optional[TreeEntry]:
+        entry = TreeEntry(mode=b"40000", name="", oid=tree_oid)
+        for part in split_path(path):
+            if not is_tree_mode(entry.mode):
+                return None
+            entry = self._children(entry.oid).get(part)
+            if entry is None:
+                return None
+        return entry
+
+    def _children(self, tree_oid: str) -> Dict[str, TreeEntry]:
+        def index() -> Dict[str, TreeEntry]:
+            try:
+                tree = self.read(tree_oid)
+            except (ValueError, FileNotFoundError):
+                # Missing trees (shallow or damaged repositories) read as empty.
+                return {}
+            if not isinstance(tree, TreeObject):
+                return {}
+            return {e.name: e for e in tree.entries}
+        return self.trees.get_or_compute(tree_oid, index)
@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+from itertools import chain
+from pathlib import Path
+from typing import List, Optional
+import os
+import zlib
+
+from .pack import packs_for, write_pack
+from .store import LooseStore
+
+@dataclass
+class RepackResult:
+    packed: int                 # loose objects written to the new pack
+    pruned: int                 # loose files removed afterwards
+    pack: Optional[str] = None  # name of the new pack, if one was written
+    pack_size: int = 0
+
+def loose_objects(git_dir: Path) -> List[str]:
+    """Oids of all loose objects, skipping temporary files of in-progress writes."""
+    return list(LooseStore(git_dir).iter())
+
+def repack(git_dir: Path, deltas: bool = True, prune: bool = True) -> RepackResult:
+    """Moves all loose objects into one new pack, then removes the loose copies.
+
+    Only objects seen when the repack started are packed, so objects written
+    meanwhile stay loose until the next run. A loose file is only deleted
+    after the pack and its index are durable on disk and the index is
+    confirmed to hold the object.
+    """
+    sources = []
+
+    def objects():
+        # Read lazily: write_pack only holds one batch of contents at a time.
+        for oid in loose_objects(git_dir):
+            path = git_dir / "objects" / oid[:2] / oid[2:]
+            try:
+                raw = zlib.decompress(path.read_bytes())
+            except (OSError, zlib.error):
+                # Vanished or half-written; leave it to the next run.
+                continue
+            header, _, content = raw.partition(b"\0")
+            sources.append((oid, path))
+            yield oid, header.split(b" ")[0], content
+
+    stream = objects()
+    first = next(stream, None)
+    if first is None:
+        return RepackResult(packed=0, pruned=0)
+    pack_path, _ = write_pack(git_dir / "objects" / "pack", chain([first], stream), deltas=deltas)
+    result = RepackResult(packed=len(sources), pruned=0, pack=pack_path.stem, pack_size=pack_path.stat().st_size)
+    if not prune:
+        return result
+
+    packs = packs_for(git_dir)
+    for oid, path in sources:
+        if not packs.contains(oid):
+            continue
+        try:
+            os.unlink(path)
+            result.pruned += 1
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Loose objects are read-only files; the directory decides, but be safe.
+            os.chmod(path, 0o644)
+            os.unlink(path)
+            result.pruned += 1
+    for fanout in {path.parent for _, path in sources}:
+        try:
+            fanout.rmdir()
+        except OSError:
+            pass
+    return result
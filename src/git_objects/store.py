@@ -0,0 +1,466 @@
+"""Object storage backends.
+
+An ObjectStore maps object ids to (type, content) pairs. The on-disk
+repository is a chain of three stores, consulted in the order git itself
+uses: loose files, then packs, then `git cat-file` for anything else git
+can see (alternates, formats we don't parse). `store_for(git_dir)` returns
+that chain; `read_object` goes through it.
+
+Stores compose: a MemoryStore in front of the disk chain serves a hot
+repository from RAM while writes still land on disk (see `memory_backed`).
+Tests can run against a MemoryStore alone.
+"""
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import hashlib
+import os
+import re
+import stat
+import subprocess
+import tempfile
+import threading
+import zlib
+
+from .models import BlobObject, CommitObject, GitObject, TreeObject, object_header
+from .pack import INFLATED_BYTES, OBJECT_READS, fsync_dir, packs_for, release_packs
+from .writer import LooseObjectWriter
+from src.utils.profiling import spanned
+
+_LOOSE_NAME = re.compile(r"^[0-9a-f]{38}$")
+
+_LOOSE_READS = OBJECT_READS.labels(source="loose")
+_PACK_READS = OBJECT_READS.labels(source="pack")
+_SUBPROCESS_READS = OBJECT_READS.labels(source="subprocess")
+_MEMORY_READS = OBJECT_READS.labels(source="memory")
+_LOOSE_INFLATED = INFLATED_BYTES.labels(source="loose")
+
+class ObjectStoreError(Exception):
+    pass
+
+def parse_object(oid: str, type_str: bytes, content: bytes) -> GitObject:
+    """Builds the object for raw content of the given type name."""
+    obj: GitObject
+    if type_str == b"blob":
+        obj = BlobObject.deserialize(content)
+    elif type_str == b"tree":
+        obj = TreeObject.deserialize(content)
+    elif type_str == b"commit":
+        obj = CommitObject.deserialize(content)
+    else:
+        raise ValueError(f"Unknown object type: {type_str}")
+
+    obj.oid = oid
+    return obj
+
+def hash_object(obj_type: bytes, data: bytes) -> str:
+    h = hashlib.sha1(object_header(obj_type, len(data)))
+    h.update(data)
+    return h.hexdigest()
+
+class ObjectStore(ABC):
+    """Where a repository's objects live.
+
+    Subclasses implement `read_raw` and `iter`; writable stores also
+    implement `write_many` and `writer`. Missing objects are None from
+    `read_raw`/`peek` and FileNotFoundError from `read`.
+    """
+
+    writable = False
+    # Whether ChainStore checks this store before writing to another one.
+    # Off for stores where a lookup is expensive.
+    dedupe_writes = True
+
+    @abstractmethod
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        """(type name, content), or None if the store doesn't have the object."""
+
+    @abstractmethod
+    def iter(self) -> Iterator[str]:
+        """Every oid in the store, each once."""
+
+    @spanned("read_object")
+    def read(self, oid: str) -> GitObject:
+        if len(oid) != 40:
+            raise ValueError(f"Invalid Object ID: {oid}")
+        raw = self.read_raw(oid)
+        if raw is None:
+            raise FileNotFoundError(f"Object {oid} not found in {self}")
+        return parse_object(oid, *raw)
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        """(type name, size) without necessarily reading the content."""
+        raw = self.read_raw(oid)
+        return None if raw is None else (raw[0], len(raw[1]))
+
+    def contains(self, oid: str) -> bool:
+        return self.peek(oid) is not None
+
+    def has_written(self, oid: str) -> bool:
+        """Whether writing `oid` would be skipped as already stored.
+
+        Cheaper than `contains` where stores with `dedupe_writes` off are
+        involved; they are not asked.
+        """
+        return self.contains(oid)
+
+    def write(self, obj_type: bytes, data: bytes, fsync: bool = False) -> str:
+        oid = hash_object(obj_type, data)
+        self.write_many([(oid, obj_type, data)], fsync=fsync)
+        return oid
+
+    def write_many(self, objects: Iterable[Tuple[str, bytes, bytes]], fsync: bool = False) -> int:
+        """Stores (oid, type, content) triples, trusting the oids; returns how many were new."""
+        raise ObjectStoreError(f"{self} is read-only")
+
+    def writer(self, obj_type: bytes, size: int):
+        """A streaming writer (write/finish/abort, usable with `with`) for one object."""
+        raise ObjectStoreError(f"{self} is read-only")
+
+class LooseStore(ObjectStore):
+    """Zlib-compressed files under objects/xx/yyyy..."""
+
+    writable = True
+
+    def __init__(self, git_dir: Path):
+        self.git_dir = git_dir
+        self.objects_dir = git_dir / "objects"
+
+    def __repr__(self) -> str:
+        return f"LooseStore({self.objects_dir})"
+
+    def _path(self, oid: str) -> Path:
+        return self.objects_dir / oid[:2] / oid[2:]
+
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        try:
+            with open(self._path(oid), "rb") as f:
+                compressed = f.read()
+        except FileNotFoundError:
+            return None
+        raw = zlib.decompress(compressed)
+        _LOOSE_READS.inc()
+        _LOOSE_INFLATED.inc(len(raw))
+        # format: "type size\0content"
+        null_idx = raw.find(b"\x00")
+        if null_idx == -1:
+            raise ValueError("Invalid object format (no null byte)")
+        type_str, _ = raw[:null_idx].split(b" ")
+        return type_str, raw[null_idx + 1:]
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        try:
+            with open(self._path(oid), "rb") as f:
+                head = zlib.decompressobj().decompress(f.read(256), 64)
+        except FileNotFoundError:
+            return None
+        type_str, size = head[:head.index(b"\x00")].split(b" ")
+        return type_str, int(size)
+
+    def contains(self, oid: str) -> bool:
+        return self._path(oid).exists()
+
+    def iter(self) -> Iterator[str]:
+        """Oids of all loose objects, skipping temporary files of in-progress writes."""
+        if not self.objects_dir.exists():
+            return
+        for fanout in self.objects_dir.iterdir():
+            if len(fanout.name) != 2 or not fanout.is_dir():
+                continue
+            for entry in fanout.iterdir():
+                if _LOOSE_NAME.match(entry.name):
+                    yield fanout.name + entry.name
+
+    def write_many(self, objects: Iterable[Tuple[str, bytes, bytes]], fsync: bool = False) -> int:
+        """Writes each object not already stored as a loose file.
+
+        With `fsync`, the new files and their directories are flushed to disk
+        together at the end, so a caller can make a whole group of objects
+        durable before publishing a ref that points at them.
+        """
+        made_dirs = set()
+        written = []
+        for oid, obj_type, data in objects:
+            fanout = self.objects_dir / oid[:2]
+            path = fanout / oid[2:]
+            if oid[:2] not in made_dirs:
+                fanout.mkdir(parents=True, exist_ok=True)
+                made_dirs.add(oid[:2])
+            if path.exists():
+                continue
+            # Write under a temporary name so readers never see a partial object.
+            # A unique name, so concurrent writers of the same object don't share one.
+            fd, tmp = tempfile.mkstemp(prefix="tmp_obj_", dir=fanout)
+            try:
+                compressor = zlib.compressobj(1)
+                with os.fdopen(fd, "wb") as f:
+                    f.write(compressor.compress(object_header(obj_type, len(data))))
+                    f.write(compressor.compress(data))
+                    f.write(compressor.flush())
+                os.chmod(tmp, stat.S_IREAD)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+            written.append(path)
+        if fsync and written:
+            for path in written:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            for directory in {path.parent for path in written}:
+                fsync_dir(directory)
+        return len(written)
+
+    def writer(self, obj_type: bytes, size: int) -> LooseObjectWriter:
+        return LooseObjectWriter(self.git_dir, obj_type, size)
+
+class PackStore(ObjectStore):
+    """The repository's .pack files (read-only; `repack` creates them)."""
+
+    def __init__(self, git_dir: Path):
+        self.packs = packs_for(git_dir)
+
+    def __repr__(self) -> str:
+        return f"PackStore({self.packs.pack_dir})"
+
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        raw = self.packs.read(oid)
+        if raw is not None:
+            _PACK_READS.inc()
+        return raw
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        return self.packs.peek(oid)
+
+    def contains(self, oid: str) -> bool:
+        return self.packs.contains(oid)
+
+    def iter(self) -> Iterator[str]:
+        seen = set()
+        for oid in self.packs.oids():
+            if oid not in seen:
+                seen.add(oid)
+                yield oid
+
+class SubprocessStore(ObjectStore):
+    """Whatever `git cat-file` can find: alternates, and anything else git knows."""
+
+    # A process per lookup; at worst a write duplicates an alternate's object.
+    dedupe_writes = False
+
+    def __init__(self, git_dir: Path):
+        self.git_dir = git_dir
+
+    def __repr__(self) -> str:
+        return f"SubprocessStore({self.git_dir})"
+
+    def _git(self, *args: str) -> Optional[bytes]:
+        # Use --git-dir to be explicit and avoid cwd issues
+        try:
+            proc = subprocess.run(["git", "--git-dir", str(self.git_dir), *args], capture_output=True, check=True)
+        except (subprocess.CalledProcessError, OSError):
+            return None
+        return proc.stdout
+
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        obj_type = self._git("cat-file", "-t", oid)
+        if obj_type is None:
+            return None
+        obj_type = obj_type.strip()
+        # 'git cat-file <type>' prints the raw content ('-p' would pretty-print trees).
+        content = self._git("cat-file", obj_type.decode(), oid)
+        if content is None:
+            return None
+        _SUBPROCESS_READS.inc()
+        return obj_type, content
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        obj_type = self._git("cat-file", "-t", oid)
+        size = self._git("cat-file", "-s", oid)
+        if obj_type is None or size is None:
+            return None
+        return obj_type.strip(), int(size)
+
+    def contains(self, oid: str) -> bool:
+        return self._git("cat-file", "-e", oid) is not None
+
+    def iter(self) -> Iterator[str]:
+        out = self._git("cat-file", "--batch-all-objects", "--batch-check=%(objectname)")
+        for line in (out or b"").split():
+            yield line.decode()
+
+class MemoryStore(ObjectStore):
+    """Objects in a dict. Nothing touches the disk."""
+
+    writable = True
+
+    def __init__(self, objects: Optional[Dict[str, Tuple[bytes, bytes]]] = None):
+        self._objects: Dict[str, Tuple[bytes, bytes]] = dict(objects or {})
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"MemoryStore({len(self._objects)} objects)"
+
+    def __len__(self) -> int:
+        return len(self._objects)
+
+    @classmethod
+    def copy_of(cls, store: ObjectStore) -> "MemoryStore":
+        """Loads every object of `store` into memory."""
+        objects = {}
+        for oid in store.iter():
+            raw = store.read_raw(oid)
+            if raw is not None:
+                objects[oid] = raw
+        return cls(objects)
+
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        raw = self._objects.get(oid)
+        if raw is not None:
+            _MEMORY_READS.inc()
+        return raw
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        raw = self._objects.get(oid)
+        return None if raw is None else (raw[0], len(raw[1]))
+
+    def contains(self, oid: str) -> bool:
+        return oid in self._objects
+
+    def iter(self) -> Iterator[str]:
+        return iter(list(self._objects))
+
+    def write_many(self, objects: Iterable[Tuple[str, bytes, bytes]], fsync: bool = False) -> int:
+        written = 0
+        with self._lock:
+            for oid, obj_type, data in objects:
+                if oid not in self._objects:
+                    self._objects[oid] = (obj_type, bytes(data))
+                    written += 1
+        return written
+
+    def writer(self, obj_type: bytes, size: int) -> "_MemoryWriter":
+        return _MemoryWriter(self, obj_type, size)
+
+class _MemoryWriter:
+    """MemoryStore's counterpart of LooseObjectWriter."""
+
+    def __init__(self, store: MemoryStore, obj_type: bytes, size: int):
+        self.store = store
+        self.obj_type = obj_type
+        self.size = size
+        self._chunks: List[bytes] = []
+        self.received = 0
+
+    def __enter__(self) -> "_MemoryWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.abort()
+
+    def write(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.size:
+            raise ValueError(f"Object larger than its declared size of {self.size} bytes")
+        self._chunks.append(bytes(chunk))
+
+    def finish(self, fsync: bool = False) -> str:
+        if self.received != self.size:
+            raise ValueError(f"Object is {self.received} bytes, declared {self.size}")
+        oid = self.store.write(self.obj_type, b"".join(self._chunks))
+        self._chunks = []
+        return oid
+
+    def abort(self):
+        self._chunks = []
+
+class ChainStore(ObjectStore):
+    """Stores consulted in order; the first one holding an object serves it.
+
+    Writes go to `write_to`, by default the first writable store, and skip
+    objects any store in the chain already has.
+    """
+
+    def __init__(self, stores: Sequence[ObjectStore], write_to: Optional[ObjectStore] = None):
+        self.stores = list(stores)
+        self.write_to = write_to if write_to is not None else next((s for s in self.stores if s.writable), None)
+        self.writable = self.write_to is not None
+
+    def __repr__(self) -> str:
+        return f"ChainStore({', '.join(map(repr, self.stores))})"
+
+    def read_raw(self, oid: str) -> Optional[Tuple[bytes, bytes]]:
+        for store in self.stores:
+            raw = store.read_raw(oid)
+            if raw is not None:
+                return raw
+        return None
+
+    def peek(self, oid: str) -> Optional[Tuple[bytes, int]]:
+        for store in self.stores:
+            result = store.peek(oid)
+            if result is not None:
+                return result
+        return None
+
+    def contains(self, oid: str) -> bool:
+        return any(store.contains(oid) for store in self.stores)
+
+    def has_written(self, oid: str) -> bool:
+        return any(store.has_written(oid) for store in self.stores if store.dedupe_writes or store is self.write_to)
+
+    def iter(self) -> Iterator[str]:
+        seen = set()
+        for store in self.stores:
+            for oid in store.iter():
+                if oid not in seen:
+                    seen.add(oid)
+                    yield oid
+
+    def write_many(self, objects: Iterable[Tuple[str, bytes, bytes]], fsync: bool = False) -> int:
+        if self.write_to is None:
+            return super().write_many(objects, fsync)
+        # The target store skips its own objects; skip the rest of the chain's here.
+        others = [s for s in self.stores if s is not self.write_to and s.dedupe_writes]
+        new = (o for o in objects if not any(s.has_written(o[0]) for s in others))
+        return self.write_to.write_many(new, fsync=fsync)
+
+    def writer(self, obj_type: bytes, size: int):
+        if self.write_to is None:
+            return super().writer(obj_type, size)
+        return self.write_to.writer(obj_type, size)
+
+def disk_store(git_dir: Path) -> ChainStore:
+    """Loose objects, then packs, then `git cat-file`: the layout of a git dir."""
+    return ChainStore([LooseStore(git_dir), PackStore(git_dir), SubprocessStore(git_dir)])
+
+def memory_backed(store: ObjectStore) -> ChainStore:
+    """`store` with a RAM copy of its current objects in front; writes still go to `store`."""
+    return ChainStore([MemoryStore.copy_of(store), store], write_to=store)
+
+_stores: Dict[Path, ChainStore] = {}
+_stores_lock = threading.Lock()
+
+def store_for(git_dir: Path) -> ChainStore:
+    """The shared disk store of a repository."""
+    key = Path(git_dir)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = disk_store(key)
+        return store
+
+def release_store(git_dir: Path):
+    """Forgets the shared disk store of a repository and unmaps its packs.
+
+    Holders of the old store keep working; its packs are mapped again on use.
+    """
+    with _stores_lock:
+        _stores.pop(Path(git_dir), None)
+    release_packs(git_dir)
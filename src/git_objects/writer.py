@@ -0,0 +1,220 @@
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Optional, Tuple
+import hashlib
+import os
+import stat
+import tempfile
+import zlib
+
+from .models import GitObject, TreeEntry, TreeObject, object_header
+from .pack import fsync_dir, packs_for
+from .paths import is_tree_mode, split_path
+
+if TYPE_CHECKING:
+    from .store import ObjectStore
+
+# Read size for streaming files into the object store.
+STREAM_CHUNK_SIZE = 64 * 1024
+# Streams of unknown length are buffered in memory up to this size, then on disk.
+SPOOL_MEMORY_LIMIT = 1024 * 1024
+
+# (mode, blob oid) to write at a path, or None to delete it
+TreeChange = Optional[Tuple[bytes, str]]
+
+class ObjectBatch:
+    """Objects created in memory and written to the object store together.
+
+    Objects added to the batch can be read back (through `get`) before they
+    are written, so trees and commits can be built on top of each other.
+    """
+
+    def __init__(self, store: "ObjectStore", read: Callable[[str], GitObject]):
+        self.store = store
+        self.read = read
+        self.objects: Dict[str, GitObject] = {}
+        # oid -> (type, serialized content)
+        self._stores: Dict[str, Tuple[bytes, bytes]] = {}
+
+    def add(self, obj: GitObject) -> str:
+        data = obj.serialize()
+        h = hashlib.sha1(object_header(obj.type, len(data)))
+        h.update(data)
+        oid = h.hexdigest()
+        obj.oid = oid
+        if oid not in self.objects:
+            self.objects[oid] = obj
+            self._stores[oid] = (obj.type, data)
+        return oid
+
+    def get(self, oid: str) -> GitObject:
+        obj = self.objects.get(oid)
+        return obj if obj is not None else self.read(oid)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def contains(self, oid: str) -> bool:
+        """Whether the object is in this batch or already written to the repository.
+
+        Stores that are expensive to ask (see ObjectStore.dedupe_writes) are
+        skipped, so an object only they have counts as new.
+        """
+        return oid in self.objects or self.store.has_written(oid)
+
+    def absorb(self, other: "ObjectBatch"):
+        """Takes over the unwritten objects of `other`."""
+        for oid, store in other._stores.items():
+            if oid not in self.objects:
+                self.objects[oid] = other.objects[oid]
+                self._stores[oid] = store
+
+    def write(self, fsync: bool = False) -> int:
+        """Writes every object not already in the store; returns how many were new.
+
+        With `fsync`, the whole batch is durable when this returns (see
+        ObjectStore.write_many).
+        """
+        written = self.store.write_many(
+            ((oid, obj_type, data) for oid, (obj_type, data) in self._stores.items()), fsync=fsync,
+        )
+        self._stores.clear()
+        return written
+
+class LooseObjectWriter:
+    """Writes one loose object of known type and size from a stream of chunks.
+
+    SHA-1 and zlib are fed chunk by chunk and the compressed output goes
+    straight to a temporary file in the object directory, so only one chunk
+    is in memory at a time. `finish` renames the file into place under its
+    oid; leaving the `with` block without finishing discards it.
+    """
+
+    def __init__(self, git_dir: Path, obj_type: bytes, size: int):
+        self.git_dir = git_dir
+        self.size = size
+        self.received = 0
+        objects_dir = git_dir / "objects"
+        objects_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix="tmp_obj_", dir=objects_dir)
+        self._tmp = Path(tmp)
+        self._file: Optional[BinaryIO] = os.fdopen(fd, "wb")
+        header = object_header(obj_type, size)
+        self._sha = hashlib.sha1(header)
+        self._zlib = zlib.compressobj()
+        self._file.write(self._zlib.compress(header))
+
+    def __enter__(self) -> "LooseObjectWriter":
+        return self
+
+    def __exit__(self, *exc):
+        self.abort()
+
+    def write(self, chunk: bytes):
+        self.received += len(chunk)
+        if self.received > self.size:
+            raise ValueError(f"Object larger than its declared size of {self.size} bytes")
+        self._sha.update(chunk)
+        self._file.write(self._zlib.compress(chunk))
+
+    def finish(self, fsync: bool = False) -> str:
+        if self.received != self.size:
+            raise ValueError(f"Object is {self.received} bytes, declared {self.size}")
+        self._file.write(self._zlib.flush())
+        if fsync:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+        oid = self._sha.hexdigest()
+        fanout = self.git_dir / "objects" / oid[:2]
+        path = fanout / oid[2:]
+        if path.exists() or packs_for(self.git_dir).contains(oid):
+            self._tmp.unlink()
+            return oid
+        fanout.mkdir(exist_ok=True)
+        os.chmod(self._tmp, stat.S_IREAD)
+        os.replace(self._tmp, path)
+        if fsync:
+            fsync_dir(fanout)
+        return oid
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                self._tmp.unlink()
+            except OSError:
+                pass
+
+def write_object_stream(
+    store: "ObjectStore",
+    obj_type: bytes,
+    chunks: Iterable[bytes],
+    size: Optional[int] = None,
+) -> Tuple[str, int]:
+    """Stores an object from an iterable of chunks; returns (oid, size).
+
+    The header needs the size up front. If it isn't given, the chunks are
+    spooled to a temporary file first (in memory while small) and streamed
+    from there.
+    """
+    if size is None:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_LIMIT) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            size = spool.tell()
+            spool.seek(0)
+            return write_object_stream(store, obj_type, iter(lambda: spool.read(STREAM_CHUNK_SIZE), b""), size)
+    with store.writer(obj_type, size) as writer:
+        for chunk in chunks:
+            writer.write(chunk)
+        return writer.finish(), size
+
+def hash_file(store: "ObjectStore", path: Path) -> str:
+    """`git hash-object -w <path>`: stores a file as a blob without reading it into memory."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        oid, _ = write_object_stream(store, b"blob", iter(lambda: f.read(STREAM_CHUNK_SIZE), b""), size)
+    return oid
+
+def apply_tree_changes(batch: ObjectBatch, tree_oid: Optional[str], changes: Dict[str, TreeChange]) -> Optional[str]:
+    """Builds the tree `tree_oid` with `changes` applied, adding new trees to `batch`.
+
+    Only the subtrees on changed paths are rebuilt; everything else keeps its
+    oid. Directories left empty are dropped, as in git, and None is returned
+    when the whole tree ends up empty.
+    """
+    entries: Dict[str, TreeEntry] = {}
+    if tree_oid is not None:
+        tree = batch.get(tree_oid)
+        if isinstance(tree, TreeObject):
+            entries = {e.name: e for e in tree.entries}
+
+    nested: Dict[str, Dict[str, TreeChange]] = {}
+    for path, change in changes.items():
+        parts = split_path(path)
+        if not parts:
+            raise ValueError(f"Invalid path: {path!r}")
+        if len(parts) == 1:
+            if change is None:
+                entries.pop(parts[0], None)
+            else:
+                mode, oid = change
+                entries[parts[0]] = TreeEntry(mode=mode, name=parts[0], oid=oid)
+        else:
+            nested.setdefault(parts[0], {})["/".join(parts[1:])] = change
+
+    for name, sub_changes in nested.items():
+        existing = entries.get(name)
+        base = existing.oid if existing is not None and is_tree_mode(existing.mode) else None
+        sub_oid = apply_tree_changes(batch, base, sub_changes)
+        if sub_oid is None:
+            entries.pop(name, None)
+        else:
+            entries[name] = TreeEntry(mode=b"40000", name=name, oid=sub_oid)
+
+    if not entries:
+        return None
+    return batch.add(TreeObject(entries=list(entries.values())))
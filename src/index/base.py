@@ -0,0 +1,131 @@
+from abc import ABC, abstractmethod
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+import threading
+
+from src.dag.models import CommitNode
+from src.utils.profiling import span
+
+logger = logging.getLogger(__name__)
+
+class CommitIndexer(ABC):
+    """Secondary index kept in step with a GitService's DAG.
+
+    The service feeds every commit it loads: `add_commits` with all commits
+    of a new snapshot, or with only the new ones when a snapshot is
+    extended. `add_commits` must ignore commits it already has, since a
+    failed refresh may be retried with the same commits. `reset` empties
+    the index; it is only called on indexers no snapshot is serving.
+
+    Indexers that set `section` are stored in the on-disk DAG snapshot under
+    that 4-byte tag and restored with `load`; the rest are rebuilt from the
+    snapshot's commits after a restart, when first used (see IndexSet).
+    """
+
+    section: Optional[bytes] = None
+
+    @abstractmethod
+    def reset(self):
+        pass
+
+    @abstractmethod
+    def add_commits(self, nodes: List[CommitNode]):
+        """Adds commits, given newest first (topological order)."""
+        pass
+
+    def dump(self) -> bytes:
+        raise NotImplementedError
+
+    def load(self, data: bytes):
+        raise NotImplementedError
+
+class IndexSet(Mapping):
+    """The secondary indexes of one DagSnapshot, by name.
+
+    A full build or a snapshot load creates a new set and the set is
+    published together with its snapshot, so readers always query the
+    indexes of the snapshot they are serving, and a rebuild never empties
+    indexes that are still in use. Extending a snapshot adds the new commits
+    to the same indexers in place: until the extended snapshot goes live,
+    readers may find commits in them that their DAG does not have yet.
+
+    A new set is filled lazily (`fill`): each indexer is loaded from its
+    stored section, or built from the snapshot's commits, by whoever first
+    looks it up, so a snapshot is ready to serve before its indexes are.
+    """
+
+    def __init__(self, indexers: Dict[str, CommitIndexer]):
+        self._indexers = dict(indexers)
+        self._locks = {name: threading.Lock() for name in indexers}
+        # name -> (stored section or None, commit batches to add). The first
+        # batch is all the commits, needed only if there is no usable section.
+        self._pending: Dict[str, Tuple[Optional[bytes], List[Sequence[CommitNode]]]] = {}
+
+    def fill(self, commits: Sequence[CommitNode], sections: Optional[Dict[bytes, bytes]] = None):
+        """Fills every indexer on first use from `sections`, or else from `commits` (all of them)."""
+        sections = sections or {}
+        for name, indexer in self._indexers.items():
+            with self._locks[name]:
+                self._pending[name] = (sections.get(indexer.section) if indexer.section else None, [commits])
+
+    def add_commits(self, nodes: Sequence[CommitNode]):
+        """Adds new commits to every indexer, now or when it is filled."""
+        for name, indexer in self._indexers.items():
+            with self._locks[name]:
+                pending = self._pending.get(name)
+                if pending is not None:
+                    pending[1].append(nodes)
+                else:
+                    indexer.add_commits(nodes)
+
+    def _fill(self, name: str):
+        with self._locks[name]:
+            pending = self._pending.get(name)
+            if pending is None:
+                return
+            indexer = self._indexers[name]
+            section, batches = pending
+            with span("index"):
+                if section is not None:
+                    try:
+                        indexer.load(section)
+                        batches = batches[1:]
+                    except Exception as e:
+                        logger.warning(f"Rebuilding {type(indexer).__name__}: stored index unreadable ({e})")
+                        indexer.reset()
+                for nodes in batches:
+                    indexer.add_commits(nodes)
+            del self._pending[name]
+
+    def is_filled(self, name: str) -> bool:
+        return name not in self._pending
+
+    def sections(self) -> Dict[bytes, bytes]:
+        """Dumps of the indexers that are stored in snapshot files, by section tag.
+
+        A stored section nothing has been added to is passed on without loading it.
+        """
+        sections = {}
+        for name, indexer in self._indexers.items():
+            if not indexer.section:
+                continue
+            with self._locks[name]:
+                pending = self._pending.get(name)
+                if pending is not None and pending[0] is not None and len(pending[1]) == 1:
+                    sections[indexer.section] = pending[0]
+                    continue
+            sections[indexer.section] = self[name].dump()
+        return sections
+
+    def __getitem__(self, name: str) -> CommitIndexer:
+        indexer = self._indexers[name]
+        if name in self._pending:
+            self._fill(name)
+        return indexer
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._indexers)
+
+    def __len__(self) -> int:
+        return len(self._indexers)
@@ -0,0 +1,144 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Sequence
+import heapq
+import threading
+
+from src.dag.models import CommitNode
+from src.index.base import CommitIndexer
+from src.index.packed import DocIds, KeyTable, as_array, merged_keys, pack_arrays, unpack_arrays
+
+# Batches larger than this are merged by re-sorting instead of one insort each.
+RESORT_THRESHOLD = 64
+
+class IdentityIndex(CommitIndexer):
+    """Commits by author and by commit time.
+
+    Author emails and names (lowercased) map to the commits they wrote.
+    Committer timestamps are kept as a sorted array alongside the matching
+    commits, so a time range is two bisections; this is the date `git log
+    --since/--until` filters on.
+
+    A loaded index is served from its stored section (see
+    src/index/packed.py); commits added afterwards are kept in memory next
+    to it, and queries look in both.
+    """
+
+    section = b"IDNT"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._load(DocIds(), array("q"), KeyTable(), KeyTable(), array("q"), array("I"))
+
+    def _load(self, docs: DocIds, doc_times, emails: KeyTable, names: KeyTable, times, time_docs):
+        self.docs = docs
+        # Stored: committer time per document, and (time, document) sorted by time.
+        self._doc_times: Sequence[int] = doc_times
+        self._emails = emails
+        self._names = names
+        self._times: Sequence[int] = times
+        self._time_docs: Sequence[int] = time_docs
+        # Added since: the same for the documents after the stored ones.
+        self._new_doc_times = array("q")
+        self._new_emails: Dict[str, List[int]] = {}
+        self._new_names: Dict[str, List[int]] = {}
+        self._new_times = array("q")
+        self._new_time_docs = array("I")
+
+    def add_commits(self, nodes: List[CommitNode]):
+        with self._lock:
+            added = []
+            for node in nodes:
+                doc = self.docs.add(node.oid)
+                if doc is None:
+                    continue
+                timestamp = node.commit.committer_identity.timestamp
+                self._new_doc_times.append(timestamp)
+                author = node.commit.author_identity
+                if author.email:
+                    self._new_emails.setdefault(author.email.lower(), []).append(doc)
+                if author.name:
+                    self._new_names.setdefault(author.name.lower(), []).append(doc)
+                added.append((timestamp, doc))
+
+            if len(added) > RESORT_THRESHOLD:
+                merged = sorted(list(zip(self._new_times, self._new_time_docs)) + added)
+                self._new_times = array("q", (t for t, _ in merged))
+                self._new_time_docs = array("I", (doc for _, doc in merged))
+            else:
+                for timestamp, doc in added:
+                    i = bisect_right(self._new_times, timestamp)
+                    self._new_times.insert(i, timestamp)
+                    self._new_time_docs.insert(i, doc)
+
+    def _time(self, doc: int) -> int:
+        stored = len(self._doc_times)
+        return self._doc_times[doc] if doc < stored else self._new_doc_times[doc - stored]
+
+    def _author_docs(self, key: str) -> List[int]:
+        docs = list(self._emails.get(key)) + self._new_emails.get(key, [])
+        return docs or list(self._names.get(key)) + self._new_names.get(key, [])
+
+    def by_author(self, author: str) -> List[str]:
+        """Commits whose author email, or failing that name, equals `author` (case-insensitive)."""
+        key = author.strip().lower()
+        with self._lock:
+            return [self.docs.oid(doc) for doc in self._author_docs(key)]
+
+    def in_range(self, since: Optional[int] = None, until: Optional[int] = None) -> List[str]:
+        """Commits with since <= committer time <= until; either bound may be open."""
+        with self._lock:
+            oids = []
+            for times, docs in ((self._times, self._time_docs), (self._new_times, self._new_time_docs)):
+                lo = bisect_left(times, since) if since is not None else 0
+                hi = bisect_right(times, until) if until is not None else len(times)
+                oids.extend(self.docs.oid(doc) for doc in docs[lo:hi])
+            return oids
+
+    def select(
+        self,
+        author: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> List[str]:
+        """Commits matching all given filters, in no particular order."""
+        if author is None:
+            return self.in_range(since, until)
+        if since is None and until is None:
+            return self.by_author(author)
+        # One author's commits are usually far fewer than a time window's.
+        lo = since if since is not None else float("-inf")
+        hi = until if until is not None else float("inf")
+        with self._lock:
+            docs = self._author_docs(author.strip().lower())
+            return [self.docs.oid(doc) for doc in docs if lo <= self._time(doc) <= hi]
+
+    def dump(self) -> bytes:
+        with self._lock:
+            doc_times = array("q", self._doc_times) + self._new_doc_times
+            tables = []
+            for stored, new in ((self._emails, self._new_emails), (self._names, self._new_names)):
+                tables.append({key: list(stored.get(key)) + new.get(key, []) for key in merged_keys(stored, new)})
+            merged = list(heapq.merge(zip(self._times, self._time_docs), zip(self._new_times, self._new_time_docs)))
+            times = array("q", (t for t, _ in merged))
+            time_docs = array("I", (doc for _, doc in merged))
+            return pack_arrays(self.section, self.docs.pack() + [doc_times] + KeyTable.pack(tables[0])
+                               + KeyTable.pack(tables[1]) + [times, time_docs])
+
+    def load(self, data: bytes):
+        arrays = unpack_arrays(self.section, data)
+        if len(arrays) != 13:
+            raise ValueError("Malformed IDNT section")
+        docs = DocIds.unpack(*arrays[0:2])
+        doc_times = as_array(arrays[2], "q")
+        emails = KeyTable.unpack(*arrays[3:7])
+        names = KeyTable.unpack(*arrays[7:11])
+        times, time_docs = as_array(arrays[11], "q"), as_array(arrays[12], "I")
+        if not len(doc_times) == len(times) == len(time_docs) == len(docs):
+            raise ValueError("Malformed IDNT section")
+        with self._lock:
+            self._load(docs, doc_times, emails, names, times, time_docs)
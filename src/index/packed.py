@@ -0,0 +1,225 @@
+"""Index structures that are served straight from a snapshot section.
+
+attach_snapshot hands indexers their sections as views into the mapped
+snapshot file. An indexer that keeps those views instead of decoding them
+into dicts and lists costs no heap, and every process attached to the same
+file shares one copy of the pages, like the CompactDag itself. Commits
+added after loading go into small in-memory overlays until the snapshot is
+rewritten.
+
+A packed section is a list of byte arrays:
+
+    magic (4 bytes) | u32 count | u64 length (per array)
+    arrays, each starting at a multiple of 8 from the start of the section
+
+Integers inside the arrays are little-endian; like attaching, loading them
+is refused on big-endian hosts (the indexer is rebuilt instead).
+"""
+from array import array
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence
+import struct
+import sys
+
+_HEADER = struct.Struct("<4sI")
+_LENGTH = struct.Struct("<Q")
+
+_EMPTY = memoryview(array("I"))
+
+def pack_arrays(magic: bytes, arrays: Sequence) -> bytes:
+    """Packs byte arrays (or typed arrays) into one section."""
+    if sys.byteorder != "little":
+        raise ValueError("Packed indexes can only be written on little-endian hosts")
+    arrays = [memoryview(a).cast("B") for a in arrays]
+    header = _HEADER.pack(magic, len(arrays)) + b"".join(_LENGTH.pack(len(a)) for a in arrays)
+    parts, size = [header], len(header)
+    for a in arrays:
+        parts.append(bytes(-size % 8))
+        size += -size % 8
+        parts.append(a)
+        size += len(a)
+    return b"".join(parts)
+
+def unpack_arrays(magic: bytes, data) -> List[memoryview]:
+    """The byte arrays of a section written by pack_arrays, as views into `data`.
+
+    Raises ValueError if the section is not one of `magic`'s.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Packed indexes can only be read on little-endian hosts")
+    view = memoryview(data).cast("B")
+    try:
+        found, count = _HEADER.unpack_from(view, 0)
+        if found != magic:
+            raise ValueError(f"Not a {magic!r} section")
+        pos = _HEADER.size
+        lengths = []
+        for _ in range(count):
+            lengths.append(_LENGTH.unpack_from(view, pos)[0])
+            pos += _LENGTH.size
+    except struct.error as e:
+        raise ValueError(f"Truncated {magic!r} section: {e}")
+    arrays = []
+    for length in lengths:
+        pos += -pos % 8
+        if pos + length > len(view):
+            raise ValueError(f"Truncated {magic!r} section")
+        arrays.append(view[pos:pos + length])
+        pos += length
+    return arrays
+
+def as_array(view: memoryview, typecode: str) -> memoryview:
+    """`view` read as an array of `typecode` items, checking that it fits."""
+    if len(view) % array(typecode).itemsize:
+        raise ValueError("Misaligned array in packed index")
+    return view.cast(typecode)
+
+class DocIds:
+    """Commit oids numbered in the order they were added, as document ids.
+
+    The oids loaded from a section stay in it: a 20-byte oid table plus the
+    ids sorted by oid, for binary search. Oids added later are kept in a
+    list and a dict.
+    """
+
+    def __init__(self, oids=b"", by_oid=_EMPTY):
+        self._oids = memoryview(oids).cast("B")
+        self._base = len(self._oids) // 20
+        self._by_oid = by_oid
+        if len(self._oids) % 20 or len(by_oid) != self._base:
+            raise ValueError("Malformed oid table in packed index")
+        self._new: List[str] = []
+        self._new_ids: Dict[str, int] = {}
+
+    @classmethod
+    def unpack(cls, oids: memoryview, by_oid: memoryview) -> "DocIds":
+        return cls(oids, as_array(by_oid, "I"))
+
+    def pack(self) -> List[bytes]:
+        """The oid table and the ids sorted by oid; see `unpack`."""
+        table = bytes(self._oids) + b"".join(bytes.fromhex(oid) for oid in self._new)
+        by_oid = sorted(range(len(self)), key=lambda i: table[20 * i:20 * i + 20])
+        return [table, array("I", by_oid)]
+
+    def __len__(self) -> int:
+        return self._base + len(self._new)
+
+    def oid(self, doc: int) -> str:
+        if doc < self._base:
+            return self._oids[20 * doc:20 * doc + 20].hex()
+        return self._new[doc - self._base]
+
+    def get(self, oid: str) -> Optional[int]:
+        """The id of `oid`, None if it was never added."""
+        doc = self._new_ids.get(oid)
+        if doc is not None or not self._base:
+            return doc
+        try:
+            key = bytes.fromhex(oid)
+        except ValueError:
+            return None
+        lo, hi = 0, self._base
+        while lo < hi:
+            mid = (lo + hi) // 2
+            i = self._by_oid[mid]
+            candidate = self._oids[20 * i:20 * i + 20].tobytes()
+            if candidate < key:
+                lo = mid + 1
+            elif candidate > key:
+                hi = mid
+            else:
+                return i
+        return None
+
+    def __contains__(self, oid: str) -> bool:
+        return self.get(oid) is not None
+
+    def add(self, oid: str) -> Optional[int]:
+        """Numbers a new oid; None if it already has an id."""
+        if oid in self:
+            return None
+        doc = len(self)
+        self._new.append(oid)
+        self._new_ids[oid] = doc
+        return doc
+
+class KeyTable:
+    """Sorted string keys, each with an ascending list of ids, in four packed arrays.
+
+    Keys are compared as UTF-8 bytes, which sorts them like Python strings.
+    The id lists are returned as views, not copied.
+    """
+
+    def __init__(self, key_offsets=_EMPTY, keys=b"", id_offsets=_EMPTY, ids=_EMPTY):
+        self._key_offsets = key_offsets
+        self._keys = memoryview(keys).cast("B")
+        self._id_offsets = id_offsets
+        self._ids = ids
+        self._count = max(len(key_offsets) - 1, 0)
+        if len(id_offsets) != len(key_offsets) or (self._count and (
+                key_offsets[-1] != len(self._keys) or id_offsets[-1] != len(ids))):
+            raise ValueError("Malformed key table in packed index")
+
+    @classmethod
+    def unpack(cls, key_offsets, keys, id_offsets, ids) -> "KeyTable":
+        return cls(as_array(key_offsets, "I"), keys, as_array(id_offsets, "I"), as_array(ids, "I"))
+
+    @staticmethod
+    def pack(table: Mapping[str, Sequence[int]]) -> List[bytes]:
+        """Packs `table` (key -> ascending ids) into the four arrays `unpack` takes."""
+        key_offsets, keys, id_offsets, ids = array("I", [0]), [], array("I", [0]), array("I")
+        size = 0
+        for key in sorted(table):
+            encoded = key.encode()
+            keys.append(encoded)
+            size += len(encoded)
+            key_offsets.append(size)
+            ids.extend(table[key])
+            id_offsets.append(len(ids))
+        return [key_offsets, b"".join(keys), id_offsets, ids]
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, i: int) -> bytes:
+        return self._keys[self._key_offsets[i]:self._key_offsets[i + 1]].tobytes()
+
+    def _find(self, encoded: bytes) -> int:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def __contains__(self, key: str) -> bool:
+        encoded = key.encode()
+        i = self._find(encoded)
+        return i < self._count and self._key(i) == encoded
+
+    def get(self, key: str) -> Sequence[int]:
+        """The ids of `key`, empty if it is absent."""
+        encoded = key.encode()
+        i = self._find(encoded)
+        if i == self._count or self._key(i) != encoded:
+            return _EMPTY
+        return self._ids[self._id_offsets[i]:self._id_offsets[i + 1]]
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        """Keys starting with `prefix`, in order."""
+        encoded = prefix.encode()
+        i = self._find(encoded)
+        while i < self._count:
+            key = self._key(i)
+            if not key.startswith(encoded):
+                return
+            yield key.decode()
+            i += 1
+
+def merged_keys(*tables) -> List[str]:
+    """The sorted union of the keys of KeyTables and dicts."""
+    keys = set()
+    for table in tables:
+        keys.update(table.keys())
+    return sorted(keys)
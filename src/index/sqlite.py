@@ -0,0 +1,291 @@
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+import json
+import logging
+import sqlite3
+import threading
+import uuid
+
+from src.dag.models import CommitNode
+from src.index.base import CommitIndexer
+
+logger = logging.getLogger(__name__)
+
+# Existing oids are looked up this many at a time (SQLite's default variable limit is 999).
+LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS commits (
+    seq INTEGER PRIMARY KEY,
+    oid TEXT NOT NULL UNIQUE,
+    tree TEXT NOT NULL,
+    parents TEXT NOT NULL,
+    author TEXT NOT NULL,
+    committer TEXT NOT NULL,
+    author_name TEXT NOT NULL,
+    author_email TEXT NOT NULL,
+    author_time INTEGER NOT NULL,
+    committer_time INTEGER NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS commits_email ON commits (author_email, seq);
+CREATE INDEX IF NOT EXISTS commits_name ON commits (author_name, seq);
+CREATE INDEX IF NOT EXISTS commits_time ON commits (committer_time);
+"""
+
+_COLUMNS = "oid, tree, parents, author, committer, message"
+
+@dataclass
+class CommitRecord:
+    """One commit as stored in the index; the fields of a CommitResponse."""
+    oid: str
+    tree_oid: str
+    parent_oids: List[str]
+    author: str
+    committer: str
+    message: str
+
+def _record(row) -> CommitRecord:
+    oid, tree, parents, author, committer, message = row
+    return CommitRecord(oid, tree, parents.split() if parents else [], author, committer, message)
+
+class SqliteCommitIndex(CommitIndexer):
+    """Commit metadata in an SQLite file, for listing and lookups without the DAG.
+
+    One row per commit: tree, parents, raw and parsed author/committer, and
+    `seq`, which grows with recency: the commits are numbered 1..N in
+    reverse topological order, so the newest commit has the highest number
+    and a new segment always goes on top. An unfiltered page is then a
+    range on the primary key however deep it is.
+
+    The index outlives the process. It records the ref tips it was last
+    brought up to date with (`mark_current`); queries name the tips they
+    expect and get None if the index doesn't match them, so a caller can
+    fall back to the DAG. The snapshot section only holds the index's
+    generation, which is renewed by every `reset`: a snapshot only trusts
+    the index it was saved with.
+
+    Storage errors are logged and make the index answer None until the next
+    reset, like a snapshot that can't be written.
+    """
+
+    section = b"SQLC"
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._tips: Optional[Dict[str, str]] = None
+        self._generation: Optional[str] = None
+        self._count = 0
+        # Set by a storage error; cleared by the next successful reset.
+        self._broken = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_SCHEMA)
+                meta = dict(conn.execute("SELECT key, value FROM meta"))
+                self._count = conn.execute("SELECT coalesce(max(seq), 0) FROM commits").fetchone()[0]
+            except sqlite3.Error:
+                conn.close()
+                raise
+            self._tips = json.loads(meta["tips"]) if "tips" in meta else None
+            self._generation = meta.get("generation")
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        """Closes the database file; the next use reopens it."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _failed(self, action: str, error: Exception):
+        logger.warning(f"Commit index {self.path}: {action} failed ({error}); serving commits from the DAG")
+        self._tips = None
+        self._broken = True
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _open(self) -> Optional[sqlite3.Connection]:
+        # Callers hold the lock.
+        if self._broken:
+            return None
+        try:
+            return self._connect()
+        except sqlite3.Error as e:
+            self._failed("opening", e)
+            return None
+
+    def _current_for(self, tips: Dict[str, str]) -> Optional[sqlite3.Connection]:
+        conn = self._open()
+        return conn if conn is not None and self._tips == tips else None
+
+    @property
+    def tips(self) -> Optional[Dict[str, str]]:
+        """The ref tips the index is complete for, or None."""
+        with self._lock:
+            self._open()
+            return self._tips
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, oid: str) -> bool:
+        """Whether `oid` is stored, whatever tips the index is current for."""
+        with self._lock:
+            conn = self._open()
+            if conn is None:
+                return False
+            try:
+                return conn.execute("SELECT 1 FROM commits WHERE oid = ?", [oid]).fetchone() is not None
+            except sqlite3.Error as e:
+                self._failed("lookup", e)
+                return False
+
+    def reset(self):
+        with self._lock:
+            try:
+                conn = self._connect()
+                self._generation = uuid.uuid4().hex
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.execute("DELETE FROM commits")
+                    conn.execute("DELETE FROM meta")
+                    conn.execute("INSERT INTO meta VALUES ('generation', ?)", (self._generation,))
+                self._tips = None
+                self._count = 0
+                self._broken = False
+            except sqlite3.Error as e:
+                self._failed("reset", e)
+
+    def add_commits(self, nodes: List[CommitNode]):
+        with self._lock:
+            if self._broken:
+                return
+            try:
+                conn = self._connect()
+                existing = set()
+                if self._count:
+                    oids = [node.oid for node in nodes]
+                    for i in range(0, len(oids), LOOKUP_BATCH):
+                        batch = oids[i : i + LOOKUP_BATCH]
+                        placeholders = ",".join("?" * len(batch))
+                        existing.update(row[0] for row in conn.execute(f"SELECT oid FROM commits WHERE oid IN ({placeholders})", batch))
+                rows = []
+                seq = self._count
+                # Oldest first, so the newest commit gets the highest number.
+                for node in reversed(nodes):
+                    if node.oid in existing:
+                        continue
+                    existing.add(node.oid)
+                    seq += 1
+                    commit = node.commit
+                    author = commit.author_identity
+                    rows.append((
+                        seq, node.oid, commit.tree_oid, " ".join(commit.parent_oids), commit.author, commit.committer,
+                        author.name.lower(), author.email.lower(), author.timestamp,
+                        commit.committer_identity.timestamp, commit.message,
+                    ))
+                if not rows:
+                    return
+                with conn:
+                    conn.execute("BEGIN")
+                    conn.executemany("INSERT INTO commits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self._count = seq
+            except sqlite3.Error as e:
+                self._failed("adding commits", e)
+
+    def mark_current(self, tips: Dict[str, str]):
+        """Records that every commit reachable from `tips` has been added."""
+        with self._lock:
+            if self._broken or tips == self._tips:
+                return
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO meta VALUES ('tips', ?)", (json.dumps(tips, sort_keys=True),))
+                self._tips = dict(tips)
+            except sqlite3.Error as e:
+                self._failed("recording tips", e)
+
+    def dump(self) -> bytes:
+        with self._lock:
+            return (self._generation or "").encode()
+
+    def load(self, data: bytes):
+        with self._lock:
+            self._connect()
+            if self._broken or not data or bytes(data).decode() != self._generation:
+                raise ValueError("index was rebuilt since the snapshot was saved")
+
+    def get(self, oid: str, tips: Dict[str, str]) -> Optional[CommitRecord]:
+        """The commit `oid`, or None if it is absent or the index doesn't match `tips`."""
+        with self._lock:
+            try:
+                conn = self._current_for(tips)
+                if conn is None:
+                    return None
+                row = conn.execute(f"SELECT {_COLUMNS} FROM commits WHERE oid = ?", [oid]).fetchone()
+            except sqlite3.Error as e:
+                self._failed("lookup", e)
+                return None
+        return _record(row) if row is not None else None
+
+    def page(
+        self,
+        tips: Dict[str, str],
+        limit: int,
+        skip: int = 0,
+        author: Optional[str] = None,
+        since: Optional[int] = None,
+        until: Optional[int] = None,
+    ) -> Optional[List[CommitRecord]]:
+        """One page of commits newest first, with GitService.get_commits' filters.
+
+        Returns None if the index doesn't match `tips`.
+        """
+        where, params = [], []
+        with self._lock:
+            try:
+                conn = self._current_for(tips)
+                if conn is None:
+                    return None
+                if author is not None:
+                    key = author.strip().lower()
+                    if not key:
+                        return []
+                    # Like IdentityIndex: an email match wins, names are the fallback.
+                    by_email = conn.execute("SELECT 1 FROM commits WHERE author_email = ? LIMIT 1", [key]).fetchone()
+                    where.append("author_email = ?" if by_email else "author_name = ?")
+                    params.append(key)
+                if since is not None:
+                    where.append("committer_time >= ?")
+                    params.append(since)
+                if until is not None:
+                    where.append("committer_time <= ?")
+                    params.append(until)
+                if not where:
+                    # seq is dense, so skipping is a key range rather than an OFFSET scan.
+                    rows = conn.execute(
+                        f"SELECT {_COLUMNS} FROM commits WHERE seq <= ? ORDER BY seq DESC LIMIT ?",
+                        [self._count - skip, limit],
+                    )
+                else:
+                    rows = conn.execute(
+                        f"SELECT {_COLUMNS} FROM commits WHERE {' AND '.join(where)} ORDER BY seq DESC LIMIT ? OFFSET ?",
+                        params + [limit, skip],
+                    )
+                records = [_record(row) for row in rows]
+            except sqlite3.Error as e:
+                self._failed("query", e)
+                return None
+        return records
@@ -0,0 +1,222 @@
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
+import json
+import threading
+import zlib
+
+from src.dag.models import CommitNode
+from src.diff.tree_diff import diff_trees
+from src.git_objects.models import CommitObject, GitObject
+from src.index.base import CommitIndexer
+from src.index.packed import DocIds, pack_arrays, unpack_arrays
+
+WEEK = 7 * 86400
+# The epoch was a Thursday; weeks start on Monday 1970-01-05, like ISO weeks.
+_MONDAY = 4 * 86400
+
+def week_start(timestamp: int) -> int:
+    """Epoch seconds of the Monday 00:00 UTC starting the week of `timestamp`."""
+    return timestamp - (timestamp - _MONDAY) % WEEK
+
+def week_label(start: int) -> str:
+    return datetime.fromtimestamp(start, timezone.utc).date().isoformat()
+
+@dataclass
+class _Totals:
+    commits: int = 0
+    merges: int = 0
+    files_changed: int = 0
+
+    def add(self, merge: bool):
+        self.commits += 1
+        self.merges += merge
+
+@dataclass
+class _Author(_Totals):
+    name: str = ""
+    email: str = ""
+    # week start -> commits
+    weeks: Dict[int, int] = field(default_factory=dict)
+
+class _Churn(NamedTuple):
+    """A commit queued for counting its churn."""
+    tree: str
+    parent: Optional[str]
+    # Known when the parent was added in the same batch; read otherwise.
+    parent_tree: Optional[str]
+    week: int
+    author: str
+
+class StatsIndex(CommitIndexer):
+    """Activity counts kept up to date as commits are added.
+
+    Commits are bucketed by author (email, or name without one) and by the
+    UTC week of their author date; each bucket holds commits, merges and
+    churn, the number of files changed against the first parent (all files
+    for a root commit). `summary` is rebuilt only after something changed,
+    so serving it does not depend on the size of the history.
+
+    Adding a commit only updates the commit and merge counters. Churn needs
+    the trees of the commit and its first parent, read with `read`, so it
+    is queued instead and counted later by `count_churn`, which the service
+    runs in the background once the snapshot is live; `summary` reports how
+    many commits are still queued. Commits whose trees are missing count
+    no files.
+
+    The counters are small and live in memory; the set of commits already
+    counted is served from the stored section (see src/index/packed.py).
+    """
+
+    section = b"STAT"
+
+    def __init__(self, read: Callable[[str], GitObject]):
+        self.read = read
+        self._lock = threading.Lock()
+        # One count_churn at a time; it holds this across reading trees, not _lock.
+        self._churn_lock = threading.Lock()
+        # Bumped on every change (never reset), so callers can cache what they derive from summary.
+        self.version = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counted = DocIds()
+            self._totals = _Totals()
+            self._authors: Dict[str, _Author] = {}
+            self._weeks: Dict[int, _Totals] = {}
+            # Commits whose churn is not counted yet, oldest first.
+            self._churn: Deque[_Churn] = deque()
+            self._summary: Optional[dict] = None
+            self.version += 1
+
+    def add_commits(self, nodes: List[CommitNode]):
+        with self._lock:
+            # Parents given in the same batch don't need their commit read for churn.
+            trees = {node.oid: node.commit.tree_oid for node in nodes}
+            for node in nodes:
+                if self._counted.add(node.oid) is None:
+                    continue
+                identity = node.commit.author_identity
+                merge = len(node.parents) > 1
+                week = week_start(identity.timestamp)
+                key = (identity.email or identity.name).lower()
+
+                self._totals.add(merge)
+                self._weeks.setdefault(week, _Totals()).add(merge)
+                author = self._authors.get(key)
+                if author is None:
+                    author = self._authors[key] = _Author(name=identity.name, email=identity.email)
+                author.add(merge)
+                author.weeks[week] = author.weeks.get(week, 0) + 1
+
+                parent = node.parents[0] if node.parents else None
+                self._churn.append(_Churn(node.commit.tree_oid, parent, trees.get(parent), week, key))
+            self._summary = None
+            self.version += 1
+
+    @property
+    def churn_pending(self) -> int:
+        """Commits added whose churn is not counted yet."""
+        return len(self._churn)
+
+    def count_churn(self, limit: Optional[int] = None) -> int:
+        """Counts the churn of up to `limit` queued commits (all if None); returns how many remain.
+
+        Trees are diffed outside the counters' lock, so readers keep getting
+        the previous summary meanwhile.
+        """
+        with self._churn_lock:
+            with self._lock:
+                batch = list(islice(self._churn, limit))
+            if not batch:
+                return 0
+            changes = [self._files_changed(entry) for entry in batch]
+            with self._lock:
+                # reset() or load() may have replaced the queue meanwhile.
+                if self._churn and self._churn[0] is batch[0]:
+                    for entry, files in zip(batch, changes):
+                        self._churn.popleft()
+                        self._totals.files_changed += files
+                        self._weeks[entry.week].files_changed += files
+                        self._authors[entry.author].files_changed += files
+                    self._summary = None
+                    self.version += 1
+                return len(self._churn)
+
+    def _files_changed(self, entry: _Churn) -> int:
+        try:
+            parent_tree = entry.parent_tree
+            if entry.parent is not None and parent_tree is None:
+                commit = self.read(entry.parent)
+                if not isinstance(commit, CommitObject):
+                    return 0
+                parent_tree = commit.tree_oid
+            return len(diff_trees(parent_tree, entry.tree, self.read))
+        except (ValueError, FileNotFoundError):
+            return 0
+
+    def summary(self) -> dict:
+        """Totals, per-week buckets (oldest first) and per-author buckets (most commits first)."""
+        with self._lock:
+            if self._summary is None:
+                totals = self._totals
+                self._summary = {
+                    "commits": totals.commits,
+                    "merges": totals.merges,
+                    "merge_ratio": round(totals.merges / totals.commits, 4) if totals.commits else 0.0,
+                    "files_changed": totals.files_changed,
+                    "churn_pending": len(self._churn),
+                    "weeks": [
+                        {"week": week_label(week), "commits": t.commits, "merges": t.merges, "files_changed": t.files_changed}
+                        for week, t in sorted(self._weeks.items())
+                    ],
+                    "authors": [
+                        {
+                            "name": a.name,
+                            "email": a.email,
+                            "commits": a.commits,
+                            "merges": a.merges,
+                            "files_changed": a.files_changed,
+                            "weeks": {week_label(week): n for week, n in sorted(a.weeks.items())},
+                        }
+                        for a in sorted(self._authors.values(), key=lambda a: (-a.commits, a.email, a.name))
+                    ],
+                }
+            return self._summary
+
+    def dump(self) -> bytes:
+        with self._lock:
+            payload = {
+                "totals": _pack(self._totals),
+                "weeks": {week: _pack(t) for week, t in self._weeks.items()},
+                "authors": {
+                    key: [a.name, a.email, _pack(a), a.weeks] for key, a in self._authors.items()
+                },
+                "churn": [list(entry) for entry in self._churn],
+            }
+            counted = self._counted.pack()
+        return pack_arrays(self.section, counted + [zlib.compress(json.dumps(payload).encode())])
+
+    def load(self, data: bytes):
+        arrays = unpack_arrays(self.section, data)
+        if len(arrays) != 3:
+            raise ValueError("Malformed STAT section")
+        counted = DocIds.unpack(*arrays[:2])
+        payload = json.loads(zlib.decompress(arrays[2]))
+        authors = {}
+        for key, (name, email, totals, weeks) in payload["authors"].items():
+            authors[key] = _Author(*totals, name=name, email=email, weeks={int(w): n for w, n in weeks.items()})
+        with self._lock:
+            self._counted = counted
+            self._totals = _Totals(*payload["totals"])
+            self._weeks = {int(week): _Totals(*t) for week, t in payload["weeks"].items()}
+            self._authors = authors
+            self._churn = deque(_Churn(*entry) for entry in payload["churn"])
+            self._summary = None
+            self.version += 1
+
+def _pack(totals: _Totals) -> Tuple[int, int, int]:
+    return totals.commits, totals.merges, totals.files_changed
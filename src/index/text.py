@@ -0,0 +1,224 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, List, Mapping, Optional, Sequence, Set
+import heapq
+import re
+import threading
+
+from src.dag.models import CommitNode
+from src.index.base import CommitIndexer
+from src.index.packed import DocIds, KeyTable, merged_keys, pack_arrays, unpack_arrays
+
+_TOKEN = re.compile(r"\w+")
+# Identity headers end in "<timestamp> <tz>", which is not worth indexing.
+_IDENTITY = re.compile(r"^(.*?>)")
+# A prefix query expands to at most this many vocabulary terms.
+MAX_PREFIX_EXPANSION = 1000
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+def commit_tokens(node: CommitNode) -> List[List[str]]:
+    """Token streams of the indexed fields: message, author, committer."""
+    fields = [node.commit.message]
+    for identity in (node.commit.author, node.commit.committer):
+        match = _IDENTITY.match(identity)
+        fields.append(match.group(1) if match else identity)
+    return [tokenize(field) for field in fields]
+
+@dataclass
+class Clause:
+    kind: str  # 'term', 'prefix' or 'phrase'
+    tokens: List[str]
+
+def parse_query(query: str) -> List[Clause]:
+    """Parses `ticket-123 "fix crash" refact*` into clauses that must all match.
+
+    Quoted text is a phrase; a bare word that tokenizes into several tokens
+    (ABC-123, a@b.com) is a phrase as well; a trailing `*` makes a prefix.
+    """
+    clauses = []
+    for i, part in enumerate(query.split('"')):
+        if i % 2 == 1:
+            tokens = tokenize(part)
+            if tokens:
+                clauses.append(Clause("phrase" if len(tokens) > 1 else "term", tokens))
+            continue
+        for word in part.split():
+            tokens = tokenize(word)
+            if not tokens:
+                continue
+            if word.endswith("*"):
+                clauses.extend(Clause("term", [t]) for t in tokens[:-1])
+                clauses.append(Clause("prefix", tokens[-1:]))
+            elif len(tokens) > 1:
+                clauses.append(Clause("phrase", tokens))
+            else:
+                clauses.append(Clause("term", tokens))
+    return clauses
+
+def intersect_sorted(short: Sequence[int], long: Sequence[int]) -> array:
+    """Ids present in both ascending sequences; cheapest with the shorter one first.
+
+    Each id of `short` is looked up in `long` by galloping (doubling steps
+    from the previous match, then bisecting), so a rare term against a
+    common one costs O(len(short) * log(len(long))) rather than a pass
+    over both.
+    """
+    result = array("I")
+    lo, n = 0, len(long)
+    for doc in short:
+        step = 1
+        while lo + step < n and long[lo + step] < doc:
+            step *= 2
+        lo = bisect_left(long, doc, lo, min(lo + step + 1, n))
+        if lo == n:
+            break
+        if long[lo] == doc:
+            result.append(doc)
+    return result
+
+def union_sorted(postings: List[Sequence[int]]) -> array:
+    """Ids present in any of the ascending sequences, ascending."""
+    result = array("I")
+    last = -1
+    for doc in heapq.merge(*postings):
+        if doc != last:
+            result.append(doc)
+            last = doc
+    return result
+
+_EMPTY = array("I")
+
+class TextIndex(CommitIndexer):
+    """Inverted index over commit messages and author/committer identities.
+
+    Postings are sorted arrays of document ids, one document per commit.
+    Term and prefix clauses are answered from the postings alone; phrases
+    intersect their terms' postings and then check word order against the
+    candidate commits. Clauses are intersected shortest posting list first,
+    without copying the longer lists.
+
+    A loaded index is served from its stored section (see
+    src/index/packed.py). A commit added afterwards copies the postings of
+    its terms into memory and appends to the copies there.
+    """
+
+    section = b"TIDX"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.docs = DocIds()
+            self._terms = KeyTable()
+            # Postings of the terms added to since loading, including their stored ids.
+            self.postings: Dict[str, array] = {}
+            # Sorted terms that are only in `postings`, for prefix queries.
+            self._vocabulary: Optional[List[str]] = None
+
+    def add_commits(self, nodes: List[CommitNode]):
+        with self._lock:
+            for node in nodes:
+                doc = self.docs.add(node.oid)
+                if doc is None:
+                    continue
+                seen: Set[str] = set()
+                for field in commit_tokens(node):
+                    for token in field:
+                        if token in seen:
+                            continue
+                        seen.add(token)
+                        postings = self.postings.get(token)
+                        if postings is None:
+                            postings = self.postings[token] = array("I", self._terms.get(token))
+                            if not postings:
+                                self._vocabulary = None
+                        postings.append(doc)
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def search(self, query: str, commits: Mapping[str, CommitNode]) -> List[str]:
+        """Oids of the commits matching every clause of `query`.
+
+        `commits` supplies the text for phrase checks (normally the DAG); ids
+        that are not in it are dropped. Order is unspecified.
+        """
+        clauses = parse_query(query)
+        if not clauses:
+            return []
+        with self._lock:
+            # Shortest lists first, so the candidates shrink quickly.
+            docs = _intersect_all([self._docs(clause) for clause in clauses])
+            oids = [self.docs.oid(d) for d in docs]
+
+        phrases = [c.tokens for c in clauses if c.kind == "phrase"]
+        result = []
+        for oid in oids:
+            node = commits.get(oid)
+            if node is None:
+                continue
+            if phrases and not all(_has_phrase(commit_tokens(node), p) for p in phrases):
+                continue
+            result.append(oid)
+        return result
+
+    def _postings(self, token: str) -> Sequence[int]:
+        postings = self.postings.get(token)
+        return postings if postings is not None else self._terms.get(token)
+
+    def _docs(self, clause: Clause) -> Sequence[int]:
+        # Term postings are returned as they are, not copied.
+        if clause.kind == "prefix":
+            return union_sorted([self._postings(token) for token in self._expand_prefix(clause.tokens[0])])
+        return _intersect_all([self._postings(token) for token in clause.tokens])
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        if self._vocabulary is None:
+            self._vocabulary = sorted(t for t in self.postings if t not in self._terms)
+        vocabulary = self._vocabulary
+        i = bisect_left(vocabulary, prefix)
+        added = []
+        while i < len(vocabulary) and vocabulary[i].startswith(prefix):
+            added.append(vocabulary[i])
+            i += 1
+        return list(islice(heapq.merge(self._terms.keys(prefix), added), MAX_PREFIX_EXPANSION))
+
+    def dump(self) -> bytes:
+        with self._lock:
+            terms = {t: self._postings(t) for t in merged_keys(self._terms, self.postings)}
+            return pack_arrays(self.section, self.docs.pack() + KeyTable.pack(terms))
+
+    def load(self, data: bytes):
+        arrays = unpack_arrays(self.section, data)
+        if len(arrays) != 6:
+            raise ValueError("Malformed TIDX section")
+        docs = DocIds.unpack(*arrays[:2])
+        terms = KeyTable.unpack(*arrays[2:])
+        with self._lock:
+            self.docs = docs
+            self._terms = terms
+            self.postings = {}
+            self._vocabulary = None
+
+def _intersect_all(postings: List[Sequence[int]]) -> Sequence[int]:
+    postings = sorted(postings, key=len)
+    docs = postings[0]
+    for other in postings[1:]:
+        if not docs:
+            break
+        docs = intersect_sorted(docs, other)
+    return docs
+
+def _has_phrase(fields: List[List[str]], phrase: List[str]) -> bool:
+    n = len(phrase)
+    for tokens in fields:
+        for i in range(len(tokens) - n + 1):
+            if tokens[i:i + n] == phrase:
+                return True
+    return False
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+import threading
+
+_MISSING = object()
+
+class LRUCache:
+    """A small thread-safe LRU mapping with hit/miss counters.
+
+    Values are expected to be immutable once cached (parsed git objects,
+    listings keyed by content hash), so no copies are made on the way out.
+
+    With a `weigher` (value -> bytes) the cache also keeps the total
+    `weight` of its values at or below `maxweight`, evicting the least
+    recently used ones first; a value heavier than `maxweight` on its own
+    is not cached.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        weigher: Optional[Callable[[Any], int]] = None,
+        maxweight: Optional[int] = None,
+    ):
+        self.maxsize = maxsize
+        self.weigher = weigher
+        self.maxweight = maxweight
+        self.weight = 0
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._weights: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.maxsize <= 0:
+            return
+        weight = self.weigher(value) if self.weigher is not None else 0
+        if self.maxweight is not None and weight > self.maxweight:
+            return
+        with self._lock:
+            self.weight += weight - self._weights.pop(key, 0)
+            if weight:
+                self._weights[key] = weight
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize or (self.maxweight is not None and self.weight > self.maxweight):
+                oldest, _ = self._data.popitem(last=False)
+                self.weight -= self._weights.pop(oldest, 0)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the cached value, computing and caching it on a miss.
+
+        `compute` runs outside the lock, so two threads missing on the same key
+        may both compute it; the results are equal by construction.
+        """
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            self.weight -= self._weights.pop(key, 0)
+            return self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
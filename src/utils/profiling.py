@@ -0,0 +1,127 @@
+"""Opt-in timing of one request's work, stage by stage.
+
+A RequestProfile is installed in a context variable for the duration of
+a profiled request (see src/api/profiling.py). Code on the request path
+marks its stages with `@spanned("name")` or `with span("name")`; when no
+profile is active that costs one context-variable lookup. Context
+variables follow the request into threadpool calls and into the DAG
+refresh it triggers, so spans recorded there land in the same profile.
+
+Spans nest and may overlap (read_object runs inside dag_build), so they
+do not add up to the request's total.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+import cProfile
+import functools
+import marshal
+import pstats
+import sys
+import threading
+import time
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+class RequestProfile:
+    def __init__(self, cprofile: bool = False):
+        # name -> [seconds, calls], in order of first use
+        self.spans: Dict[str, List[float]] = {}
+        self.cprofile = cprofile
+        # One cProfile.Profile per thread stint, merged by `dump`.
+        self._profilers: List[cProfile.Profile] = []
+        # When the route handler returned; what follows is response building.
+        self.handler_done: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [seconds, 1]
+            else:
+                entry[0] += seconds
+                entry[1] += 1
+
+    def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Runs `fn`, under cProfile in cprofile mode."""
+        with self.profile_thread():
+            return fn(*args, **kwargs)
+
+    @contextmanager
+    def profile_thread(self) -> Iterator[None]:
+        """Profiles the current thread for the enclosed code in cprofile mode.
+
+        Does nothing if the thread is already being profiled (cProfile
+        can't nest), e.g. by another request's profile.
+        """
+        if not self.cprofile or sys.getprofile() is not None:
+            yield
+            return
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            with self._lock:
+                self._profilers.append(profiler)
+
+    def server_timing(self) -> str:
+        """The spans as a Server-Timing header value (durations in milliseconds)."""
+        with self._lock:
+            spans = list(self.spans.items())
+        return ", ".join(f'{name};dur={seconds * 1000:.3f};desc="{int(calls)} calls"' for name, (seconds, calls) in spans)
+
+    def dump(self) -> bytes:
+        """The merged cProfile statistics in the format of Profile.dump_stats, readable with pstats."""
+        with self._lock:
+            profilers = list(self._profilers)
+        if not profilers:
+            return marshal.dumps({})
+        stats = pstats.Stats(*profilers)
+        return marshal.dumps(stats.stats)
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+
+def current_profile() -> Optional[RequestProfile]:
+    return _current.get()
+
+@contextmanager
+def profiling(profile: RequestProfile) -> Iterator[RequestProfile]:
+    """Makes `profile` the active profile for the enclosed code and the work it starts."""
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, time.perf_counter() - start)
+
+def spanned(name: str) -> Callable[[F], F]:
+    """Decorator form of `span` for functions on hot paths."""
+
+    def decorate(fn: F) -> F:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            profile = _current.get()
+            if profile is None:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                profile.add(name, time.perf_counter() - start)
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
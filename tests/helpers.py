@@ -0,0 +1,54 @@
+"""Helpers for writing small repositories object by object."""
+import hashlib
+import zlib
+
+from src.git_objects.models import BlobObject, CommitObject, TreeEntry, TreeObject
+
+
+def write_object(git_dir, obj):
+    data = obj.serialize()
+    store = f"{obj.type.decode()} {len(data)}".encode() + b"\x00" + data
+    oid = hashlib.sha1(store).hexdigest()
+    path = git_dir / "objects" / oid[:2] / oid[2:]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if not path.exists():
+        path.write_bytes(zlib.compress(store))
+    return oid
+
+
+def init_repo(git_dir):
+    (git_dir / "objects").mkdir(parents=True, exist_ok=True)
+    (git_dir / "refs" / "heads").mkdir(parents=True, exist_ok=True)
+    (git_dir / "HEAD").write_text("ref: refs/heads/main")
+    return git_dir
+
+
+def write_tree(git_dir, files):
+    """Writes nested trees for a {path: bytes} mapping and returns the root oid."""
+    entries = []
+    subdirs = {}
+    for path, content in files.items():
+        head, _, rest = path.partition("/")
+        if rest:
+            subdirs.setdefault(head, {})[rest] = content
+        else:
+            entries.append(TreeEntry(mode=b"100644", name=head, oid=write_object(git_dir, BlobObject(content))))
+    for name, sub in subdirs.items():
+        entries.append(TreeEntry(mode=b"40000", name=name, oid=write_tree(git_dir, sub)))
+    return write_object(git_dir, TreeObject(entries=entries))
+
+
+def write_commit(git_dir, message, parents=(), tree="tree", author="A <a@example.com> 0 +0000", branch=None):
+    commit = CommitObject(
+        tree_oid=tree,
+        parent_oids=list(parents),
+        author=author,
+        committer=author,
+        message=message,
+    )
+    oid = write_object(git_dir, commit)
+    if branch:
+        ref = git_dir / "refs" / "heads" / branch
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        ref.write_text(oid)
+    return oid
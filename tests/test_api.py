@@ -25,8 +25,7 @@ def mock_repo(tmp_path):
     # Point the global service to this tmp path
     service.git_dir = git_dir
     service.builder.git_dir = git_dir  # Fix: update builder path too
-    service.dag = {}
-    service.sorted_commits = []
+    service.invalidate()
     
     # Create some dummy data (using manual injection into service cache or files)
     from src.git_objects.models import CommitObject
@@ -76,6 +75,13 @@ async def test_get_commits(client, mock_repo):
     data = response.json()
     assert len(data) >= 1  # Should find at least one reachable from main
 
+@pytest.mark.asyncio
+async def test_get_commits_rejects_bad_dates(client, mock_repo):
+    response = await client.get("/api/commits?since=last-tuesday")
+    assert response.status_code == 400
+    response = await client.get("/api/commits?since=2000-01-01")
+    assert response.status_code == 200
+
 @pytest.mark.asyncio
 async def test_get_commit_detail(client, mock_repo):
     _, oid1, _ = mock_repo
@@ -99,3 +105,83 @@ async def test_get_branches(client, mock_repo):
     data = response.json()
     assert len(data) == 1
     assert data[0]["name"] == "main"
+
+@pytest.mark.asyncio
+async def test_readiness_reports_warmup(client, mock_repo):
+    response = await client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "warming"
+
+    await client.get("/api/commits")
+    response = await client.get("/health/ready")
+    assert response.status_code == 200
+    assert response.json()["commits_loaded"] == 2
+
+@pytest.mark.asyncio
+async def test_read_only_mode_rejects_writes(client, mock_repo, monkeypatch):
+    import src.api.main as main
+    monkeypatch.setattr(main, "read_only", True)
+    response = await client.post("/api/commits", json={"message": "nope"})
+    assert response.status_code == 403
+
+@pytest.mark.asyncio
+async def test_batch_objects(client, mock_repo):
+    _, oid1, oid2 = mock_repo
+    response = await client.post("/api/objects", json={"objects": [
+        {"oid": oid1},
+        {"oid": oid2, "fields": ["oid", "message"]},
+        {"oid": "0" * 40},
+        {"oid": "bad"},
+    ]})
+    assert response.status_code == 200
+    first, second, missing, invalid = response.json()["objects"]
+    assert first["type"] == "commit" and first["data"]["message"] == "Initial"
+    assert second["data"] == {"oid": oid2, "message": "Second"}
+    assert "error" in missing and "type" not in missing
+    assert "Invalid Object ID" in invalid["error"]
+
+@pytest.mark.asyncio
+async def test_batch_commits(client, mock_repo):
+    response = await client.post("/api/commits/batch", json={"branch": "import", "commits": [
+        {"message": "one", "parents": [], "files": {"f": {"content": "1"}}},
+        {"message": "two", "files": {"f": {"content": "2"}}},
+    ]})
+    assert response.status_code == 200
+    assert len(response.json()["oids"]) == 2
+
+    response = await client.post("/api/commits/batch", json={"commits": [{"message": "x", "parents": ["nope"]}]})
+    assert response.status_code == 400
+
+@pytest.mark.asyncio
+async def test_repack(client, mock_repo):
+    _, oid1, _ = mock_repo
+    response = await client.post("/api/maintenance/repack")
+    assert response.status_code == 200
+    assert response.json()["packed"] == response.json()["pruned"] == 2
+    response = await client.get(f"/api/commits/{oid1}")
+    assert response.json()["message"] == "Initial"
+
+@pytest.mark.asyncio
+async def test_upload_blob(client, mock_repo):
+    from src.git_objects.models import BlobObject
+    response = await client.post("/api/blobs", content=b"hello world")
+    assert response.json() == {"oid": BlobObject(b"hello world").compute_oid(), "size": 11}
+
+    async def body():
+        yield b"hello "
+        yield b"world"
+    response = await client.post("/api/blobs", content=body())
+    assert response.json()["oid"] == BlobObject(b"hello world").compute_oid()
+
+@pytest.mark.asyncio
+async def test_metrics(client, mock_repo):
+    _, oid1, _ = mock_repo
+    await client.get("/api/commits")
+    await client.get(f"/api/commits/{oid1}")
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    text = response.text
+    assert 'tinygit_object_reads_total{source="loose"}' in text
+    assert 'tinygit_dag_build_seconds_count{kind="full"}' in text
+    assert 'tinygit_http_request_seconds_count{method="GET",route="/api/commits/{oid}",status="200"}' in text
+    assert 'tinygit_cache_hit_ratio{repo="default",cache="objects"}' in text
@@ -0,0 +1,75 @@
+import pytest
+
+from src.api.service import GitService
+from tests.helpers import init_repo, write_commit, write_tree
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    oids = []
+
+    def commit(msg, content, parents=None, other=b"x"):
+        parents = [oids[-1]] if parents is None and oids else (parents or [])
+        tree = write_tree(git_dir, {"f.txt": content, "other": other})
+        oid = write_commit(git_dir, msg, parents, tree=tree, branch="main")
+        oids.append(oid)
+        return oid
+
+    commit("c1", b"a\nb\nc\n")
+    commit("c2", b"a\nB\nc\n")
+    commit("c3", b"a\nB\nc\n", other=b"y")  # doesn't touch f.txt
+    commit("c4", b"zero\na\nB\nc\nd\n")
+    return git_dir, GitService(git_dir), oids, commit
+
+
+def owners(result):
+    per_line = []
+    for r in result.ranges:
+        per_line.extend([r.commit] * r.count)
+    return per_line
+
+
+def test_blame_assigns_each_line(repo):
+    _, service, (c1, c2, c3, c4), _ = repo
+    result = service.get_blame(c4, "f.txt")
+    assert owners(result) == [c4, c1, c2, c1, c4]
+    assert result.ranges[1].orig_start == 1  # "a" was line 1 in c1
+    assert set(result.commits) == {c1, c2, c4}
+
+
+def test_missing_file(repo):
+    _, service, oids, _ = repo
+    assert service.get_blame(oids[-1], "nope") is None
+
+
+def test_directory_is_not_blamed(repo):
+    git_dir, service, oids, _ = repo
+    tree = write_tree(git_dir, {"f.txt": b"a\n", "src/g.txt": b"b\n"})
+    oid = write_commit(git_dir, "dirs", [oids[-1]], tree=tree, branch="main")
+    service.refresh()
+    # Directories (and the root) are not files: None, which the API serves as a 404.
+    for path in ("src", "src/", "", "/", "f.txt/x"):
+        assert service.get_blame(oid, path) is None
+    assert service.get_blame(oid, "src/g.txt").ranges[0].commit == oid
+
+
+def test_blame_extends_cached_result(repo):
+    git_dir, service, (c1, c2, c3, c4), commit = repo
+    service.get_blame(c4, "f.txt")
+    c5 = commit("c5", b"zero\na\nB\nc\nd\ne\n")
+    service.refresh()
+
+    reads_before = service.paths.paths.misses
+    result = service.get_blame(c5, "f.txt")
+    assert owners(result) == [c4, c1, c2, c1, c4, c5]
+    # Only c5 and its parent c4 were looked up; c4's cached blame covered the rest.
+    assert service.paths.paths.misses - reads_before == 1
+
+
+def test_merge_takes_lines_from_both_parents(repo):
+    git_dir, service, (c1, c2, c3, c4), commit = repo
+    side = commit("side", b"a\nb\nc\nside\n", parents=[c1])
+    merge = commit("merge", b"zero\na\nB\nc\nd\nside\n", parents=[c4, side])
+    service.refresh()
+    assert owners(service.get_blame(merge, "f.txt")) == [c4, c1, c2, c1, c4, side]
@@ -0,0 +1,39 @@
+from src.utils.cache import LRUCache
+
+
+def test_lru_eviction_order():
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.put("c", 3)
+    assert "b" not in cache
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_hit_ratio_and_get_or_compute():
+    cache = LRUCache(maxsize=8)
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute("k", lambda: calls.append(1) or "v") == "v"
+    assert len(calls) == 1
+    assert cache.hits == 2 and cache.misses == 1
+    assert cache.hit_ratio == 2 / 3
+
+
+def test_eviction_by_weight():
+    cache = LRUCache(maxsize=100, weigher=len, maxweight=10)
+    cache.put("a", b"1234")
+    cache.put("b", b"1234")
+    cache.put("a", b"12")
+    assert cache.weight == 6
+    cache.put("c", b"123456")
+    # "b" was least recently used; dropping it is enough.
+    assert "b" not in cache and cache.weight == 8
+    # Too big on its own: not cached, nothing evicted.
+    cache.put("d", b"x" * 11)
+    assert "d" not in cache and len(cache) == 2
+    cache.pop("a")
+    assert cache.weight == 6
+    cache.clear()
+    assert cache.weight == 0
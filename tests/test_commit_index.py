@@ -0,0 +1,109 @@
+import pytest
+
+from src.api.service import GitService
+from tests.helpers import init_repo, write_commit
+
+
+@pytest.fixture
+def git_dir(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    parents = []
+    # Committed out of time order on purpose: c3 is dated before c2.
+    for msg, who, ts in [
+        ("c1", "Alice <alice@example.com>", 100),
+        ("c2", "Bob <bob@example.com>", 300),
+        ("c3", "Alice <Alice@Example.com>", 200),
+        ("c4", "Bob <bob@example.com>", 400),
+    ]:
+        oid = write_commit(git_dir, msg, parents, author=f"{who} {ts} +0000")
+        parents = [oid]
+    (git_dir / "refs" / "heads" / "main").write_text(oid)
+    return git_dir
+
+
+def messages(commits):
+    return [c.message for c in commits]
+
+
+@pytest.mark.parametrize("query", [
+    {},
+    {"limit": 2, "skip": 1},
+    {"skip": 10},
+    {"author": "alice@example.com"},
+    {"author": "bob"},
+    {"since": 200, "until": 300},
+    {"author": "bob@example.com", "since": 350},
+    {"author": "alice@example.com", "limit": 1, "skip": 1},
+    {"author": "carol@example.com"},
+])
+def test_index_answers_like_the_dag(git_dir, query):
+    indexed = GitService(git_dir, commit_index=True)
+    indexed.refresh()
+    assert indexed.serves_commits_from_index()
+
+    assert indexed.get_commits(**query) == GitService(git_dir).get_commits(**query)
+
+
+def test_restart_serves_commits_without_the_dag(git_dir, monkeypatch):
+    head = (git_dir / "refs" / "heads" / "main").read_text()
+    GitService(git_dir, commit_index=True).refresh()
+
+    service = GitService(git_dir, commit_index=True)
+    monkeypatch.setattr(service, "_build_snapshot", lambda: pytest.fail("DAG was built"))
+    assert messages(service.get_commits(limit=2)) == ["c4", "c3"]
+    assert service.serves_commits_from_index()
+    assert service.get_commit(head).message == "c4"
+    assert service.get_commit("0" * 40) is None
+    assert not service.is_loaded
+
+
+def test_moved_refs_catch_up_the_index_without_the_dag(git_dir, monkeypatch):
+    head = (git_dir / "refs" / "heads" / "main").read_text()
+    GitService(git_dir, commit_index=True).refresh()
+    write_commit(git_dir, "c5", [head], branch="main")
+    write_commit(git_dir, "side", [head], branch="feature")
+
+    service = GitService(git_dir, commit_index=True)
+    monkeypatch.setattr(service, "_build_snapshot", lambda: pytest.fail("DAG was built"))
+    # Walks from the refs to the indexed commits and adds only the new ones.
+    assert service.serves_commits_from_index()
+    assert len(service.commit_index) == 6
+    assert not service.is_loaded
+    monkeypatch.undo()
+    assert service.get_commits() == GitService(git_dir).get_commits()
+    assert set(messages(service.get_commits(limit=2))) == {"c5", "side"}
+
+
+def test_rewound_ref_falls_back_to_the_dag(git_dir):
+    head = (git_dir / "refs" / "heads" / "main").read_text()
+    GitService(git_dir, commit_index=True).refresh()
+    parent = GitService(git_dir).get_commit(head).parent_oids[0]
+    (git_dir / "refs" / "heads" / "main").write_text(parent)
+
+    service = GitService(git_dir, commit_index=True)
+    assert not service.serves_commits_from_index()
+    assert len(service.commit_index) == 4
+    assert messages(service.get_commits()) == ["c3", "c2", "c1"]
+    assert service.serves_commits_from_index()
+
+
+def test_rewound_ref_rebuilds_the_index(git_dir):
+    head = (git_dir / "refs" / "heads" / "main").read_text()
+    service = GitService(git_dir, commit_index=True)
+    service.refresh()
+    parent = service.get_commit(head).parent_oids[0]
+
+    (git_dir / "refs" / "heads" / "main").write_text(parent)
+    service.refresh()
+    assert len(service.commit_index) == 3
+    assert messages(service.get_commits()) == ["c3", "c2", "c1"]
+
+
+def test_evicted_repository_keeps_its_index(git_dir):
+    service = GitService(git_dir, commit_index=True)
+    service.refresh()
+    service.invalidate()
+
+    assert not service.is_loaded
+    assert service.serves_commits_from_index()
+    assert messages(service.get_commits(author="bob")) == ["c4", "c2"]
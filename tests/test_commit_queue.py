@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from src.api.schemas import BatchCommit, BatchCommitsRequest, BatchFile, CreateCommitRequest
+from src.api.service import GitService
+from src.dag.refs import RefConflictError, RefLockedError, get_branches, resolve_ref, update_ref
+from tests.helpers import init_repo
+
+
+@pytest.fixture
+def service(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    (git_dir / "HEAD").write_text("ref: refs/heads/main")
+    return GitService(git_dir)
+
+
+def test_update_ref_lock_and_compare_and_swap(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    a, b, c = "a" * 40, "b" * 40, "c" * 40
+    update_ref(git_dir, "refs/heads/main", a, old_oid=None)
+    assert (git_dir / "refs" / "heads" / "main").read_text() == a + "\n"
+
+    with pytest.raises(RefConflictError):
+        update_ref(git_dir, "refs/heads/main", b, old_oid=c)
+    update_ref(git_dir, "refs/heads/main", b, old_oid=a)
+    assert resolve_ref(git_dir, "refs/heads/main") == b
+
+    (git_dir / "refs" / "heads" / "main.lock").write_text("")
+    with pytest.raises(RefLockedError):
+        update_ref(git_dir, "refs/heads/main", c)
+    # A held lock is not a branch.
+    assert get_branches(git_dir) == {"main": b}
+
+
+def test_concurrent_writers_lose_no_commits(service):
+    def write(i):
+        return service.create_commit(CreateCommitRequest(message=f"commit {i}")).oid
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        oids = list(pool.map(write, range(40)))
+
+    snapshot = service.ensure_loaded()
+    assert set(oids) <= set(snapshot.dag)
+    # All commits form one linear chain ending at the branch tip.
+    chain = []
+    oid = resolve_ref(service.git_dir, "refs/heads/main")
+    while oid:
+        chain.append(oid)
+        parents = snapshot.dag[oid].parents
+        assert len(parents) <= 1
+        oid = parents[0] if parents else None
+    assert sorted(chain) == sorted(oids)
+    assert service.writes.groups <= 40
+
+
+def test_external_ref_change_is_a_conflict(service, monkeypatch):
+    first = service.create_commit(CreateCommitRequest(message="first")).oid
+    ref = service.git_dir / "refs" / "heads" / "main"
+    original = service._commit_job
+
+    def job_then_race(group, req):
+        oid = original(group, req)
+        # Someone else moves the branch after our job read it.
+        ref.write_text("f" * 40)
+        return oid
+
+    monkeypatch.setattr(service, "_commit_job", job_then_race)
+    with pytest.raises(RefConflictError):
+        service.create_commit(CreateCommitRequest(message="second"))
+    assert ref.read_text() == "f" * 40
+    assert first in service.ensure_loaded().dag
+
+
+def test_conflict_on_one_ref_fails_only_its_jobs(service, monkeypatch):
+    service.create_commit(CreateCommitRequest(message="root"))
+    main = service.git_dir / "refs" / "heads" / "main"
+    started, release = threading.Event(), threading.Event()
+    # Holds the writer so the next requests queue up into one group.
+    blocker = service.writes.submit(lambda group: started.set() or release.wait(5))
+    assert started.wait(5)
+
+    original = service._batch_job
+
+    def job_then_race(group, req, ref):
+        result = original(group, req, ref)
+        if ref == "refs/heads/main":
+            # Someone else moves main after the job read it.
+            main.write_text("f" * 40)
+        return result
+
+    monkeypatch.setattr(service, "_batch_job", job_then_race)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        on_main = pool.submit(service.create_commits, BatchCommitsRequest(
+            branch="main", commits=[BatchCommit(message="on main", files={"a": BatchFile(content="a")})]))
+        on_feature = pool.submit(service.create_commits, BatchCommitsRequest(
+            branch="feature", commits=[BatchCommit(message="on feature", files={"b": BatchFile(content="b")})]))
+        deadline = time.monotonic() + 5
+        while len(service.writes._jobs) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        blocker.result()
+
+        with pytest.raises(RefConflictError):
+            on_main.result()
+        feature = on_feature.result()
+    assert main.read_text() == "f" * 40
+    assert resolve_ref(service.git_dir, "refs/heads/feature") == feature.oids[-1]
+    assert feature.oids[-1] in service.ensure_loaded().dag
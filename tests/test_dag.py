@@ -1,6 +1,7 @@
 from pathlib import Path
 import pytest
 from src.dag.builder import DagBuilder, topological_sort
+from src.dag.models import CommitNode
 from src.git_objects.models import CommitObject
 
 # Mock the parser read_object to avoid needing real files
@@ -78,3 +79,12 @@ def test_topological_sort_merge(tmp_path):
     assert oids[-1] == "11"
     assert "22" in oids
     assert "33" in oids
+
+def test_topological_sort_deep_history():
+    # Far deeper than the recursion limit
+    dag = {}
+    for i in range(5000):
+        parents = [f"{i - 1:040d}"] if i else []
+        dag[f"{i:040d}"] = CommitNode(oid=f"{i:040d}", commit=create_commit(f"{i:040d}", parents))
+    oids = [n.oid for n in topological_sort(dag)]
+    assert oids == [f"{i:040d}" for i in reversed(range(5000))]
@@ -0,0 +1,68 @@
+import pytest
+
+from src.api.service import GitService
+from src.diff.tree_diff import diff_trees, unified_line_diff
+from src.git_objects.parser import read_object
+from tests.helpers import init_repo, write_commit, write_tree
+
+
+@pytest.fixture
+def git_dir(tmp_path):
+    return init_repo(tmp_path / ".git")
+
+
+def test_diff_reports_added_deleted_modified(git_dir):
+    old = write_tree(git_dir, {"a.txt": b"1", "dir/b.txt": b"2", "dir/c.txt": b"3"})
+    new = write_tree(git_dir, {"a.txt": b"1!", "dir/b.txt": b"2", "dir/d.txt": b"4"})
+    changes = diff_trees(old, new, lambda oid: read_object(oid, git_dir))
+    assert [(c.status, c.path) for c in changes] == [
+        ("M", "a.txt"),
+        ("D", "dir/c.txt"),
+        ("A", "dir/d.txt"),
+    ]
+
+
+def test_identical_subtrees_are_not_read(git_dir):
+    shared = {f"big/{i}.txt": str(i).encode() for i in range(20)}
+    old = write_tree(git_dir, {**shared, "x": b"old"})
+    new = write_tree(git_dir, {**shared, "x": b"new"})
+    reads = []
+
+    def read(oid):
+        reads.append(oid)
+        return read_object(oid, git_dir)
+
+    changes = diff_trees(old, new, read)
+    assert [(c.status, c.path) for c in changes] == [("M", "x")]
+    assert reads == [old, new]
+
+
+def test_file_replaced_by_directory(git_dir):
+    old = write_tree(git_dir, {"p": b"file"})
+    new = write_tree(git_dir, {"p/inner": b"nested"})
+    changes = diff_trees(old, new, lambda oid: read_object(oid, git_dir))
+    assert sorted((c.status, c.path) for c in changes) == [("A", "p/inner"), ("D", "p")]
+
+
+def test_unified_line_diff_and_binary():
+    patch = unified_line_diff(b"a\nb\n", b"a\nc\n", "f", "f")
+    assert "-b\n+c\n" in patch
+    assert unified_line_diff(b"\x00\x01", b"x", "f", "f") is None
+
+
+def test_commit_diff_against_first_parent(git_dir):
+    t1 = write_tree(git_dir, {"f.txt": b"one\n"})
+    t2 = write_tree(git_dir, {"f.txt": b"two\n", "g.txt": b"new\n"})
+    c1 = write_commit(git_dir, "first", tree=t1, branch="main")
+    c2 = write_commit(git_dir, "second", [c1], tree=t2, branch="main")
+    service = GitService(git_dir)
+
+    diff = service.diff_commit(c2, lines=True)
+    assert diff.parent == c1
+    assert [(f.status, f.path) for f in diff.files] == [("M", "f.txt"), ("A", "g.txt")]
+    assert "+two" in diff.files[0].patch
+    assert diff.files[1].patch.startswith("--- /dev/null")
+
+    root = service.diff_commit(c1)
+    assert root.old_tree is None
+    assert [(f.status, f.path) for f in root.files] == [("A", "f.txt")]
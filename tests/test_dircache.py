@@ -0,0 +1,125 @@
+import shutil
+import subprocess
+
+import pytest
+
+from src.git_objects.dircache import CacheTree, GitIndex, IndexEntry, build_tree, read_index, write_index
+from src.git_objects.store import store_for
+from src.git_objects.writer import ObjectBatch
+from src.git_objects.parser import read_object
+
+needs_git = pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+
+
+def git(work, *args):
+    return subprocess.run(["git", *args], cwd=work, check=True, capture_output=True).stdout.decode().strip()
+
+
+@pytest.fixture
+def work(tmp_path):
+    work = tmp_path / "work"
+    work.mkdir()
+    git(work, "init", "-q")
+    for path, content in {
+        "a.txt": "a",
+        "a/b.txt": "b",
+        "a/deep/c.txt": "c",
+        "z/y.txt": "y",
+        "top": "t",
+    }.items():
+        (work / path).parent.mkdir(parents=True, exist_ok=True)
+        (work / path).write_text(content)
+    (work / "run.sh").write_text("#!/bin/sh\n")
+    (work / "run.sh").chmod(0o755)
+    git(work, "add", "-A")
+    return work
+
+
+def build(git_dir, index):
+    batch = ObjectBatch(store_for(git_dir), lambda oid: read_object(oid, git_dir))
+    built = []
+
+    def add_tree(tree):
+        built.append(tree)
+        return batch.add(tree)
+
+    oid, changed = build_tree(index, add_tree, batch.contains)
+    batch.write()
+    return oid, changed, built
+
+
+@needs_git
+@pytest.mark.parametrize("version", [2, 3, 4])
+def test_tree_matches_git_write_tree(work, version):
+    git(work, "update-index", f"--index-version={version}")
+    if version == 3:
+        # git only keeps version 3 when an entry needs extended flags, such
+        # as intent-to-add; write-tree leaves those out.
+        (work / "z" / "later.txt").write_text("later")
+        git(work, "add", "-N", "z/later.txt")
+    git_dir = work / ".git"
+    index = read_index(git_dir / "index")
+    assert index.version == version
+    paths = ["a.txt", "a/b.txt", "a/deep/c.txt", "run.sh", "top"] + (["z/later.txt"] if version == 3 else []) + ["z/y.txt"]
+    assert [e.path for e in index.entries] == paths
+
+    oid, changed, _ = build(git_dir, index)
+    assert changed
+    expected = git(work, "write-tree")
+    assert oid == expected
+
+    # git accepts the rewritten index, including our cached tree.
+    write_index(git_dir / "index", index)
+    assert git(work, "ls-files").split("\n") == paths
+    assert git(work, "write-tree") == expected
+
+
+@needs_git
+def test_cached_tree_limits_rebuild_to_changed_directories(work):
+    git_dir = work / ".git"
+    git(work, "write-tree")  # leaves a fully valid cached tree in the index
+    oid, changed, built = build(git_dir, read_index(git_dir / "index"))
+    assert not changed and built == []
+
+    (work / "a" / "deep" / "c.txt").write_text("changed")
+    git(work, "add", "a/deep/c.txt")
+    index = read_index(git_dir / "index")
+    oid, changed, built = build(git_dir, index)
+    # Root, a and a/deep are rebuilt; z is reused from the cached tree.
+    assert changed and len(built) == 3
+    assert oid == git(work, "write-tree")
+
+
+@pytest.mark.parametrize("version", [2, 4])
+def test_index_roundtrip(tmp_path, version):
+    entries = [
+        IndexEntry(path=p, oid=f"{i:040x}", mode=0o100644, flags=0, stat=bytes(range(40)))
+        for i, p in enumerate(["dir/file-one", "dir/file-two", "dir/sub/x", "other"])
+    ]
+    index = GitIndex(
+        version=version,
+        entries=entries,
+        cache_tree=CacheTree(entry_count=4, oid="ab" * 20, subtrees={"dir": CacheTree()}),
+        extensions={b"REUC": b"data", b"EOIE": b"dropped"},
+    )
+    path = tmp_path / "index"
+    write_index(path, index)
+    parsed = read_index(path)
+    assert [(e.path, e.oid, e.mode, e.stat[:24]) for e in parsed.entries] == [
+        (e.path, e.oid, e.mode, e.stat[:24]) for e in entries
+    ]
+    assert parsed.cache_tree == index.cache_tree
+    assert parsed.extensions == {b"REUC": b"data"}
+    assert not (tmp_path / "index.lock").exists()
+
+
+@needs_git
+def test_create_commit_uses_staged_files(work):
+    from src.api.schemas import CreateCommitRequest
+    from src.api.service import GitService
+
+    service = GitService(work / ".git")
+    commit = service.create_commit(CreateCommitRequest(message="staged"))
+    assert commit.tree_oid == git(work, "write-tree")
+    # The cached tree was saved, so git sees a fully valid one.
+    assert read_index(work / ".git" / "index").cache_tree.valid
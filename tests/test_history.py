@@ -0,0 +1,60 @@
+import pytest
+
+from src.api.service import GitService
+from tests.helpers import init_repo, write_commit, write_tree
+
+
+@pytest.fixture
+def repo(tmp_path):
+    """
+    c1: a=1, b=1
+    c2: a=2            (touches a)
+    c3: b=2            (touches b)
+    side (from c2): a=3
+    merge(c3, side): a=3, b=2   -> TREESAME to side for "a", to c3 for "b"
+    """
+    git_dir = init_repo(tmp_path / ".git")
+
+    def commit(msg, files, parents=()):
+        return write_commit(git_dir, msg, parents, tree=write_tree(git_dir, files))
+
+    c1 = commit("c1", {"a": b"1", "dir/b": b"1"})
+    c2 = commit("c2", {"a": b"2", "dir/b": b"1"}, [c1])
+    c3 = commit("c3", {"a": b"2", "dir/b": b"2"}, [c2])
+    side = commit("side", {"a": b"3", "dir/b": b"1"}, [c2])
+    merge = commit("merge", {"a": b"3", "dir/b": b"2"}, [c3, side])
+    (git_dir / "refs" / "heads" / "main").write_text(merge)
+    return GitService(git_dir), dict(c1=c1, c2=c2, c3=c3, side=side, merge=merge)
+
+
+def messages(commits):
+    return [c.message for c in commits]
+
+
+def test_file_history_simplifies_merges(repo):
+    service, _ = repo
+    assert messages(service.get_path_history("a")) == ["side", "c2", "c1"]
+    assert messages(service.get_path_history("dir/b")) == ["c3", "c1"]
+    assert messages(service.get_path_history("dir")) == ["c3", "c1"]
+
+
+def test_full_history_follows_all_parents(repo):
+    service, _ = repo
+    assert messages(service.get_path_history("a", full_history=True)) == ["merge", "side", "c2", "c1"]
+
+
+def test_pagination_and_start(repo):
+    service, oids = repo
+    assert messages(service.get_path_history("a", limit=1, skip=1)) == ["c2"]
+    assert messages(service.get_path_history("a", start=oids["c3"])) == ["c2", "c1"]
+    assert service.get_path_history("a", start="0" * 40) is None
+    assert service.get_path_history("missing") == []
+
+
+def test_path_lookups_are_memoised(repo):
+    service, _ = repo
+    service.get_path_history("dir/b")
+    misses = service.paths.trees.misses
+    # A sibling path goes through the same cached subtree indexes.
+    service.get_path_history("dir/c")
+    assert service.paths.trees.misses == misses
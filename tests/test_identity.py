@@ -0,0 +1,72 @@
+import pytest
+
+from src.api.service import GitService
+from src.git_objects.identity import Identity, parse_date, parse_identity
+from src.index.identity import IdentityIndex
+from tests.helpers import init_repo, write_commit
+
+
+def test_parse_identity():
+    assert parse_identity("Jane Doe <jane@example.com> 1700000000 +0530") == Identity(
+        name="Jane Doe", email="jane@example.com", timestamp=1700000000, offset=330
+    )
+    assert parse_identity("x <y> 5 -0100").offset == -60
+    assert parse_identity("Nobody") == Identity(name="Nobody", email="")
+
+
+def test_parse_date():
+    assert parse_date("1700000000") == 1700000000
+    assert parse_date("1970-01-02") == 86400
+    assert parse_date("1970-01-01T01:00:00+01:00") == 0
+    with pytest.raises(ValueError):
+        parse_date("yesterday")
+
+
+@pytest.fixture
+def service(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    parents = []
+    # Committed out of time order on purpose: c3 is dated before c2.
+    for msg, who, ts in [
+        ("c1", "Alice <alice@example.com>", 100),
+        ("c2", "Bob <bob@example.com>", 300),
+        ("c3", "Alice <Alice@Example.com>", 200),
+        ("c4", "Bob <bob@example.com>", 400),
+    ]:
+        oid = write_commit(git_dir, msg, parents, author=f"{who} {ts} +0000")
+        parents = [oid]
+    (git_dir / "refs" / "heads" / "main").write_text(oid)
+    return GitService(git_dir)
+
+
+def messages(commits):
+    return [c.message for c in commits]
+
+
+def test_filter_commits_by_author_and_time(service):
+    assert messages(service.get_commits(author="alice@example.com")) == ["c3", "c1"]
+    assert messages(service.get_commits(author="bob")) == ["c4", "c2"]
+    assert messages(service.get_commits(since=200, until=300)) == ["c3", "c2"]
+    assert messages(service.get_commits(author="bob@example.com", since=350)) == ["c4"]
+    assert messages(service.get_commits(author="alice@example.com", limit=1, skip=1)) == ["c1"]
+    assert service.get_commits(author="carol@example.com") == []
+
+
+def test_stored_index_serves_and_extends(service):
+    snapshot = service.ensure_loaded()
+    nodes = snapshot.sorted_commits
+    index = IdentityIndex()
+    # Stored without the newest commit, which is added after loading.
+    index.add_commits(nodes[1:])
+    loaded = IdentityIndex()
+    loaded.load(index.dump())
+    loaded.add_commits(nodes)
+    again = IdentityIndex()
+    again.load(loaded.dump())
+
+    expected = service.identity_index
+    for copy in (loaded, again):
+        assert sorted(copy.by_author("BOB")) == sorted(expected.by_author("bob")) == sorted([nodes[0].oid, nodes[2].oid])
+        for author, since, until in [(None, 200, 300), (None, None, 250), (None, 150, None),
+                                     ("alice@example.com", 150, None), ("bob", 350, 400), ("carol", None, None)]:
+            assert sorted(copy.select(author, since, until)) == sorted(expected.select(author, since, until))
@@ -0,0 +1,88 @@
+import base64
+
+import pytest
+
+from src.api.schemas import BatchCommitsRequest
+from src.api.service import GitService
+from src.dag.refs import resolve_ref
+from src.git_objects.parser import read_object
+from src.git_objects.paths import resolve_path
+from tests.helpers import init_repo, write_commit, write_tree
+
+
+@pytest.fixture
+def service(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    (git_dir / "HEAD").write_text("ref: refs/heads/main")
+    root = write_commit(git_dir, "root", tree=write_tree(git_dir, {"README": b"hi\n", "src/a.py": b"a\n"}))
+    (git_dir / "refs" / "heads" / "main").write_text(root)
+    return GitService(git_dir)
+
+
+def content_at(service, commit_oid, path):
+    tree = read_object(commit_oid, service.git_dir).tree_oid
+    entry = resolve_path(tree, path, lambda oid: read_object(oid, service.git_dir))
+    return None if entry is None else read_object(entry.oid, service.git_dir).data
+
+
+def test_batch_builds_chain_on_branch_tip(service):
+    root = resolve_ref(service.git_dir, "refs/heads/main")
+    builds = service.build_count
+    result = service.create_commits(BatchCommitsRequest(commits=[
+        {"message": "add b", "timestamp": 10, "files": {"src/b.py": {"content": "b\n"}}},
+        {"message": "edit a", "timestamp": 20, "files": {"src/a.py": {"content_base64": base64.b64encode(b"a2\n").decode()}}},
+        {"message": "drop src", "timestamp": 30, "files": {"src/a.py": None, "src/b.py": None}},
+    ]))
+
+    assert result.ref == "refs/heads/main"
+    assert len(result.oids) == 3
+    assert resolve_ref(service.git_dir, "refs/heads/main") == result.oids[-1]
+    # One refresh for the whole batch.
+    assert service.build_count == builds + 1
+    assert [c.message for c in service.get_commits()] == ["drop src", "edit a", "add b", "root"]
+    assert service.get_commit(result.oids[0]).parent_oids == [root]
+
+    assert content_at(service, result.oids[0], "src/b.py") == b"b\n"
+    assert content_at(service, result.oids[1], "src/a.py") == b"a2\n"
+    assert content_at(service, result.oids[1], "README") == b"hi\n"
+    # Emptied directories disappear.
+    assert content_at(service, result.oids[2], "src") is None
+
+
+def test_batch_marks_merges_and_new_branch(service):
+    result = service.create_commits(BatchCommitsRequest(branch="import/x", commits=[
+        {"message": "left", "parents": [], "files": {"l": {"content": "l"}}},
+        {"message": "right", "parents": [], "files": {"r": {"content": "r"}}},
+        {"message": "merge", "parents": [":0", ":1"], "files": {"r": {"content": "r"}}},
+    ]))
+    left, right, merge = result.oids
+    assert result.ref == "refs/heads/import/x"
+    assert service.get_commit(merge).parent_oids == [left, right]
+    assert content_at(service, merge, "l") == b"l"
+
+
+def test_invalid_batch_writes_nothing(service):
+    objects_dir = service.git_dir / "objects"
+    before = sorted(objects_dir.rglob("*"))
+    head = resolve_ref(service.git_dir, "refs/heads/main")
+    with pytest.raises(ValueError):
+        service.create_commits(BatchCommitsRequest(commits=[
+            {"message": "ok", "files": {"x": {"content": "x"}}},
+            {"message": "bad", "parents": [":5"]},
+        ]))
+    assert sorted(objects_dir.rglob("*")) == before
+    assert resolve_ref(service.git_dir, "refs/heads/main") == head
+
+
+def test_batch_does_not_ask_git_which_objects_exist(service, monkeypatch):
+    import src.git_objects.store as store
+
+    calls = []
+    monkeypatch.setattr(store.subprocess, "run", lambda *args, **kwargs: calls.append(args))
+    result = service.create_commits(BatchCommitsRequest(commits=[
+        {"message": f"c{i}", "timestamp": i, "files": {f"dir{i % 3}/f{i}": {"content": str(i)}}}
+        for i in range(20)
+    ]))
+    # Every commit, tree and blob is new; none of them is looked up with `git cat-file`.
+    assert result.objects_written == 20 * 3 + 20
+    assert calls == []
@@ -0,0 +1,22 @@
+import src.api.main as main
+from benchmarks.loadtest import SCENARIOS, run
+from benchmarks.synth import RepoSpec, ensure_repo
+
+
+def test_mixed_load_reports_every_endpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "registry", main.registry)
+    spec = RepoSpec(commits=200, tree_width=4)
+
+    result = run(spec, tmp_path, ["mixed"], users=4, duration=0.5)
+
+    mixed = result["results"][0]
+    assert mixed["scenario"] == "mixed" and mixed["mix"] == SCENARIOS["mixed"]
+    assert mixed["requests"] > 0 and mixed["errors"] == 0
+    assert set(mixed["endpoints"]) == {
+        "GET /graph", "GET /commits", "GET /commits/{oid}", "GET /tree/{oid}", "GET /blob/{oid}", "POST /commits",
+    }
+    for stats in mixed["endpoints"].values():
+        assert 0 < stats["p50_ms"] <= stats["p99_ms"] <= stats["max_ms"]
+    # Writes went to a copy.
+    _, manifest = ensure_repo(spec, tmp_path)
+    assert (tmp_path / spec.name / ".git" / "refs" / "heads" / "main").read_text().strip() == manifest["refs"]["main"]
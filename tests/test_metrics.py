@@ -0,0 +1,24 @@
+from src.utils.metrics import Counter, Histogram, Registry
+
+
+def test_render_text_format():
+    registry = Registry()
+    reads = Counter("reads_total", "Reads", ["source"], registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=[0.1, 1], registry=registry)
+    reads.labels(source="loose").inc()
+    reads.labels(source='we"ird').inc(2)
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    registry.register_collector(lambda: [("ratio", "gauge", "Ratio", [({"cache": "x"}, 0.5)])])
+
+    lines = registry.render().splitlines()
+
+    assert "# TYPE reads_total counter" in lines
+    assert 'reads_total{source="loose"} 1' in lines
+    assert 'reads_total{source="we\\"ird"} 2' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+    assert 'ratio{cache="x"} 0.5' in lines
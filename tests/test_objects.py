@@ -31,6 +31,17 @@ def test_tree_serialization():
     expected = b"100644 file.txt\x00" + b"\x3b\x18\xe5\x12\xdb\xa7\x9e\x4c\x83\x00\xdd\x08\xae\xb3\x7f\x8e\x72\x8b\x8d\xad"
     assert serialized == expected
 
+def test_tree_serialization_uses_git_order():
+    oid = "3b18e512dba79e4c8300dd08aeb37f8e728b8dad"
+    # Directories sort as if their name ended in "/": "a.txt" < "a/" < "a0"
+    tree = TreeObject(entries=[
+        TreeEntry(mode=b"100644", name="a0", oid=oid),
+        TreeEntry(mode=b"40000", name="a", oid=oid),
+        TreeEntry(mode=b"100644", name="a.txt", oid=oid),
+    ])
+    names = [e.name for e in TreeObject.deserialize(tree.serialize()).entries]
+    assert names == ["a.txt", "a", "a0"]
+
 def test_tree_deserialization():
     # 20 bytes for hash
     oid_bytes = b"\x3b\x18\xe5\x12\xdb\xa7\x9e\x4c\x83\x00\xdd\x08\xae\xb3\x7f\x8e\x72\x8b\x8d\xad"
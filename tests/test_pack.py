@@ -0,0 +1,102 @@
+import random
+import shutil
+import subprocess
+
+import pytest
+
+from src.git_objects import pack
+from src.git_objects.models import BlobObject
+from src.git_objects.pack import PackIndex, apply_delta, create_delta, write_pack
+from src.git_objects.parser import read_object
+from src.git_objects.repack import loose_objects, repack
+from tests.helpers import init_repo, write_commit, write_tree
+
+
+def test_delta_roundtrip():
+    rng = random.Random(7)
+    base = bytes(rng.randrange(256) for _ in range(5000))
+    target = base[:1000] + b"inserted" + base[1200:4000] + base[:300] + b"tail"
+    delta = create_delta(base, target)
+    assert apply_delta(base, delta) == target
+    assert len(delta) < len(target) // 10
+    # Long copies are split into several instructions.
+    big = bytes(200000)
+    assert apply_delta(big, create_delta(big, big + b"x")) == big + b"x"
+    assert apply_delta(b"", create_delta(b"", b"new")) == b"new"
+
+
+def test_pack_roundtrip_with_deltas(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    text = b"".join(b"line %d of a reasonably long file\n" % i for i in range(300))
+    objects = []
+    for k in range(5):
+        obj = BlobObject(data=text + b"edit %d\n" % k)
+        objects.append((obj.compute_oid(), b"blob", obj.data))
+    pack_path, idx_path = write_pack(git_dir / "objects" / "pack", objects, deltas=True)
+
+    index = PackIndex(idx_path)
+    assert sorted(index.oids()) == sorted(oid for oid, _, _ in objects)
+    index.close()
+    # Deltas make the pack much smaller than five full copies.
+    assert pack_path.stat().st_size < 2 * len(text)
+    for oid, _, data in objects:
+        assert read_object(oid, git_dir).data == data
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git not installed")
+def test_pack_is_readable_by_git(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    text = b"x" * 100 + b"".join(b"%d\n" % i for i in range(500))
+    objects = []
+    for k in range(3):
+        obj = BlobObject(data=text + bytes([k]) * 10)
+        objects.append((obj.compute_oid(), b"blob", obj.data))
+    _, idx_path = write_pack(git_dir / "objects" / "pack", objects, deltas=True)
+    subprocess.run(["git", "verify-pack", str(idx_path)], check=True, capture_output=True)
+
+
+def test_repack_moves_loose_objects_into_a_pack(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    tree = write_tree(git_dir, {"a": b"1" * 200, "b/c": b"2" * 200})
+    commit = write_commit(git_dir, "c1", tree=tree)
+    before = {oid: read_object(oid, git_dir) for oid in loose_objects(git_dir)}
+
+    result = repack(git_dir)
+    assert result.packed == len(before) == result.pruned
+    assert loose_objects(git_dir) == []
+    for oid, obj in before.items():
+        assert read_object(oid, git_dir) == obj
+    assert read_object(commit, git_dir).message == "c1"
+
+    # Nothing loose left: a second run is a no-op.
+    assert repack(git_dir).packed == 0
+
+
+def test_pack_is_written_in_batches(tmp_path, monkeypatch):
+    git_dir = init_repo(tmp_path / ".git")
+    text = b"".join(b"line %d of a reasonably long file\n" % i for i in range(300))
+    objects = []
+    for k in range(6):
+        obj = BlobObject(data=text + b"edit %d\n" % k)
+        objects.append((obj.compute_oid(), b"blob", obj.data))
+    consumed, pairs = [], []
+    real_create_delta = pack.create_delta
+    monkeypatch.setattr(pack, "create_delta", lambda base, target: pairs.append((len(consumed), base, target)) or real_create_delta(base, target))
+
+    def stream():
+        for obj in objects:
+            consumed.append(obj[0])
+            yield obj
+
+    # Two objects per batch: the generator is drained as the pack is written.
+    pack_path, idx_path = write_pack(git_dir / "objects" / "pack", stream(), deltas=True, batch_bytes=2 * len(text))
+    assert consumed == [oid for oid, _, _ in objects]
+    # Each pair is diffed once, within its batch, before the next batch is read.
+    assert [seen for seen, _, _ in pairs] == [2, 4, 6]
+    assert len({(base, target) for _, base, target in pairs}) == 3
+    index = PackIndex(idx_path)
+    assert sorted(index.oids()) == sorted(consumed)
+    index.close()
+    assert pack_path.stat().st_size < 4 * len(text)
+    for oid, _, data in objects:
+        assert read_object(oid, git_dir).data == data
@@ -0,0 +1,52 @@
+import marshal
+
+from fastapi import APIRouter, FastAPI
+from httpx import ASGITransport, AsyncClient
+import pytest
+
+from src.api.profiling import ProfiledRoute, ProfileMiddleware, run_in_threadpool
+from src.git_objects.models import BlobObject
+from src.git_objects.parser import read_object
+from tests.helpers import init_repo, write_object
+
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    oid = write_object(git_dir, BlobObject(b"hello"))
+    router = APIRouter(route_class=ProfiledRoute)
+
+    @router.get("/blob")
+    async def blob():
+        obj = await run_in_threadpool(read_object, oid, git_dir)
+        return {"data": obj.data.decode()}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ProfileMiddleware, token="secret")
+    return app
+
+
+def spans(header):
+    return {part.split(";")[0] for part in header.split(", ")}
+
+
+@pytest.mark.asyncio
+async def test_server_timing_needs_token(profiled_app):
+    async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+        response = await client.get("/blob", headers={"X-Profile": "secret"})
+        assert response.json() == {"data": "hello"}
+        assert spans(response.headers["server-timing"]) == {"read_object", "handler", "respond", "total"}
+
+        response = await client.get("/blob", headers={"X-Profile": "guess"})
+        assert "server-timing" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_cprofile_dump(profiled_app):
+    async with AsyncClient(transport=ASGITransport(app=profiled_app), base_url="http://test") as client:
+        response = await client.get("/blob", headers={"X-Profile": "secret", "X-Profile-Format": "cprofile"})
+    assert response.headers["x-profile-status"] == "200"
+    assert "attachment" in response.headers["content-disposition"]
+    stats = marshal.loads(response.content)
+    assert any(name == "read_object" for _, _, name in stats)
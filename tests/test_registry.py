@@ -0,0 +1,162 @@
+import pytest
+import pytest_asyncio
+from httpx import ASGITransport, AsyncClient
+
+import src.api.main as main
+from src.api.registry import RepoRegistry
+from src.api.schemas import CreateCommitRequest
+from src.git_objects.pack import packs_for
+from src.git_objects.repack import repack
+from src.git_objects.store import store_for
+from tests.helpers import init_repo, write_commit
+
+
+def make_repo(root, name, messages):
+    git_dir = init_repo(root / name / ".git")
+    parents = []
+    for msg in messages:
+        parents = [write_commit(git_dir, msg, parents, branch="main")]
+    return git_dir
+
+
+def test_unknown_and_invalid_names(tmp_path):
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+    assert registry.get("missing") is None
+    assert registry.get("..") is None
+
+
+def test_lazy_creation_and_hit_stats(tmp_path):
+    make_repo(tmp_path, "one", ["a", "b"])
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+
+    service = registry.get("one")
+    service.ensure_loaded()
+    assert registry.get("one") is service
+
+    stats = registry.stats()[0]
+    assert stats.name == "one"
+    assert stats.misses == 1 and stats.hits == 1
+    assert stats.commits == 2
+    assert stats.memory_bytes > 0
+
+
+def test_lru_eviction_under_budget(tmp_path):
+    for name in ["a", "b", "c"]:
+        make_repo(tmp_path, name, ["x" * 100] * 3)
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+    for name in ["a", "b", "c"]:
+        registry.get(name).ensure_loaded()
+    per_repo = registry.get("a").memory_usage()
+
+    # Room for two DAGs; "a" was touched last so "b" is the LRU victim.
+    registry.memory_budget = per_repo * 2
+    assert registry.enforce_budget(keep="a") == ["b"]
+    assert not registry.get("b").is_loaded
+    assert registry.get("c").is_loaded
+    assert registry.memory_usage() <= registry.memory_budget
+
+
+def test_object_cache_counts_towards_the_budget(tmp_path):
+    for name in ["a", "b"]:
+        make_repo(tmp_path, name, ["x"])
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+    a, b = registry.get("a"), registry.get("b")
+    for service in (a, b):
+        service.read(service.ensure_loaded().sorted_commits[0].oid)
+    assert a.cache_bytes() > 0
+    assert a.memory_usage() == a.ensure_loaded().approx_bytes + a.cache_bytes()
+    assert registry.stats()[0].cache_bytes == b.cache_bytes()
+
+    # An unloaded repository still holding objects is evicted as well.
+    a.invalidate()
+    registry.get("b")
+    registry.memory_budget = b.memory_usage()
+    assert registry.enforce_budget(keep="b") == ["a"]
+    assert a.memory_usage() == 0 and b.cache_bytes() > 0
+
+
+def test_eviction_releases_caches_and_threads(tmp_path):
+    git_dir = init_repo(tmp_path / "a" / ".git")
+    (git_dir / "HEAD").write_text("ref: refs/heads/main")
+    make_repo(tmp_path, "b", ["y"])
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30, commit_index=True)
+    a = registry.get("a")
+    a.create_commit(CreateCommitRequest(message="x"))
+    a.create_commit(CreateCommitRequest(message="z"))
+    head = a.ensure_loaded().sorted_commits[0]
+    a.get_tree(head.commit.tree_oid)
+    assert a.cache_bytes() > 0
+    executor, writer = a._executor, a.writes._thread
+    registry.get("b").ensure_loaded()
+
+    registry.memory_budget = 1
+    assert registry.enforce_budget(keep="b") == ["a"]
+    assert all(len(cache) == 0 for cache in a.caches().values())
+    writer.join(timeout=5)
+    assert not writer.is_alive() and a.writes._thread is None
+    for thread in list(executor._threads):
+        thread.join(timeout=5)
+        assert not thread.is_alive()
+
+    # The evicted service still works, and starts its threads again.
+    assert registry.get("a").create_commit(CreateCommitRequest(message="again")).message == "again"
+    assert [c.message for c in a.get_commits()] == ["again", "z", "x"]
+
+
+def test_eviction_unmaps_packs(tmp_path):
+    git_dir = make_repo(tmp_path, "a", ["x", "y"])
+    make_repo(tmp_path, "b", ["z"])
+    repack(git_dir)
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+    a = registry.get("a")
+    a.ensure_loaded()
+    packs = packs_for(a.git_dir)
+    assert packs.packs and store_for(a.git_dir) is a.store
+    registry.get("b").ensure_loaded()
+
+    registry.memory_budget = 1
+    assert registry.enforce_budget(keep="b") == ["a"]
+    assert packs.packs == [] and packs_for(a.git_dir) is not packs
+    # Reloading maps the packs again.
+    assert [c.message for c in registry.get("a").get_commits()] == ["y", "x"]
+
+
+def test_budget_is_enforced_after_refreshes(tmp_path):
+    make_repo(tmp_path, "a", ["x"])
+    git_dir = make_repo(tmp_path, "b", ["y"])
+    registry = RepoRegistry(tmp_path, memory_budget=1 << 30)
+    a, b = registry.get("a"), registry.get("b")
+    a.ensure_loaded()
+    b.ensure_loaded()
+    registry.memory_budget = a.memory_usage() + b.memory_usage()
+
+    # "b" grows while warm: its refresh makes room by evicting "a".
+    parents = [b.ensure_loaded().sorted_commits[0].oid]
+    for msg in ["y" * 1000] * 20:
+        parents = [write_commit(git_dir, msg, parents, branch="main")]
+    b.refresh()
+    assert not a.is_loaded and registry.stats()[1].evictions == 1
+    assert b.is_loaded
+
+
+@pytest_asyncio.fixture
+async def client(tmp_path, monkeypatch):
+    make_repo(tmp_path, "demo", ["first", "second"])
+    monkeypatch.setattr(main, "registry", RepoRegistry(tmp_path, memory_budget=1 << 30))
+    transport = ASGITransport(app=main.app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+@pytest.mark.asyncio
+async def test_repo_scoped_routes(client):
+    response = await client.get("/api/repos/demo/commits")
+    assert response.status_code == 200
+    assert [c["message"] for c in response.json()] == ["second", "first"]
+
+    response = await client.get("/api/repos/nope/commits")
+    assert response.status_code == 404
+
+    response = await client.get("/api/repos")
+    assert response.status_code == 200
+    assert response.json()["repos"][0]["name"] == "demo"
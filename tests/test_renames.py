@@ -0,0 +1,85 @@
+import pytest
+
+from src.api.service import GitService
+from src.diff.renames import RenameOptions, detect_renames, similarity, sketch_blob
+from src.diff.tree_diff import diff_trees
+from src.git_objects.parser import read_object
+from src.utils.cache import LRUCache
+from tests.helpers import init_repo, write_tree
+
+BODY = b"".join(f"line {i}\n".encode() for i in range(100))
+
+
+@pytest.fixture
+def git_dir(tmp_path):
+    return init_repo(tmp_path / ".git")
+
+
+def changes_between(git_dir, old_files, new_files, **kwargs):
+    read = lambda oid: read_object(oid, git_dir)
+    raw = diff_trees(write_tree(git_dir, old_files), write_tree(git_dir, new_files), read)
+    return detect_renames(raw, read, **kwargs)
+
+
+def test_similarity_of_sketches():
+    assert similarity(sketch_blob(BODY), sketch_blob(BODY)) == 100
+    assert similarity(sketch_blob(BODY), sketch_blob(BODY + b"extra\n" * 10)) >= 90
+    assert similarity(sketch_blob(b"a\n" * 50), sketch_blob(b"b\n" * 50)) == 0
+
+
+def test_exact_and_inexact_renames(git_dir):
+    changes = changes_between(
+        git_dir,
+        {"old/a.txt": BODY, "b.txt": BODY + b"b\n"},
+        {"new/a.txt": BODY, "c.txt": BODY + b"changed\n", "unrelated.txt": b"x\n"},
+    )
+    summary = [(c.status, c.old_path, c.path, c.similarity) for c in changes]
+    assert ("R", "old/a.txt", "new/a.txt", 100) in summary
+    assert any(s == "R" and o == "b.txt" and p == "c.txt" and sim >= 90 for s, o, p, sim in summary)
+    assert ("A", None, "unrelated.txt", None) in summary
+
+
+def test_threshold_and_limit(git_dir):
+    old, new = {"a.txt": BODY}, {"b.txt": BODY[: len(BODY) // 3]}
+    assert [c.status for c in changes_between(git_dir, old, new)] == ["D", "A"]
+    assert [c.status for c in changes_between(git_dir, old, new, threshold=30)] == ["R"]
+    assert [c.status for c in changes_between(git_dir, {"a.txt": BODY}, {"b.txt": BODY + b"x"}, limit=0)] == ["D", "A"]
+
+
+def test_copies_from_modified_files(git_dir):
+    changes = changes_between(
+        git_dir,
+        {"src.txt": BODY},
+        {"src.txt": BODY + b"tweak\n", "copy.txt": BODY},
+        copies=True,
+    )
+    copy = next(c for c in changes if c.path == "copy.txt")
+    assert (copy.status, copy.old_path) == ("C", "src.txt")
+
+
+def test_sketches_are_cached_per_blob(git_dir):
+    sketches = LRUCache(16)
+    old, new = {"a.txt": BODY}, {"b.txt": BODY + b"more\n"}
+    changes_between(git_dir, old, new, sketches=sketches)
+    assert len(sketches) == 2
+    changes_between(git_dir, old, new, sketches=sketches)
+    assert sketches.hits == 2
+
+
+def test_each_blob_is_read_once_without_a_cache(git_dir):
+    old = {f"old{i}.txt": BODY + b"old %d\n" % i for i in range(4)}
+    new = {f"new{i}.txt": BODY + b"new %d\n" % i for i in range(4)}
+    raw = diff_trees(write_tree(git_dir, old), write_tree(git_dir, new), lambda oid: read_object(oid, git_dir))
+    reads = []
+    changes = detect_renames(raw, lambda oid: reads.append(oid) or read_object(oid, git_dir), copies=True)
+    assert [c.status for c in changes].count("R") == 4
+    assert sorted(reads) == sorted(set(reads)) and len(reads) == 8
+
+
+def test_service_diff_with_renames(git_dir):
+    service = GitService(git_dir)
+    old = write_tree(git_dir, {"a.txt": BODY})
+    new = write_tree(git_dir, {"b.txt": BODY + b"x\n"})
+    diff = service.diff(old, new, lines=True, renames=RenameOptions())
+    assert [(f.status, f.old_path, f.path) for f in diff.files] == [("R", "a.txt", "b.txt")]
+    assert diff.files[0].patch.startswith("--- a/a.txt\n+++ b/b.txt")
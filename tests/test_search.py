@@ -0,0 +1,111 @@
+import random
+
+import pytest
+
+from src.api.service import GitService
+from src.index.text import TextIndex, intersect_sorted, parse_query, union_sorted
+from tests.helpers import init_repo, write_commit
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    c1 = write_commit(git_dir, "Initial import of the parser", author="Alice Smith <alice@example.com> 0 +0000")
+    c2 = write_commit(git_dir, "Fix crash in parser (ABC-123)", [c1], author="Bob <bob@example.com> 0 +0000")
+    c3 = write_commit(git_dir, "Refactor crash reporting", [c2], author="Alice Smith <alice@example.com> 0 +0000")
+    (git_dir / "refs" / "heads" / "main").write_text(c3)
+    return git_dir, dict(c1=c1, c2=c2, c3=c3)
+
+
+def found(service, query):
+    return [c.message for c in service.search_commits(query).commits]
+
+
+def test_parse_query():
+    clauses = parse_query('fix "null pointer" pars* ABC-123')
+    assert [(c.kind, c.tokens) for c in clauses] == [
+        ("term", ["fix"]),
+        ("phrase", ["null", "pointer"]),
+        ("prefix", ["pars"]),
+        ("phrase", ["abc", "123"]),
+    ]
+
+
+def test_posting_intersection_and_union():
+    rng = random.Random(7)
+    for _ in range(50):
+        a = sorted(rng.sample(range(1000), rng.randrange(0, 40)))
+        b = sorted(rng.sample(range(1000), rng.randrange(0, 600)))
+        assert list(intersect_sorted(a, b)) == sorted(set(a) & set(b))
+        assert list(union_sorted([a, b, a[:5]])) == sorted(set(a) | set(b))
+
+
+def test_term_prefix_and_phrase_queries(repo):
+    git_dir, _ = repo
+    service = GitService(git_dir)
+    assert found(service, "crash") == ["Refactor crash reporting", "Fix crash in parser (ABC-123)"]
+    assert found(service, "CRASH parser") == ["Fix crash in parser (ABC-123)"]
+    assert found(service, "refact*") == ["Refactor crash reporting"]
+    assert found(service, '"crash in parser"') == ["Fix crash in parser (ABC-123)"]
+    assert found(service, '"parser crash"') == []
+    assert found(service, "abc-123") == ["Fix crash in parser (ABC-123)"]
+    assert found(service, "alice@example.com") == ["Refactor crash reporting", "Initial import of the parser"]
+    assert service.search_commits("crash", limit=1, skip=1).total == 2
+
+
+def test_index_follows_new_commits_and_persists(repo, monkeypatch):
+    git_dir, oids = repo
+    service = GitService(git_dir)
+    assert found(service, "release") == []
+
+    c4 = write_commit(git_dir, "Prepare release", [oids["c3"]])
+    (git_dir / "refs" / "heads" / "main").write_text(c4)
+    service.refresh()
+    assert found(service, "release") == ["Prepare release"]
+    assert len(service.text_index) == 4
+
+    # A fresh service restores the index from the snapshot file and only
+    # tokenizes the commit made since it was written.
+    restored = GitService(git_dir)
+    calls = []
+    original = TextIndex.add_commits
+    monkeypatch.setattr(TextIndex, "add_commits", lambda self, nodes: calls.append(len(nodes)) or original(self, nodes))
+    assert found(restored, "release") == ["Prepare release"]
+    assert calls == [1]
+
+
+def test_index_dump_roundtrip(repo):
+    git_dir, oids = repo
+    service = GitService(git_dir)
+    snapshot = service.ensure_loaded()
+    copy = TextIndex()
+    copy.load(service.text_index.dump())
+    assert sorted(copy.search("parser", snapshot.dag)) == sorted(service.text_index.search("parser", snapshot.dag))
+
+    # Commits added to a loaded index go next to the stored postings.
+    c4 = write_commit(git_dir, "Parse crash dumps", [oids["c3"]], author="Carol <carol@example.com> 0 +0000")
+    (git_dir / "refs" / "heads" / "main").write_text(c4)
+    snapshot = service.refresh()
+    copy.add_commits([snapshot.dag[c4], snapshot.dag[oids["c3"]]])
+    assert len(copy) == 4
+    again = TextIndex()
+    again.load(copy.dump())
+    for query in ["crash", "pars*", "crash parse", '"crash in"', "carol", "alice crash", "c*", "nothing"]:
+        expected = sorted(service.text_index.search(query, snapshot.dag))
+        assert sorted(copy.search(query, snapshot.dag)) == expected, query
+        assert sorted(again.search(query, snapshot.dag)) == expected, query
+
+
+def test_rebuilds_leave_the_served_indexes_alone(repo):
+    git_dir, oids = repo
+    service = GitService(git_dir)
+    served = service.ensure_loaded()
+
+    # Rewinding main forces a full rebuild, which gets indexes of its own.
+    (git_dir / "refs" / "heads" / "main").write_text(oids["c2"])
+    service.refresh()
+    assert found(service, "refactor") == []
+    assert served.indexes["text"].search("refactor", served.dag) == [oids["c3"]]
+
+    service.invalidate()
+    assert sorted(served.indexes["identity"].by_author("alice@example.com")) == sorted([oids["c1"], oids["c3"]])
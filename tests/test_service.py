@@ -0,0 +1,100 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.api.service import GitService
+from src.dag.models import CommitNode, DagSnapshot
+from src.git_objects.models import CommitObject
+
+
+@pytest.fixture
+def service(tmp_path):
+    git_dir = tmp_path / ".git"
+    git_dir.mkdir()
+    return GitService(git_dir)
+
+
+def fake_dag(message):
+    commit = CommitObject(tree_oid="tree", parent_oids=[], author="A", committer="C", message=message)
+    node = CommitNode(oid="1111", commit=commit)
+    return DagSnapshot(dag={"1111": node}, sorted_commits=[node], loaded=True)
+
+
+def test_concurrent_cold_readers_share_one_build(service, monkeypatch):
+    builds = []
+
+    def slow_build():
+        builds.append(1)
+        time.sleep(0.2)
+        return fake_dag("first")
+
+    monkeypatch.setattr(service, "_build_snapshot", slow_build)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: service.get_commits(), range(8)))
+
+    assert len(builds) == 1
+    assert all(r[0].message == "first" for r in results)
+
+
+def test_readers_keep_old_snapshot_during_rebuild(service, monkeypatch):
+    monkeypatch.setattr(service, "_build_snapshot", lambda: fake_dag("old"))
+    service.refresh()
+
+    started = threading.Event()
+    release = threading.Event()
+
+    def blocked_build():
+        started.set()
+        release.wait(5)
+        return fake_dag("new")
+
+    monkeypatch.setattr(service, "_build_snapshot", blocked_build)
+    future = service.request_refresh()
+    assert started.wait(5)
+
+    # The rebuild is in flight but readers are not blocked and see the old data.
+    assert service.get_commit("1111").message == "old"
+
+    release.set()
+    future.result(5)
+    assert service.get_commit("1111").message == "new"
+
+
+def test_refresh_requested_during_build_gets_a_later_build(service, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+    messages = iter(["stale", "fresh"])
+
+    def build():
+        message = next(messages)
+        if message == "stale":
+            started.set()
+            release.wait(5)
+        return fake_dag(message)
+
+    monkeypatch.setattr(service, "_build_snapshot", build)
+    first = service.request_refresh()
+    assert started.wait(5)
+
+    # A writer asking for a refresh now must not be handed the build that
+    # started before its write.
+    second = service.request_refresh()
+    assert second is not first
+    release.set()
+    assert second.result(5).dag["1111"].commit.message == "fresh"
+
+
+def test_failed_build_propagates_and_keeps_old_snapshot(service, monkeypatch):
+    monkeypatch.setattr(service, "_build_snapshot", lambda: fake_dag("old"))
+    service.refresh()
+
+    def broken_build():
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(service, "_build_snapshot", broken_build)
+    with pytest.raises(RuntimeError):
+        service.refresh()
+    assert service.get_commit("1111").message == "old"
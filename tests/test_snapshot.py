@@ -0,0 +1,201 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.api.service as service_module
+import src.dag.builder as builder_module
+from src.api.service import GitService
+from src.dag.compact import CompactDag, LayeredDag
+from src.dag.snapshot import SnapshotError, attach_snapshot, read_snapshot, verify_snapshot, write_snapshot
+from tests.helpers import init_repo, write_commit
+
+
+@pytest.fixture
+def git_dir(tmp_path):
+    return init_repo(tmp_path / ".git")
+
+
+def test_snapshot_round_trip(git_dir, tmp_path):
+    c1 = write_commit(git_dir, "one", branch="main")
+    c2 = write_commit(git_dir, "two\n\nbody", [c1], branch="main")
+    service = GitService(git_dir)
+    snapshot = service.refresh()
+
+    path = tmp_path / "dag.snap"
+    write_snapshot(path, snapshot.tips, snapshot.sorted_commits, {b"TEST": b"payload"})
+    tips, dag, sorted_commits, sections = read_snapshot(path)
+
+    assert tips == snapshot.tips
+    assert [n.oid for n in sorted_commits] == [c2, c1]
+    assert dag[c2].commit.message == "two\n\nbody"
+    assert dag[c1].children == {c2}
+    assert sections == {b"TEST": b"payload"}
+
+
+def test_corrupt_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "dag.snap"
+    write_snapshot(path, {}, [])
+    path.write_bytes(path.read_bytes()[:-1] + b"\x00")
+    with pytest.raises(SnapshotError):
+        read_snapshot(path)
+
+
+def test_attach_checks_structure_and_verify_checks_content(git_dir, tmp_path):
+    c1 = write_commit(git_dir, "one", branch="main")
+    snapshot = GitService(git_dir).refresh()
+    path = tmp_path / "dag.snap"
+    write_snapshot(path, snapshot.tips, snapshot.sorted_commits)
+    data = path.read_bytes()
+
+    # A flipped byte in a commit body is only found by a full verify.
+    body = data.index(b"one")
+    path.write_bytes(data[:body] + b"ONE" + data[body + 3:])
+    attach_snapshot(path)
+    with pytest.raises(SnapshotError):
+        verify_snapshot(path)
+
+    path.write_bytes(data[:-30])
+    with pytest.raises(SnapshotError):
+        attach_snapshot(path)
+    path.write_bytes(data + b"\0")
+    with pytest.raises(SnapshotError):
+        attach_snapshot(path)
+
+
+def test_restart_loads_snapshot_and_extends_from_moved_tips(git_dir, monkeypatch):
+    c1 = write_commit(git_dir, "one", branch="main")
+    GitService(git_dir).refresh()
+    assert (git_dir / "tinygit-dag.snap").exists()
+
+    # History moves on while the service is down.
+    c2 = write_commit(git_dir, "two", [c1], branch="main")
+    c3 = write_commit(git_dir, "side", [c1], branch="feature")
+
+    # Only the new commits may be read from the object store.
+    reads = []
+    real_read = builder_module.read_object
+    monkeypatch.setattr(builder_module, "read_object", lambda oid, d: reads.append(oid) or real_read(oid, d))
+
+    service = GitService(git_dir)
+    snapshot = service.refresh()
+    assert sorted(reads) == sorted([c2, c3])
+    assert set(snapshot.dag) == {c1, c2, c3}
+    assert snapshot.dag[c1].children == {c2, c3}
+    assert [n.oid for n in snapshot.sorted_commits][-1] == c1
+
+
+def test_restart_attaches_and_layers_new_commits(git_dir, monkeypatch):
+    c1 = write_commit(git_dir, "one", branch="main")
+    c2 = write_commit(git_dir, "two", [c1], branch="main")
+    GitService(git_dir).refresh()
+
+    service = GitService(git_dir)
+    attached = service.refresh()
+    assert isinstance(attached.dag, CompactDag)
+    # Indexes are filled by their first user, not by the restart.
+    assert not attached.indexes.is_filled("text")
+    assert [c.message for c in service.search_commits("two").commits] == ["two"]
+    assert attached.indexes.is_filled("text") and not attached.indexes.is_filled("identity")
+
+    c3 = write_commit(git_dir, "three", [c2], branch="main")
+    c4 = write_commit(git_dir, "side", [c1], branch="feature")
+    layered = service.refresh()
+    assert isinstance(layered.dag, LayeredDag)
+    assert [n.oid for n in layered.sorted_commits][-2:] == [c2, c1]
+    assert {layered.position(c3), layered.position(c4)} == {0, 1} and layered.position(c1) == 3
+    assert layered.dag[c1].children == {c2, c4} and layered.dag[c2].children == {c3}
+    assert attached.dag[c1].children == {c2}
+    assert [c.message for c in service.search_commits("three OR side").commits] == []
+    assert service.get_commits(author="a@example.com", limit=2)[1].oid in {c3, c4}
+
+    c5 = write_commit(git_dir, "five", [c3], branch="main")
+    again = service.refresh()
+    assert again.dag[c3].children == {c5} and layered.dag[c3].children == set()
+    assert [n.oid for n in again.sorted_commits][0] == c5
+
+    # Once enough commits have piled up, the snapshot is rewritten and mapped again.
+    monkeypatch.setattr(service_module, "SNAPSHOT_SAVE_INTERVAL", 1)
+    write_commit(git_dir, "six", [c5], branch="main")
+    remapped = service.refresh()
+    assert isinstance(remapped.dag, CompactDag) and len(remapped.dag) == 6
+    assert [c.message for c in service.search_commits("six").commits] == ["six"]
+
+
+def test_rewound_ref_forces_full_rebuild(git_dir):
+    c1 = write_commit(git_dir, "one", branch="main")
+    c2 = write_commit(git_dir, "two", [c1], branch="main")
+    service = GitService(git_dir)
+    service.refresh()
+
+    (git_dir / "refs" / "heads" / "main").write_text(c1)
+    snapshot = service.refresh()
+    assert set(snapshot.dag) == {c1}
+
+
+def test_attached_snapshot_matches_loaded_one(git_dir, tmp_path):
+    c1 = write_commit(git_dir, "one", branch="main")
+    c2 = write_commit(git_dir, "two", [c1], branch="main")
+    c3 = write_commit(git_dir, "side", [c1], branch="feature")
+    merge = write_commit(git_dir, "merge", [c2, c3], branch="main")
+    # A parent outside the DAG, as in a shallow clone.
+    grafted = write_commit(git_dir, "grafted", ["ab" * 20], branch="shallow")
+    snapshot = GitService(git_dir).refresh()
+
+    path = tmp_path / "dag.snap"
+    write_snapshot(path, snapshot.tips, snapshot.sorted_commits, {b"TEST": b"payload"})
+    tips, loaded, sorted_commits, _ = read_snapshot(path)
+    attached_tips, attached, sections = attach_snapshot(path)
+
+    assert attached_tips == tips and sections == {b"TEST": b"payload"}
+    assert isinstance(attached, CompactDag)
+    assert list(attached) == [node.oid for node in sorted_commits]
+    for i, node in enumerate(sorted_commits):
+        view = attached.sorted_commits[i]
+        assert (view.oid, view.parents, view.children, view.commit.message) == (node.oid, node.parents, node.children, node.commit.message)
+        assert attached.position(node.oid) == i
+    assert attached[grafted].parents == ["ab" * 20]
+    assert attached[c1].children == {c2, c3}
+    assert "ab" * 20 not in attached and "zz" not in attached
+    assert attached.get(merge).commit.parent_oids == [c2, c3]
+    assert [n.oid for n in attached.sorted_commits[1:3]] == [n.oid for n in sorted_commits[1:3]]
+    assert len(attached.values()) == len(loaded)
+
+
+def test_shared_workers_elect_one_builder(git_dir, monkeypatch):
+    c1 = write_commit(git_dir, "one", branch="main")
+    write_commit(git_dir, "two", [c1], branch="main")
+    workers = [GitService(git_dir, shared_dag=True) for _ in range(4)]
+    builds = []
+    real_build = builder_module.DagBuilder.build_dag
+
+    def slow_build(self, tips=None):
+        builds.append(1)
+        time.sleep(0.1)
+        return real_build(self, tips)
+
+    monkeypatch.setattr(builder_module.DagBuilder, "build_dag", slow_build)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        snapshots = list(pool.map(lambda worker: worker.refresh(), workers))
+
+    assert len(builds) == 1
+    assert all(isinstance(s.dag, CompactDag) for s in snapshots)
+    assert all([c.message for c in w.get_commits()] == ["two", "one"] for w in workers)
+
+
+def test_shared_worker_attaches_newly_published_version(git_dir, monkeypatch):
+    c1 = write_commit(git_dir, "one", branch="main")
+    builder, follower = GitService(git_dir, shared_dag=True), GitService(git_dir, shared_dag=True)
+    builder.refresh()
+    follower.refresh()
+
+    write_commit(git_dir, "two", [c1], branch="main")
+    builder.refresh()
+
+    monkeypatch.setattr(follower.builder, "build_dag", lambda tips=None: pytest.fail("follower built"))
+    monkeypatch.setattr(follower.builder, "extend_dag", lambda *args: pytest.fail("follower built"))
+    monkeypatch.setattr(service_module, "SHARED_POLL_INTERVAL", 0)
+    follower.ensure_loaded()  # notices the new file and queues a refresh
+    follower.refresh()
+    assert [c.message for c in follower.get_commits()] == ["two", "one"]
+    assert follower.get_commits(author="a@example.com")[0].message == "two"
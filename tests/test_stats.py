@@ -0,0 +1,165 @@
+import pytest
+
+from src.api.schemas import BatchCommit, BatchCommitsRequest, BatchFile
+from src.api.service import GitService
+from src.index.stats import week_start
+from tests.helpers import init_repo, write_commit, write_tree
+
+# Monday 2024-01-01 00:00 UTC
+MONDAY = 1704067200
+WEEK = 7 * 86400
+
+
+def identity(name, email, timestamp):
+    return f"{name} <{email}> {timestamp} +0000"
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    alice = lambda ts: identity("Alice", "alice@example.com", ts)
+    t1 = write_tree(git_dir, {"a": b"1", "b": b"1"})
+    t2 = write_tree(git_dir, {"a": b"2", "b": b"1"})
+    t3 = write_tree(git_dir, {"a": b"1", "b": b"1", "src/c": b"1"})
+    t4 = write_tree(git_dir, {"a": b"2", "b": b"1", "src/c": b"1"})
+    c1 = write_commit(git_dir, "root", tree=t1, author=alice(MONDAY + 3600))
+    # Sunday night: still the first week
+    c2 = write_commit(git_dir, "bob", [c1], tree=t2, author=identity("Bob", "bob@example.com", MONDAY + WEEK - 1))
+    c3 = write_commit(git_dir, "side", [c1], tree=t3, author=alice(MONDAY + WEEK))
+    merge = write_commit(git_dir, "merge", [c2, c3], tree=t4, author=alice(MONDAY + WEEK + 60), branch="main")
+    return git_dir, dict(c1=c1, c2=c2, c3=c3, merge=merge)
+
+
+def settled(service, author=None):
+    """Stats once the churn queued so far has been counted."""
+    service.ensure_loaded().indexes["stats"].count_churn()
+    return service.get_stats(author)
+
+
+def test_week_start():
+    assert week_start(MONDAY) == MONDAY
+    assert week_start(MONDAY + WEEK - 1) == MONDAY
+    assert week_start(MONDAY - 1) == MONDAY - WEEK
+    assert week_start(0) == -3 * 86400
+
+
+def test_counts_merges_and_churn(repo):
+    git_dir, _ = repo
+    stats = settled(GitService(git_dir))
+    assert (stats.commits, stats.merges, stats.merge_ratio) == (4, 1, 0.25)
+    assert stats.churn_pending == 0
+    # root: a, b; bob: a; side: src/c; merge against its first parent: src/c
+    assert stats.files_changed == 5
+    assert [(w.week, w.commits, w.merges, w.files_changed) for w in stats.weeks] == [
+        ("2024-01-01", 2, 0, 3),
+        ("2024-01-08", 2, 1, 2),
+    ]
+    alice, bob = stats.authors
+    assert (alice.name, alice.commits, alice.merges, alice.files_changed) == ("Alice", 3, 1, 4)
+    assert alice.weeks == {"2024-01-01": 1, "2024-01-08": 2}
+    assert (bob.email, bob.commits, bob.weeks) == ("bob@example.com", 1, {"2024-01-01": 1})
+
+
+def test_author_filter(repo):
+    git_dir, _ = repo
+    service = GitService(git_dir)
+    assert [a.name for a in service.get_stats("BOB@example.com").authors] == ["Bob"]
+    assert [a.name for a in service.get_stats("alice").authors] == ["Alice"]
+    assert service.get_stats("nobody").authors == []
+    assert service.get_stats("bob@example.com").commits == 4
+
+
+def test_stats_follow_new_commits_and_ref_moves(repo):
+    git_dir, oids = repo
+    service = GitService(git_dir)
+    first = settled(service)
+    assert service.get_stats() is first
+
+    service.create_commits(BatchCommitsRequest(commits=[
+        BatchCommit(message="add d", author_name="Carol", author_email="carol@example.com",
+                    timestamp=MONDAY + 2 * WEEK, files={"d": BatchFile(content="d"), "a": None}),
+    ]))
+    stats = settled(service)
+    assert (stats.commits, stats.files_changed) == (5, 7)
+    assert stats.weeks[-1].week == "2024-01-15"
+    assert stats.authors[-1].email == "carol@example.com"
+
+    # A branch appearing outside the API is picked up on refresh.
+    tree = write_tree(git_dir, {"a": b"1", "b": b"1", "src/c": b"2"})
+    write_commit(git_dir, "topic", [oids["c3"]], tree=tree, author=identity("Dan", "dan@example.com", MONDAY), branch="topic")
+    service.refresh()
+    assert settled(service).commits == 6
+    assert settled(service).files_changed == stats.files_changed + 1
+
+    # Rewinding main drops the commits that are no longer reachable.
+    (git_dir / "refs" / "heads" / "main").write_text(oids["c2"])
+    (git_dir / "refs" / "heads" / "topic").unlink()
+    service.refresh()
+    stats = service.get_stats()
+    assert (stats.commits, stats.merges) == (2, 0)
+    assert stats.merge_ratio == 0.0
+
+
+def test_churn_is_counted_after_the_build(repo, monkeypatch):
+    git_dir, oids = repo
+    service = GitService(git_dir)
+    reads = []
+    monkeypatch.setattr(service, "_read_for_stats", lambda oid: reads.append(oid) or service.read(oid))
+    # Keep the background counter out of the way.
+    monkeypatch.setattr(service, "_schedule_churn", lambda indexes: None)
+
+    stats = service.get_stats()
+    assert (stats.commits, stats.merges, stats.files_changed, stats.churn_pending) == (4, 1, 0, 4)
+    assert reads == []
+
+    index = service.stats_index
+    assert index.count_churn(3) == 1
+    assert service.get_stats().churn_pending == 1
+    assert index.count_churn() == 0
+    assert (service.get_stats().files_changed, service.get_stats().churn_pending) == (5, 0)
+
+    # New commits are counted at once, their churn later.
+    write_commit(git_dir, "next", [oids["merge"]], tree=write_tree(git_dir, {"a": b"3"}), branch="main")
+    reads.clear()
+    service.refresh()
+    stats = service.get_stats()
+    assert (stats.commits, stats.files_changed, stats.churn_pending) == (5, 5, 1)
+    assert reads == []
+
+
+def test_churn_is_counted_in_the_background(repo):
+    git_dir, _ = repo
+    service = GitService(git_dir)
+    service.get_stats()
+    # Queued behind the counting steps on the refresh worker.
+    service.refresh()
+    stats = service.get_stats()
+    assert (stats.files_changed, stats.churn_pending) == (5, 0)
+
+
+def test_stats_are_restored_from_the_snapshot(repo, tmp_path):
+    git_dir, _ = repo
+    first = GitService(git_dir, snapshot_dir=tmp_path / "snapshots")
+    settled(first)
+    # Saved with the churn counted.
+    first._persist(first.ensure_loaded())
+    expected = first.get_stats()
+
+    restarted = GitService(git_dir, snapshot_dir=tmp_path / "snapshots")
+
+    def unreadable(oid):
+        raise FileNotFoundError(oid)
+
+    # Loaded from the snapshot section: no tree is read again.
+    restarted._read_for_stats = unreadable
+    assert settled(restarted) == expected
+
+
+def test_queued_churn_survives_a_restart(repo, tmp_path, monkeypatch):
+    git_dir, _ = repo
+    # The snapshot is saved by the build, before any churn is counted.
+    expected = settled(GitService(git_dir, snapshot_dir=tmp_path / "snapshots"))
+    restarted = GitService(git_dir, snapshot_dir=tmp_path / "snapshots")
+    monkeypatch.setattr(restarted, "_schedule_churn", lambda indexes: None)
+    assert restarted.ensure_loaded().indexes["stats"].churn_pending == 4
+    assert settled(restarted) == expected
@@ -0,0 +1,102 @@
+import os
+import threading
+
+import pytest
+
+from src.api.schemas import CreateCommitRequest
+from src.api.service import GitService
+from src.dag.builder import DagBuilder
+from src.git_objects.models import BlobObject, CommitObject, TreeEntry, TreeObject
+from src.git_objects.repack import repack
+from src.git_objects.store import ChainStore, LooseStore, MemoryStore, ObjectStoreError, PackStore, memory_backed, store_for
+from tests.helpers import init_repo, write_object, write_tree
+
+
+def test_memory_store_operations():
+    store = MemoryStore()
+    oid = store.write(b"blob", b"hello world")
+
+    assert oid == BlobObject(b"hello world").compute_oid()
+    assert store.read(oid).data == b"hello world"
+    assert store.peek(oid) == (b"blob", 11)
+    assert store.contains(oid) and not store.contains("0" * 40)
+    assert list(store.iter()) == [oid]
+    with pytest.raises(FileNotFoundError):
+        store.read("0" * 40)
+
+
+def test_peek_loose_and_packed_deltas(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    base = b"line\n" * 200
+    oids = {write_object(git_dir, BlobObject(data)): data for data in (base, base + b"more\n", base + b"other\n")}
+    assert all(LooseStore(git_dir).peek(oid) == (b"blob", len(data)) for oid, data in oids.items())
+
+    repack(git_dir, deltas=True)
+    packed = PackStore(git_dir)
+    assert set(packed.iter()) == set(oids)
+    assert all(packed.peek(oid) == (b"blob", len(data)) for oid, data in oids.items())
+    assert not list(LooseStore(git_dir).iter())
+
+
+def test_chain_writes_to_first_writable_store_once(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    existing = write_object(git_dir, BlobObject(b"on disk"))
+    memory = MemoryStore()
+    chain = ChainStore([PackStore(git_dir), LooseStore(git_dir), memory], write_to=memory)
+
+    assert chain.write_many([(existing, b"blob", b"on disk")]) == 0
+    new = chain.write(b"blob", b"new")
+    assert memory.contains(new) and not LooseStore(git_dir).contains(new)
+    assert set(chain.iter()) == {existing, new}
+    with pytest.raises(ObjectStoreError):
+        PackStore(git_dir).write(b"blob", b"x")
+
+
+def test_loose_writes_use_their_own_temporary_files(tmp_path, monkeypatch):
+    git_dir = init_repo(tmp_path / ".git")
+    store = LooseStore(git_dir)
+    obj = (BlobObject(b"shared").compute_oid(), b"blob", b"shared")
+    fanout = git_dir / "objects" / obj[0][:2]
+
+    def crash(src, dst):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as m:
+        m.setattr(os, "replace", crash)
+        with pytest.raises(OSError):
+            store.write_many([obj])
+    # Nothing is left behind to block the next attempt.
+    assert list(fanout.iterdir()) == []
+
+    threads = [threading.Thread(target=store.write_many, args=([obj],)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert [p.name for p in fanout.iterdir()] == [obj[0][2:]]
+    assert store.read(obj[0]).data == b"shared"
+
+
+def test_memory_backed_store_survives_missing_files(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    tree = write_tree(git_dir, {"a.txt": b"a"})
+    store = memory_backed(store_for(git_dir))
+    for path in (git_dir / "objects").rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+    assert isinstance(store.read(tree), TreeObject)
+    assert not store_for(git_dir).contains(tree)
+
+
+def test_service_on_memory_store(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    service = GitService(git_dir, store=MemoryStore())
+
+    created = service.create_commit(CreateCommitRequest(message="in memory"))
+
+    assert not list(LooseStore(git_dir).iter())
+    assert service.store.contains(created.oid)
+    assert (git_dir / "refs" / "heads" / "main").read_text().strip() == created.oid
+    assert [c.message for c in service.get_commits()] == ["in memory"]
+    assert list(DagBuilder(git_dir, service.store).build_dag()) == [created.oid]
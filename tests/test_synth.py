@@ -0,0 +1,17 @@
+import subprocess
+
+from benchmarks.synth import RepoSpec, ensure_repo
+from src.dag.builder import DagBuilder
+
+
+def test_synthetic_repos_are_deterministic(tmp_path):
+    spec = RepoSpec(commits=300, merge_density=0.2, tree_width=4)
+    _, loose = ensure_repo(spec, tmp_path / "a")
+    git_dir, packed = ensure_repo(RepoSpec(commits=300, merge_density=0.2, tree_width=4, packed=True), tmp_path / "b")
+
+    assert loose["refs"] == packed["refs"]
+    assert loose["refs"] == ensure_repo(spec, tmp_path / "c")[1]["refs"]
+    dag = DagBuilder(git_dir).build_dag()
+    assert len(dag) == 300
+    assert any(len(node.parents) == 2 for node in dag.values())
+    subprocess.run(["git", "--git-dir", str(git_dir), "fsck", "--strict"], check=True, capture_output=True)
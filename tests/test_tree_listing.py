@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from src.api.service import GitService
+from tests.helpers import init_repo, write_tree
+
+
+@pytest.fixture
+def repo(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    tree = write_tree(git_dir, {
+        "README": b"hi",
+        "src/main.py": b"print()",
+        "src/lib/util.py": b"x = 1",
+    })
+    return GitService(git_dir), tree
+
+
+def listing(service, *args):
+    chunks = service.list_tree_recursive(*args)
+    return [json.loads(line) for chunk in chunks for line in chunk.splitlines()]
+
+
+def test_full_listing(repo):
+    service, tree = repo
+    paths = [(e["path"], e["type"]) for e in listing(service, tree)]
+    assert paths == [
+        ("README", "blob"),
+        ("src", "tree"),
+        ("src/lib", "tree"),
+        ("src/lib/util.py", "blob"),
+        ("src/main.py", "blob"),
+    ]
+
+
+def test_prefix_and_depth(repo):
+    service, tree = repo
+    assert [e["path"] for e in listing(service, tree, "src", 1)] == ["src/lib", "src/main.py"]
+    assert [e["path"] for e in listing(service, tree, "src/lib/")] == ["src/lib/util.py"]
+    assert service.list_tree_recursive(tree, "README") is None
+    assert service.list_tree_recursive(tree, "missing") is None
+
+
+def test_subtree_listings_are_memoised(repo, monkeypatch):
+    service, tree = repo
+    listing(service, tree)
+
+    reads = []
+    real_read = service.store.read
+    monkeypatch.setattr(service.store, "read", lambda oid: reads.append(oid) or real_read(oid))
+    service.objects.clear()
+
+    # Only the root is read again to check its type; every subtree comes from the memo.
+    assert len(listing(service, tree)) == 5
+    assert len(listing(service, tree, "", 2)) == 4
+    assert reads == [tree]
@@ -0,0 +1,47 @@
+import subprocess
+
+import pytest
+
+from src.git_objects.models import BlobObject
+from src.git_objects.parser import read_object
+from src.git_objects.store import store_for
+from src.git_objects.writer import LooseObjectWriter, hash_file, write_object_stream
+from tests.helpers import init_repo
+
+
+def test_stream_matches_in_memory_oid(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    data = bytes(range(256)) * 1000
+    chunks = (data[i:i + 7000] for i in range(0, len(data), 7000))
+
+    oid, size = write_object_stream(store_for(git_dir), b"blob", chunks)
+
+    assert size == len(data)
+    assert oid == BlobObject(data).compute_oid()
+    assert read_object(oid, git_dir).data == data
+    assert not list((git_dir / "objects").glob("tmp_obj_*"))
+
+
+def test_hash_file_agrees_with_git(tmp_path):
+    git_dir = tmp_path / ".git"
+    subprocess.run(["git", "init", "-q", str(tmp_path)], check=True)
+    path = tmp_path / "big.bin"
+    path.write_bytes(b"line\n" * 50000)
+
+    oid = hash_file(store_for(git_dir), path)
+
+    expected = subprocess.run(["git", "hash-object", str(path)], capture_output=True, text=True, check=True).stdout.strip()
+    assert oid == expected
+    subprocess.run(["git", "--git-dir", str(git_dir), "cat-file", "-e", oid], check=True)
+
+
+def test_size_mismatch_leaves_nothing_behind(tmp_path):
+    git_dir = init_repo(tmp_path / ".git")
+    with pytest.raises(ValueError):
+        with LooseObjectWriter(git_dir, b"blob", 3) as writer:
+            writer.write(b"abcd")
+    with pytest.raises(ValueError):
+        with LooseObjectWriter(git_dir, b"blob", 3) as writer:
+            writer.write(b"ab")
+            writer.finish()
+    assert not list((git_dir / "objects").rglob("*"))